@@ -1,4 +1,5 @@
 import os
+import sys
 import math
 import numpy as np 
 import pandas as pd 
@@ -9,6 +10,10 @@ from matplotlib.backends.backend_pdf import PdfPages
 import warnings
 warnings.filterwarnings('ignore')
 
+# Punch rounding is shared with the payroll pipeline
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'payroll_automation'))
+from rounding import adjust_start_times, adjust_end_times
+
 # UDFs
 ## Data Loader
 # Functions for clean time sheet
@@ -99,24 +104,6 @@ def process_bonus_rate_data(df):
     df = clean_and_rename_columns(df)
     return df
 
-def adjust_start_time(dt):
-    # Adjust start datetime
-    if dt.minute >= 0 and dt.minute <= 5:
-        return dt.replace(minute=0)
-    elif dt.minute >= 6 and dt.minute <= 35:
-        return dt.replace(minute=30)
-    else:
-        return (dt + pd.Timedelta(hours=1)).replace(minute=0)
-
-def adjust_end_time(dt):
-    # Adjust end datetime
-    if dt.minute >= 0 and dt.minute <= 24:
-        return dt.replace(minute=0)
-    elif dt.minute >= 25 and dt.minute <= 54:
-        return dt.replace(minute=30)
-    else:
-        return (dt + pd.Timedelta(hours=1)).replace(minute=0)
-
 def combine_time(df):
     # Combine start date and start time into start datetime
     df['Start Datetime'] = pd.to_datetime(df['Start Date'] + ' ' + df['Start time'], format='%d/%m/%Y %H:%M')
@@ -125,8 +112,8 @@ def combine_time(df):
     df['End Datetime'] = pd.to_datetime(df['End Date'] + ' ' + df['End time'], format='%d/%m/%Y %H:%M')
     
     # Adjust start and end times
-    df['Adjusted Start Datetime'] = df['Start Datetime'].apply(adjust_start_time)
-    df['Adjusted End Datetime'] = df['End Datetime'].apply(adjust_end_time)
+    df['Adjusted Start Datetime'] = adjust_start_times(df['Start Datetime'])
+    df['Adjusted End Datetime'] = adjust_end_times(df['End Datetime'])
     
     # Calculate working hours
     df['Working Hours'] = (df['Adjusted End Datetime'] - df['Adjusted Start Datetime']).dt.total_seconds() / 3600
@@ -166,8 +153,8 @@ def process_time_sheet_data(Time_Sheet_df):
     Parameters:
     - Time_Sheet_df: DataFrame containing the time sheet data.
     - combine_time: Function to handle the scenario where an employee's end time on one day is close to midnight and their start time on the next day is shortly after midnight.
-    - adjust_start_time: Function to adjust the start time.
-    - adjust_end_time: Function to adjust the end time.
+    - adjust_start_times: Vectorized rounding of the start times (see payroll_automation/rounding.py).
+    - adjust_end_times: Vectorized rounding of the end times (see payroll_automation/rounding.py).
 
     Returns:
     - Processed Time_Sheet_df.
@@ -177,8 +164,8 @@ def process_time_sheet_data(Time_Sheet_df):
     Time_Sheet_df = combine_time(Time_Sheet_df)
 
     # Adjust start and end times
-    Time_Sheet_df['Adjusted Start Datetime'] = Time_Sheet_df['Start Datetime'].apply(adjust_start_time)
-    Time_Sheet_df['Adjusted End Datetime'] = Time_Sheet_df['End Datetime'].apply(adjust_end_time)
+    Time_Sheet_df['Adjusted Start Datetime'] = adjust_start_times(Time_Sheet_df['Start Datetime'])
+    Time_Sheet_df['Adjusted End Datetime'] = adjust_end_times(Time_Sheet_df['End Datetime'])
 
     # Drop rows where 'Working Hours' is null or 0
     Time_Sheet_df = Time_Sheet_df[Time_Sheet_df['Working Hours'].notna() & (Time_Sheet_df['Working Hours'] != 0)]
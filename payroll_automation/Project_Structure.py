@@ -1,11 +1,30 @@
 payroll-automation/
 │
 ├── data_loading.py             # Data loading functions
+├── xlsx_stream.py               # Streaming XLSX reader
+├── workbook_cache.py           # Parsed workbook disk cache
+├── timesheet_schema.py          # Typed timesheet schema and copy-on-write setup
+├── workbook_columns.py          # Columns read from each kind of workbook
 ├── schedule_processing.py       # Timesheet and schedule processing functions
 ├── time_adjustments.py          # Time adjustment functions
+├── datetime_parsing.py          # Date format detection and date + clock time parsing
+├── rounding.py                  # Vectorized punch rounding rules
+├── policies.py                  # Business-hours and lunch policy tables
+├── employee_directory.py        # Persistent employee keys shared by every source
+├── store_lock.py                # Lock for the per-site persistent stores
 ├── salary_calculation.py        # Salary calculation functions
+├── period_hours.py              # Persisted biweekly hours history
 ├── report_generator.py          # Report generation functions
+├── payroll_logging.py           # Structured logging and per-run stage counters
+├── instrumentation.py           # Per-stage timing, memory and profiling
+├── payroll_jobs.py              # Background runs and stage memoization for the app
 ├── app.py                       # Main script to run the entire process
+├── cli.py                       # Headless batch runner
+├── synthetic_data.py            # Synthetic site workbook generator
+├── benchmark.py                 # Stage benchmarks with stored baselines
+├── reference_engines.py         # Baseline engines, verbatim, for equivalence checks
+├── equivalence.py               # Optimized vs reference engine equivalence harness
+├── import_check.py              # Fresh-interpreter import check of every module
 ├── requirements.txt             # List of required packages
 ├── .gitignore                   # Git ignore file (to exclude unnecessary files)
 ├── README.md                    # Project documentation
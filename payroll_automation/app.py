@@ -1,17 +1,22 @@
 import streamlit as st
-from data_loading import read_excel_safe,load_timesheets,load_schedules,load_public_holidays,load_production_report,load_payrate_list
-from schedule_processing import process_timesheet, process_temp_timesheet, process_schedule
-from salary_calculation import process_data
-from report_generator import generate_excel_report
+from payroll_jobs import MEASURED_STAGES, DEFAULT_SITE, StageCache, create_executor, submit_payroll_job
+from payroll_logging import configure_logging
 import os
+import weakref
 import pandas as pd
 
-# Directory for storing temp files (optional)
+# Directory for the period hours store and the parsed workbook cache
 if not os.path.exists('temp'):
     os.makedirs('temp')
 
+# Quiet by default; set PAYROLL_LOG_LEVEL=DEBUG for the per-employee salary trace
+configure_logging(os.environ.get('PAYROLL_LOG_LEVEL', 'WARNING'))
+
 st.title("Payroll Automation Tool")
 
+# Each site has its own employee directory and period hours history
+site = st.text_input("Site", value=DEFAULT_SITE, help="Runs of the same site share its employee directory and hours history")
+
 # Multi-file uploads for timesheet and schedule
 timesheet_files = st.file_uploader("Upload Timesheet Excel Files", type=["xlsx"], accept_multiple_files=True)
 schedule_files = st.file_uploader("Upload Schedule Excel Files", type=["xlsx"], accept_multiple_files=True)
@@ -19,62 +24,71 @@ payrate_file = st.file_uploader("Upload Payrate Excel", type=["xlsx"])
 public_holidays_file = st.file_uploader("Upload Public Holidays Excel", type=["xlsx"], help="Optional")
 production_report_file = st.file_uploader("Upload Production Report Excel", type=["xlsx"], help="Optional")
 start_date = st.date_input("Select Start Date")
+profile_stage = st.selectbox("Profile a stage", ['None'] + MEASURED_STAGES, help="Optional cProfile dump of one stage")
+trace_memory = st.checkbox("Trace peak memory per stage", value=False,
+                           help="Slows the run down noticeably; only one run at a time can trace memory")
+
+# Stage results and the background worker live for the whole browser session
+if 'stage_cache' not in st.session_state:
+    st.session_state.stage_cache = StageCache()
+    st.session_state.executor = create_executor()
+    # Streamlit drops the session state when the browser session ends; the worker goes with it
+    weakref.finalize(st.session_state.stage_cache, st.session_state.executor.shutdown, wait=False, cancel_futures=True)
 
 if st.button("Process Payroll"):
     if all([timesheet_files, schedule_files, payrate_file]):
-        # Save uploaded files
-        timesheet_paths = []
-        schedule_paths = []
-        
-        # Save each uploaded timesheet file temporarily
-        for timesheet in timesheet_files:
-            temp_path = f"temp/{timesheet.name}"
-            with open(temp_path, 'wb') as f:
-                f.write(timesheet.getbuffer())
-            timesheet_paths.append(temp_path)
-        
-        # Save each uploaded schedule file temporarily
-        for schedule in schedule_files:
-            temp_path = f"temp/{schedule.name}"
-            with open(temp_path, 'wb') as f:
-                f.write(schedule.getbuffer())
-            schedule_paths.append(temp_path)
+        # Uploaded files are passed to the loaders as in-memory buffers; nothing
+        # is written to a shared temp path, so concurrent sessions cannot collide
+        inputs = {
+            'timesheets': timesheet_files,
+            'schedules': schedule_files,
+            'payrate': payrate_file,
+            'production_report': production_report_file,
+            'public_holidays': public_holidays_file
+        }
+        st.session_state.job = submit_payroll_job(
+            st.session_state.executor, st.session_state.stage_cache, inputs, start_date, site=site,
+            profile_stage=None if profile_stage == 'None' else profile_stage,
+            trace_memory=trace_memory
+        )
+        st.session_state.job_start_date = start_date
+    else:
+        st.error("Please upload all required files.")
 
-        payrate_path = f"temp/{payrate_file.name}"
-        with open(payrate_path, 'wb') as f:
-            f.write(payrate_file.getbuffer())
-        
-        # Optional files
-        holidays_path = None
-        if public_holidays_file:
-            holidays_path = f"temp/{public_holidays_file.name}"
-            with open(holidays_path, 'wb') as f:
-                f.write(public_holidays_file.getbuffer())
-        
-        production_report_path = None
-        if production_report_file:
-            production_report_path = f"temp/{production_report_file.name}"
-            with open(production_report_path, 'wb') as f:
-                f.write(production_report_file.getbuffer())
+def show_progress(job):
+    st.progress(job.completed_fraction())
+    st.table(pd.DataFrame.from_dict(job.progress, orient='index'))
 
-        # Load data
-        combined_timesheet = load_timesheets(timesheet_paths)
-        combined_schedule = load_schedules(schedule_paths)
-        ca_holidays = load_public_holidays(start_date)
-        production_report = load_production_report(production_report_path)
-        payrate_list = load_payrate_list(payrate_path)
+@st.fragment(run_every=0.5)
+def poll_job(job):
+    # Only this fragment reruns while the job is in flight; the whole page reruns once it finishes
+    show_progress(job)
+    if job.done():
+        st.rerun()
 
-        # Process data
-        salary_info, vacation_info, schedule_changes, schedule_alerts = process_data(
-            combined_timesheet, combined_schedule, ca_holidays, production_report, payrate_list, start_date
-        )
+job = st.session_state.get('job')
+if job is not None and not job.done():
+    poll_job(job)
+elif job is not None:
+    show_progress(job)
 
-        # Generate report
-        output_file = f"Payroll_Report_{start_date}.xlsx"
-        generate_excel_report(salary_info, combined_timesheet, vacation_info, output_file, schedule_alerts, output_file)
-
-        # Provide download link
-        with open(output_file, "rb") as f:
-            st.download_button("Download Payroll Report", f, file_name=output_file)
+    if job.future.exception() is not None:
+        st.error(f"Payroll run failed: {job.future.exception()}")
     else:
-        st.error("Please upload all required files.")
+        # Provide download link
+        output_file = f"Payroll_Report_{st.session_state.job_start_date}.xlsx"
+        st.download_button("Download Payroll Report", job.result(), file_name=output_file)
+
+    # Rows read from every timesheet and schedule workbook
+    if job.workbooks is not None:
+        st.subheader("Workbooks")
+        st.dataframe(job.workbooks)
+
+    # Wall time, rows in/out and peak memory of every stage of the run
+    st.subheader("Run report")
+    if job.run_report.memory_refused:
+        st.info("Another run was tracing memory, so peak memory was not recorded for this run.")
+    st.dataframe(job.run_report.to_frame())
+    if job.run_report.profile_path is not None:
+        with open(job.run_report.profile_path, 'rb') as f:
+            st.download_button("Download cProfile dump", f.read(), file_name=os.path.basename(job.run_report.profile_path))
@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import tempfile
+import argparse
+import platform
+import numpy as np
+import pandas as pd
+from data_loading import load_timesheets, load_schedules, load_payrate_list, load_production_report, load_holiday_list
+from salary_calculation import process_data
+from report_generator import generate_excel_report
+from instrumentation import RunReport
+from synthetic_data import generate_site
+
+# Stage benchmarks on synthetic workbooks, compared against a stored baseline:
+#   python benchmark.py --scale 100x1 1000x2 --rounds 3
+#   python benchmark.py --scale 100x1 1000x2 --rounds 3 --save-baseline
+# A scale is EMPLOYEESxPERIODS. Every round runs the loaders, each stage of
+# process_data and generate_excel_report with a fresh run report; a stage
+# regresses when its median exceeds the baseline median by more than the
+# tolerance and by more than the noise floor. Baselines are machine specific
+# and never committed: record one with --save-baseline on the machine the
+# comparison runs on, before the change being measured.
+
+DEFAULT_SCALES = ['100x1', '1000x2']
+# The baseline lives in the git-ignored temp directory next to this script; the
+# generated workbooks go to the system temp directory, wherever this is run from
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp', 'benchmark_baseline.json')
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'payroll_benchmark_data')
+START_DATE = '2024-12-16'
+
+STAT_COLUMNS = ['Rounds', 'Min', 'Median', 'Mean', 'Max', 'StdDev', 'Rows In', 'Rows Out']
+COMPARISON_COLUMNS = ['Scale', 'Stage', 'Baseline', 'Median', 'Ratio', 'Status']
+
+def parse_scale(scale):
+    employees, periods = scale.lower().split('x')
+    return int(employees), int(periods)
+
+def site_files(data_dir, employees, periods, seed):
+    # Workbooks are generated once per scale and seed and reused by later runs
+    site_dir = os.path.join(data_dir, f"employees_{employees}_periods_{periods}_seed_{seed}")
+    marker = os.path.join(site_dir, 'complete')
+    if not os.path.exists(marker):
+        generate_site(site_dir, employees=employees, periods=periods, start_date=START_DATE, seed=seed)
+        open(marker, 'w').close()
+    names = sorted(os.listdir(site_dir))
+    path = lambda name: os.path.join(site_dir, name)
+    return site_dir, {
+        'timesheets': [path(name) for name in names if 'Timesheet' in name],
+        'schedules': [path(name) for name in names if 'Shift' in name],
+        'payrate': path('PayRate.xlsx'),
+        'production': path('Production Report.xlsx'),
+        'holidays': path('Holidays.xlsx')
+    }
+
+def run_round(files, periods, output_dir):
+    run_report = RunReport()
+    timed = run_report.measure
+    timesheet_df = timed('load_timesheets', lambda: load_timesheets(files['timesheets'], max_workers=1))
+    schedule_df = timed('load_schedules', lambda: load_schedules(files['schedules'], max_workers=1))
+    payrate_df = timed('load_payrate_list', lambda: load_payrate_list(files['payrate']))
+    production_df = timed('load_production_report', lambda: load_production_report(files['production']))
+    holidays_df = timed('load_holidays', lambda: load_holiday_list(files['holidays']))
+
+    results = timed('process_data', lambda: process_data(timesheet_df, schedule_df, holidays_df, production_df, payrate_df,
+                                                         START_DATE, periods, run_report=run_report), rows_in=len(timesheet_df))
+    processed_timesheet, vacation_df, changes_df, schedule_alerts, salary_df, pay_components, unmatched = results
+    timed('generate_excel_report', lambda: generate_excel_report(
+        salary_df, pay_components, processed_timesheet, vacation_df, changes_df, schedule_alerts,
+        os.path.join(output_dir, 'benchmark_report.xlsx'), unmatched_records=unmatched), rows_in=len(processed_timesheet))
+    return run_report.records()
+
+def stage_stats(rounds):
+    # pytest-benchmark style statistics of each stage over the rounds
+    stats = {}
+    for stage in dict.fromkeys(record['Stage'] for records in rounds for record in records):
+        stage_records = [record for records in rounds for record in records if record['Stage'] == stage]
+        seconds = np.array([record['Seconds'] for record in stage_records])
+        stats[stage] = {
+            'Rounds': len(seconds),
+            'Min': round(float(seconds.min()), 4),
+            'Median': round(float(np.median(seconds)), 4),
+            'Mean': round(float(seconds.mean()), 4),
+            'Max': round(float(seconds.max()), 4),
+            'StdDev': round(float(seconds.std()), 4),
+            'Rows In': stage_records[0]['Rows In'],
+            'Rows Out': stage_records[0]['Rows Out']
+        }
+    return stats
+
+def run_benchmarks(scales, rounds=3, seed=0, data_dir=DEFAULT_DATA_DIR):
+    results = {}
+    for scale in scales:
+        employees, periods = parse_scale(scale)
+        site_dir, files = site_files(data_dir, employees, periods, seed)
+        print(f"{scale}: {rounds} rounds on {site_dir}", flush=True)
+        results[scale] = {
+            'Employees': employees,
+            'Periods': periods,
+            'Seed': seed,
+            'Stages': stage_stats([run_round(files, periods, site_dir) for _ in range(rounds)])
+        }
+    return results
+
+def machine_info():
+    return {
+        'Platform': platform.platform(),
+        'Python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'CPUs': os.cpu_count()
+    }
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_baseline(path, results):
+    # Scales not benchmarked in this run keep their stored baseline
+    scales = (load_baseline(path) or {}).get('Scales', {})
+    scales.update(results)
+    baseline = {'Machine': machine_info(), 'Scales': scales}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, ensure_ascii=False)
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.05):
+    rows = []
+    for scale, result in results.items():
+        baseline_stages = baseline['Scales'].get(scale, {}).get('Stages', {}) if baseline else {}
+        for stage, stats in result['Stages'].items():
+            reference = baseline_stages.get(stage, {}).get('Median')
+            if reference is None:
+                rows.append([scale, stage, None, stats['Median'], None, 'new'])
+                continue
+            ratio = stats['Median'] / reference if reference > 0 else float('inf')
+            slower = stats['Median'] > reference * (1 + tolerance) and stats['Median'] - reference > min_seconds
+            faster = stats['Median'] < reference * (1 - tolerance) and reference - stats['Median'] > min_seconds
+            rows.append([scale, stage, reference, stats['Median'], round(ratio, 2),
+                         'REGRESSION' if slower else 'faster' if faster else 'ok'])
+    return pd.DataFrame(rows, columns=COMPARISON_COLUMNS)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the payroll stages on synthetic workbooks.")
+    parser.add_argument('--scale', nargs='+', default=DEFAULT_SCALES, metavar='EMPLOYEESxPERIODS',
+                        help=f"Scales to benchmark (default: {' '.join(DEFAULT_SCALES)})")
+    parser.add_argument('--rounds', type=int, default=3, help="Runs per scale; statistics are taken over the rounds")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic workbooks")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Where synthetic workbooks are generated and reused")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON to compare against or save to")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline of its scales")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown of a stage median")
+    parser.add_argument('--min-seconds', type=float, default=0.05, help="Slowdowns smaller than this are noise")
+    parser.add_argument('--output', default=None, help="Also write this run's statistics to a JSON file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmarks(args.scale, args.rounds, args.seed, args.data_dir)
+
+    for scale, result in results.items():
+        print(f"\n{scale} ({result['Employees']} employees, {result['Periods']} periods)")
+        print(pd.DataFrame.from_dict(result['Stages'], orient='index', columns=STAT_COLUMNS).to_string())
+
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'Machine': machine_info(), 'Scales': results}, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; record one with --save-baseline before measuring a change")
+    comparison = compare(results, baseline, args.tolerance, args.min_seconds)
+    print(f"\nCompared with {args.baseline}:")
+    print(comparison.to_string(index=False))
+    return 1 if comparison['Status'].eq('REGRESSION').any() else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
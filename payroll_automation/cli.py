@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import fnmatch
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from data_loading import load_timesheets, load_schedules, load_public_holidays, load_holiday_list, load_production_report, load_payrate_list
+from salary_calculation import adjust_timesheet_by_department, calculate_periods, last_period_end
+from employee_directory import resolve_employee_keys
+from report_generator import generate_excel_report
+from payroll_logging import configure_logging, StageCounters, counting
+from instrumentation import RunReport
+
+# Headless batch runner: python cli.py SITE_DIR [SITE_DIR ...] --start-date 2024-12-16 --periods 2
+# Each site directory holds one site's workbooks; files are picked up by the
+# (case-insensitive) glob patterns below. Sites run in parallel worker
+# processes; the periods of one site run in order, since holiday pay reads the
+# hours of the previous periods from the site's hours store.
+
+DEFAULT_PATTERNS = {
+    'timesheets': ['*Timesheet*.xlsx'],
+    'schedules': ['*Schedule-Export*.xlsx', '*Shift*.xlsx'],
+    'payrate': ['*PayRate*.xlsx'],
+    'holidays': ['*Holiday*.xlsx'],
+    'production': ['*Production Report*.xlsx']
+}
+
+def find_files(directory, patterns):
+    names = sorted(os.listdir(directory))
+    matches = []
+    for name in names:
+        if name.startswith('~$'):  # Excel lock files
+            continue
+        if any(fnmatch.fnmatch(name.lower(), pattern.lower()) for pattern in patterns):
+            matches.append(os.path.join(directory, name))
+    return matches
+
+def site_names(site_dirs):
+    # Each site's path below the sites' common root, used as its output directory,
+    # so north/site1 and south/site1 never write to the same one
+    paths = [os.path.abspath(site_dir) for site_dir in site_dirs]
+    if len(set(paths)) < len(paths):
+        raise ValueError("The same site directory is given more than once")
+    root = os.path.commonpath(paths)
+    if root in paths:
+        # A single site, or one site nested in another: name them from the parent
+        root = os.path.dirname(root)
+    return [os.path.relpath(path, root) for path in paths]
+
+def run_site(site_dir, patterns, start_date, num_periods, output_dir, load_workers, payslips=False, cache_dir=None,
+             log_level='WARNING', log_jsonl=False, trace_memory=False, profile_stage=None, allow_partial=False, site=None):
+    # site is the site's output directory below output_dir (see site_names)
+    site = site or os.path.basename(os.path.normpath(site_dir))
+    site_output = os.path.join(output_dir, site)
+    os.makedirs(site_output, exist_ok=True)
+    summary = {'Site': site, 'Directory': site_dir, 'Status': 'ok'}
+
+    # Sites may run in worker processes, so each one sets up its own log sinks
+    configure_logging(log_level, os.path.join(site_output, 'payroll_log.jsonl') if log_jsonl else None)
+    # Stage event counts of this site only, even when sites share a process
+    run_counters = StageCounters()
+
+    # Wall time, rows and (optionally) peak memory of every stage; the adjust and
+    # salary stages record their own steps into the same report
+    run_report = RunReport(trace_memory=trace_memory, profile_stage=profile_stage, profile_dir=site_output)
+    timed = run_report.measure
+
+    try:
+        with counting(run_counters):
+            files = {kind: find_files(site_dir, kind_patterns) for kind, kind_patterns in patterns.items()}
+            summary['Files'] = files
+            if not files['timesheets'] or not files['payrate']:
+                raise FileNotFoundError(f"No timesheet or payrate workbooks found in {site_dir}")
+
+            # Every workbook must parse unless partial loads are allowed; either way
+            # the per-file report, with any failures, goes into the run summary
+            timesheet_df, timesheet_report = timed('load_timesheets', lambda: load_timesheets(
+                files['timesheets'], max_workers=load_workers, return_report=True, cache_dir=cache_dir, allow_partial=allow_partial))
+            schedule_df, schedule_report = timed('load_schedules', lambda: load_schedules(
+                files['schedules'], max_workers=load_workers, return_report=True, cache_dir=cache_dir, allow_partial=allow_partial))
+            workbooks = pd.concat([timesheet_report, schedule_report], ignore_index=True)
+            summary['Workbooks'] = workbooks.astype(object).where(workbooks.notna(), None).to_dict('records')
+            summary['Load Failures'] = [workbook for workbook in summary['Workbooks'] if workbook['Error'] is not None]
+            payrate_df = timed('load_payrate_list', lambda: load_payrate_list(files['payrate'][0]))
+            production_df = timed('load_production_report', lambda: load_production_report(files['production'][0] if files['production'] else None))
+            if files['holidays']:
+                holidays_df = timed('load_holidays', lambda: load_holiday_list(files['holidays'][0]))
+            else:
+                holidays_df = timed('load_holidays', lambda: load_public_holidays(start_date, last_period_end(start_date, num_periods)))
+
+            if timesheet_df.empty:
+                raise ValueError(f"No timesheet rows loaded from {site_dir}")
+
+            # Every source is resolved to the site's employee directory keys before any join
+            timesheet_df, schedule_df, payrate_df, production_df, unmatched = timed('resolve_employee_keys', lambda: resolve_employee_keys(
+                timesheet_df, schedule_df, payrate_df, production_df, os.path.join(site_output, 'employee_directory.npz')), rows_in=len(timesheet_df))
+
+            processed_timesheet, vacation_info, schedule_changes, schedule_alerts = adjust_timesheet_by_department(
+                timesheet_df, schedule_df, cache_dir, run_report)
+            salary_info, pay_components = calculate_periods(
+                processed_timesheet, holidays_df, production_df, payrate_df, start_date, num_periods,
+                hours_store_path=os.path.join(site_output, 'period_hours.npz'), run_report=run_report
+            )
+
+            report_path = os.path.join(site_output, f"Payroll_Report_{site.replace(os.sep, '_')}_{pd.Timestamp(start_date).date()}.xlsx")
+            payslip_dir = os.path.join(site_output, 'payslips') if payslips else None
+            timed('generate_excel_report', lambda: generate_excel_report(
+                salary_info, pay_components, processed_timesheet, vacation_info, schedule_changes, schedule_alerts, report_path,
+                payslip_dir=payslip_dir, max_workers=load_workers, unmatched_records=unmatched), rows_in=len(processed_timesheet))
+
+            summary.update({
+                'Report': report_path,
+                'Timesheet Rows': len(processed_timesheet),
+                'Employees': int(salary_info['Employee Number'].nunique()) if not salary_info.empty else 0,
+                'Periods': num_periods,
+                'Unmatched Records': len(unmatched)
+            })
+    except Exception as e:
+        summary['Status'] = 'failed'
+        summary['Error'] = str(e)
+        summary['Traceback'] = traceback.format_exc()
+    finally:
+        run_report.close()
+
+    summary['Stages'] = run_report.records()
+    summary['Timings'] = {stage['Stage']: stage['Seconds'] for stage in summary['Stages']}
+    summary['Total Seconds'] = round(sum(summary['Timings'].values()), 3)
+    if run_report.profile_path is not None:
+        summary['Profile'] = run_report.profile_path
+    summary['Counters'] = run_counters.to_dict()
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the payroll pipeline for one or more sites without the Streamlit UI.")
+    parser.add_argument('sites', nargs='+', help="Site directories containing the workbooks of each site")
+    parser.add_argument('--start-date', required=True, help="First day of the first biweekly period (YYYY-MM-DD)")
+    parser.add_argument('--periods', type=int, default=1, help="Number of consecutive biweekly periods to process")
+    parser.add_argument('--output-dir', default='reports', help="Where reports and run_summary.json are written")
+    parser.add_argument('--workers', type=int, default=None, help="Number of sites processed in parallel")
+    parser.add_argument('--payslips', action='store_true', help="Also write one payslip workbook per employee")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Reuse parsed workbooks and adjusted department partitions across runs from this directory")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Record the peak traced memory of each stage (slows the run down)")
+    parser.add_argument('--profile-stage', default=None, metavar='STAGE',
+                        help="Write a cProfile dump of this stage (e.g. combine_time) to the site's output directory")
+    parser.add_argument('--allow-partial', action='store_true',
+                        help="Continue without timesheet or schedule workbooks that fail to load (listed in run_summary.json)")
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="Console log level; DEBUG adds the per-employee salary trace")
+    parser.add_argument('--log-jsonl', action='store_true',
+                        help="Also write structured logs to payroll_log.jsonl in each site's output directory")
+    for kind, patterns in DEFAULT_PATTERNS.items():
+        parser.add_argument(f'--{kind}', nargs='+', default=patterns, metavar='GLOB',
+                            help=f"File patterns for {kind} workbooks (default: {' '.join(patterns)})")
+    args = parser.parse_args(argv)
+    try:
+        args.site_names = site_names(args.sites)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    sites = list(zip(args.sites, args.site_names))
+    patterns = {kind: getattr(args, kind) for kind in DEFAULT_PATTERNS}
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    workers = args.workers or min(len(args.sites), os.cpu_count() or 1)
+    # Parse workbooks in parallel only when the sites themselves run one at a time
+    load_workers = None if workers <= 1 else 1
+
+    site_options = {
+        'payslips': args.payslips,
+        'cache_dir': args.cache_dir,
+        'log_level': args.log_level,
+        'log_jsonl': args.log_jsonl,
+        'trace_memory': args.trace_memory,
+        'profile_stage': args.profile_stage,
+        'allow_partial': args.allow_partial
+    }
+
+    started = time.perf_counter()
+    if workers <= 1 or len(args.sites) <= 1:
+        summaries = [run_site(site_dir, patterns, args.start_date, args.periods, args.output_dir, load_workers, site=site, **site_options)
+                     for site_dir, site in sites]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_site, site_dir, patterns, args.start_date, args.periods, args.output_dir, load_workers,
+                                       site=site, **site_options)
+                       for site_dir, site in sites]
+            summaries = [future.result() for future in futures]
+
+    run_summary = {
+        'Start Date': args.start_date,
+        'Periods': args.periods,
+        'Workers': workers,
+        'Wall Seconds': round(time.perf_counter() - started, 3),
+        'Sites': summaries
+    }
+    summary_path = os.path.join(args.output_dir, 'run_summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(run_summary, f, indent=2, ensure_ascii=False)
+
+    for summary in summaries:
+        print(f"{summary['Site']}: {summary['Status']} in {summary['Total Seconds']}s" +
+              (f" ({summary['Error']})" if summary['Status'] != 'ok' else '') +
+              (f" ({len(summary['Load Failures'])} workbooks could not be loaded)" if summary.get('Load Failures') else ''))
+    print(f"Run summary written to {summary_path}")
+
+    return 0 if all(summary['Status'] == 'ok' for summary in summaries) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,79 +1,221 @@
 import pandas as pd
+import numpy as np
+import holidays
+import io
 import os
+import time
 from glob import glob
 from zipfile import BadZipFile
-from schedule_processing import process_timesheet, process_temp_timesheet, process_schedule
+from concurrent.futures import ProcessPoolExecutor
+import schedule_processing
+from workbook_cache import cached_parse
+from xlsx_stream import read_excel_streaming
+from payroll_logging import get_logger, stage_event
+from timesheet_schema import normalize_timesheet
+from workbook_columns import TIMESHEET_COLUMNS, TEMP_TIMESHEET_COLUMNS, SCHEDULE_COLUMNS
+
+logger = get_logger('data_loading')
+
+# Upper bound on parallel workbook parsers, whatever the core count
+MAX_LOAD_WORKERS = 8
+
+# Bump whenever a parser changes what it returns, so cached workbooks are re-parsed
+LOADER_VERSION = 1
+
+# 'openpyxl' reads the whole workbook with pandas; 'stream' uses the row-streaming reader
+EXCEL_READERS = ('openpyxl', 'stream')
+
+PARSER_COLUMNS = {
+    'process_timesheet': TIMESHEET_COLUMNS,
+    'process_temp_timesheet': TEMP_TIMESHEET_COLUMNS,
+    'process_schedule': SCHEDULE_COLUMNS
+}
+
+class WorkbookLoadError(Exception):
+    pass
+
+class InMemoryWorkbook(io.BytesIO):
+    # Workbook bytes held in memory, keeping the upload's file name for
+    # department and file type detection; picklable for worker processes
+    def __init__(self, data, name=''):
+        super().__init__(data)
+        self.name = name
+
+# Every loader accepts either a path or an in-memory workbook (BytesIO, a
+# Streamlit UploadedFile, bytes or memoryview), so uploads never touch disk.
+# Timesheets and schedules take their department and file type from the file
+# name, so in-memory ones must carry a name: wrap raw bytes or an unnamed
+# buffer as InMemoryWorkbook(data, name='Business Timesheet.xlsx').
+def is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+def source_name(source):
+    if is_path(source):
+        return os.fspath(source)
+    return getattr(source, 'name', '') or ''
+
+def require_names(sources, kind):
+    unnamed = [source for source in sources if not os.path.basename(source_name(source)).strip()]
+    if unnamed:
+        raise WorkbookLoadError(
+            f"{len(unnamed)} in-memory {kind} workbook(s) have no file name; the department is read from the name. "
+            f"Pass them as InMemoryWorkbook(data, name='<Department> {kind.capitalize()}.xlsx')"
+        )
+
+def as_workbook_source(source):
+    if is_path(source):
+        return os.fspath(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return InMemoryWorkbook(source)
+    source.seek(0)
+    return source
+
+def as_picklable_source(source):
+    # Uploaded file objects are copied into plain InMemoryWorkbooks before crossing a process boundary
+    if is_path(source) or type(source) is InMemoryWorkbook:
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return InMemoryWorkbook(source)
+    return InMemoryWorkbook(source.getbuffer(), source_name(source))
 
 # Data Loading functions
-def read_excel_safe(file_path, usecols):
-    if not os.path.exists(file_path):
-        print(f"File does not exist: {file_path}")
-        return pd.DataFrame()
-    
-    if not os.access(file_path, os.R_OK):
-        print(f"File is not readable: {file_path}")
+def read_excel_safe(file_path, usecols, strict=False, reader='openpyxl'):
+    # With strict=True problems are raised as WorkbookLoadError instead of
+    # being printed and swallowed as an empty DataFrame
+    def fail(message):
+        if strict:
+            raise WorkbookLoadError(message)
+        logger.warning(message)
         return pd.DataFrame()
+
+    name = source_name(file_path)
+    if is_path(file_path):
+        if not os.path.exists(file_path):
+            return fail(f"File does not exist: {name}")
+        
+        if not os.access(file_path, os.R_OK):
+            return fail(f"File is not readable: {name}")
+    file_path = as_workbook_source(file_path)
     
+    if reader not in EXCEL_READERS:
+        raise ValueError(f"Unknown Excel reader: {reader}")
+
     try:
+        if reader == 'stream':
+            return read_excel_streaming(file_path, usecols)
         return pd.read_excel(file_path, usecols=usecols, engine='openpyxl')
     except BadZipFile:
-        print(f"File is not a valid Excel file or is corrupted: {file_path}")
-        return pd.DataFrame()
+        return fail(f"File is not a valid Excel file or is corrupted: {name}")
     except ValueError as e:
-        print(f"Error reading {file_path}: {str(e)}")
-        return pd.DataFrame()
+        return fail(f"Error reading {name}: {str(e)}")
     except Exception as e:
-        print(f"Unexpected error reading {file_path}: {str(e)}")
-        return pd.DataFrame()
-
-def load_timesheets(file_paths):
-    all_timesheets = []
+        return fail(f"Unexpected error reading {name}: {str(e)}")
 
-    for file_path in file_paths:
-        # Check the filename to determine how to process the file
-        if 'Temp' in file_path:
-            df = process_temp_timesheet(file_path)
+def parse_workbook(parser, file_path, cache_dir=None, reader='openpyxl'):
+    # Runs in a worker process; failures are returned rather than raised so one
+    # bad upload does not take down the whole batch
+    started = time.perf_counter()
+    try:
+        if cache_dir is None:
+            df = parser(file_path, strict=True, reader=reader)
         else:
-            df = process_timesheet(file_path)
+            df = cached_parse(lambda: parser(file_path, strict=True, reader=reader), file_path, PARSER_COLUMNS.get(parser.__name__),
+                              f"{parser.__name__}:{reader}", LOADER_VERSION, cache_dir)
+        error = None
+    except Exception as e:
+        df = pd.DataFrame()
+        error = str(e)
+    return {
+        'File': source_name(file_path),
+        'Rows': len(df),
+        'Seconds': round(time.perf_counter() - started, 3),
+        'Error': error,
+        'Data': df
+    }
 
-        if not df.empty:
-            all_timesheets.append(df)
+def parse_workbooks(jobs, max_workers=None, cache_dir=None, reader='openpyxl'):
+    # jobs is a list of (parser, file_path); results come back in job order
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1, MAX_LOAD_WORKERS)
+
+    parsers = [parser for parser, _ in jobs]
+    file_paths = [file_path for _, file_path in jobs]
+    if max_workers <= 1 or len(jobs) <= 1:
+        results = list(map(parse_workbook, parsers, file_paths, [cache_dir] * len(jobs), [reader] * len(jobs)))
+    else:
+        file_paths = [as_picklable_source(file_path) for file_path in file_paths]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(parse_workbook, parsers, file_paths, [cache_dir] * len(jobs), [reader] * len(jobs)))
+
+    report = pd.DataFrame([{key: value for key, value in result.items() if key != 'Data'} for result in results],
+                          columns=['File', 'Rows', 'Seconds', 'Error'])
+    failed = report[report['Error'].notna()]
+    stage_event(logger, 'parse_workbooks', f"Parsed {len(report)} workbooks ({int(report['Rows'].sum())} rows)",
+                workbooks=len(report), rows=int(report['Rows'].sum()), failed=len(failed))
+    logger.debug("Workbook parse report:\n%s", report)
+    if not failed.empty:
+        logger.warning("%d of %d files could not be loaded:\n%s", len(failed), len(report),
+                       '\n'.join(f"  {failure['File']}: {failure['Error']}" for _, failure in failed.iterrows()))
+
+    return [result['Data'] for result in results], report
 
-    # Combine all timesheets into a single DataFrame
-    combined_timesheet = pd.concat(all_timesheets, ignore_index=True) if all_timesheets else pd.DataFrame()
+def require_parsed(report, kind, allow_partial=False):
+    # A workbook that failed to parse would silently drop its rows from the run,
+    # so failures are raised unless the caller opts in to partial loads
+    failed = report[report['Error'].notna()]
+    if failed.empty or allow_partial:
+        return
+    raise WorkbookLoadError(f"{len(failed)} of {len(report)} {kind} workbooks could not be loaded: " +
+                            '; '.join(f"{failure['File']}: {failure['Error']}" for _, failure in failed.iterrows()))
 
+def load_timesheets(file_paths, max_workers=None, return_report=False, cache_dir=None, reader='openpyxl', allow_partial=False):
+    require_names(file_paths, 'timesheet')
+    # Check the filename to determine how to process the file
+    jobs = [
+        (schedule_processing.process_temp_timesheet if 'Temp' in source_name(file_path) else schedule_processing.process_timesheet, file_path)
+        for file_path in file_paths
+    ]
+    frames, report = parse_workbooks(jobs, max_workers, cache_dir, reader)
+    require_parsed(report, 'timesheet', allow_partial)
+    all_timesheets = [df for df in frames if not df.empty]
+
+    # Combine all timesheets into a single DataFrame, typed once for every later stage
+    combined_timesheet = normalize_timesheet(pd.concat(all_timesheets, ignore_index=True)) if all_timesheets else pd.DataFrame()
+
+    if return_report:
+        return combined_timesheet, report
     return combined_timesheet
 
-def load_schedules(file_paths):
+def load_schedules(file_paths, max_workers=None, return_report=False, cache_dir=None, reader='openpyxl', allow_partial=False):
+    require_names(file_paths, 'schedule')
     all_schedules = []
 
-    for file in file_paths:
-        print(f"Processing schedule file: {file}")  # For debugging
-        df = process_schedule(file)
+    jobs = [(schedule_processing.process_schedule, file_path) for file_path in file_paths]
+    frames, report = parse_workbooks(jobs, max_workers, cache_dir, reader)
+    require_parsed(report, 'schedule', allow_partial)
+    for file, df in zip(file_paths, frames):
         if not df.empty:
             # Add a column to indicate the source file type
-            df['Source'] = 'Schedule-Export' if 'Schedule-Export' in file else 'Shift'
+            df['Source'] = 'Schedule-Export' if 'Schedule-Export' in source_name(file) else 'Shift'
             all_schedules.append(df)
 
     if all_schedules:
         combined_schedule = pd.concat(all_schedules, ignore_index=True)
-        print(f"Total schedules loaded: {len(all_schedules)}")  # For debugging
-        print(f"Combined schedule shape: {combined_schedule.shape}")  # For debugging
+        logger.debug("Total schedules loaded: %d, combined shape %s", len(all_schedules), combined_schedule.shape)
     else:
         combined_schedule = pd.DataFrame()
-        print("No schedules found or loaded.")  # For debugging
+        logger.info("No schedules found or loaded.")
 
+    if return_report:
+        return combined_schedule, report
     return combined_schedule
 
-def load_public_holidays(start_date):
-    print("\nLoading Public Holidays")
-    
-    # Extract year from start_date
-    year = int(start_date[:4])
-    print(f"Generating holidays for the year: {year}")
+def load_public_holidays(start_date, end_date=None):
+    # Every calendar year from start_date to end_date, so a run crossing New Year gets both years' holidays
+    years = list(range(pd.Timestamp(start_date).year, pd.Timestamp(end_date if end_date is not None else start_date).year + 1))
 
     # Create a Canada holidays object
-    ca_holidays = holidays.CA(years=year, prov='ON')  # Using Ontario for Civic Holiday
+    ca_holidays = holidays.CA(years=years, prov='ON')  # Using Ontario for Civic Holiday
 
     # List of holidays we want to include
     holiday_names = [
@@ -102,17 +244,34 @@ def load_public_holidays(start_date):
     # Ensure 'Date' column is datetime
     holidays_df['Date'] = pd.to_datetime(holidays_df['Date'])
 
-    print(f"Generated {len(holidays_df)} holidays for {year}")
+    stage_event(logger, 'load_holidays', f"Generated {len(holidays_df)} holidays for {', '.join(map(str, years))}", holidays=len(holidays_df))
+    return holidays_df
+
+def load_holiday_list(file_path):
+    # Holidays from a workbook with Date and Description columns, instead of the generated Ontario list
+    df = pd.read_excel(as_workbook_source(file_path))
+    holidays_df = pd.DataFrame({
+        'Date': pd.to_datetime(df['Date']),
+        'Description': df['Description'] if 'Description' in df.columns else ''
+    })
+    holidays_df = holidays_df.dropna(subset=['Date']).sort_values('Date').reset_index(drop=True)
+    stage_event(logger, 'load_holidays', f"Loaded {len(holidays_df)} holidays", holidays=len(holidays_df))
     return holidays_df
 
 def load_production_report(directory):
-    print("\nLoading Production Report")
-    production_files = glob(os.path.join(directory, '*Production Report*.xlsx'))
-    if not production_files:
-        print("No Production Report found.")
+    # directory is searched for a Production Report workbook; a workbook path or buffer is read directly
+    if directory is None:
+        logger.info("No Production Report found.")
         return pd.DataFrame()
 
-    df = pd.read_excel(production_files[0])
+    if is_path(directory) and os.path.isdir(directory):
+        production_files = glob(os.path.join(directory, '*Production Report*.xlsx'))
+        if not production_files:
+            logger.info("No Production Report found.")
+            return pd.DataFrame()
+        directory = production_files[0]
+
+    df = pd.read_excel(as_workbook_source(directory))
     df = df[['Date', 'Employee ID', 'Silver Bonus', 'Gold Bonus']]
     
     # Fill null values with 0
@@ -121,24 +280,20 @@ def load_production_report(directory):
     
     df['Bonus'] = df['Silver Bonus'] + df['Gold Bonus']
     df = df.groupby(['Date', 'Employee ID'])['Bonus'].sum().reset_index()
+    stage_event(logger, 'load_production_report', f"Loaded {len(df)} production bonus rows", rows=len(df))
     return df
 
-def load_payrate_list(file_path):
-    print("\nLoading Employee PayRate List")
-    df = pd.read_excel(file_path)
-    print("Columns in Employee PayRate List:")
-    print(df.columns.tolist())
+def load_payrate_list(file_path, cache_dir=None):
+    if cache_dir is None:
+        df = pd.read_excel(as_workbook_source(file_path))
+    else:
+        df = cached_parse(lambda: pd.read_excel(as_workbook_source(file_path)), file_path, None, 'load_payrate_list', LOADER_VERSION, cache_dir)
+    logger.debug("Columns in Employee PayRate List: %s", df.columns.tolist())
     
     # Replace empty strings with NaN
     df = df.replace(r'^\s*$', np.nan, regex=True)
     
-    # Check if 'Employee ID' column exists, if not, try to find a similar column
-    if 'Employee ID' not in df.columns:
-        possible_id_columns = [col for col in df.columns if 'id' in col.lower() or 'number' in col.lower()]
-        if possible_id_columns:
-            print(f"'Employee ID' column not found. Using '{possible_id_columns[0]}' as the Employee ID column.")
-            df = df.rename(columns={possible_id_columns[0]: 'Employee ID'})
-        else:
-            print("Warning: No column found that could be used as 'Employee ID'.")
+    # The id column is matched to the timesheets by employee_directory.resolve_employee_keys
     
+    stage_event(logger, 'load_payrate_list', f"Loaded {len(df)} payrate rows", rows=len(df))
     return df
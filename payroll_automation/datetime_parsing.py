@@ -0,0 +1,86 @@
+import re
+import functools
+import numpy as np
+import pandas as pd
+
+# Date and clock time parsing for the timesheet columns. Dates repeat heavily
+# (one value per day per file), so each distinct value is parsed once and
+# broadcast back through its factorized code. The date format of a file is
+# detected from a sample of its distinct values and cached, and timestamps are
+# built arithmetically as date + hours/minutes instead of going through text.
+
+# Tried in order; day-first layouts come before month-first, as with dayfirst=True
+DATE_FORMATS = ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y', '%d/%m/%y',
+                '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M']
+FORMAT_SAMPLE_SIZE = 50
+
+# Same clock times '%H:%M' accepts: one or two digit hours and minutes
+CLOCK_TIME = re.compile(r'^(\d{1,2}):(\d{1,2})$')
+
+@functools.lru_cache(maxsize=256)
+def detect_date_format(samples):
+    # First format that parses every sample, or None to fall back to mixed parsing
+    for date_format in DATE_FORMATS:
+        if pd.to_datetime(pd.Series(samples, dtype=object), format=date_format, errors='coerce').notna().all():
+            return date_format
+    return None
+
+def broadcast(parsed, codes, missing):
+    # Values of the distinct entries back onto every row; code -1 (missing) picks the trailing missing value
+    return np.append(parsed, np.array([missing], dtype=parsed.dtype))[codes]
+
+def parse_dates(values):
+    # Dates of one source file to datetime64[ns]
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('datetime64[ns]')
+
+    codes, uniques = pd.factorize(values.astype(object))
+    uniques = pd.Series(uniques, dtype=object)
+    is_text = uniques.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+
+    if is_text.any():
+        text = uniques[is_text]
+        date_format = detect_date_format(tuple(sorted(text)[:FORMAT_SAMPLE_SIZE]))
+        dates = pd.to_datetime(text, format=date_format, errors='coerce') if date_format else pd.Series(pd.NaT, index=text.index)
+        # Values outside the sample that do not fit the detected format get the general parser
+        unparsed = dates.isna()
+        if unparsed.any():
+            dates[unparsed] = pd.to_datetime(text[unparsed], format='mixed', dayfirst=True)
+        parsed[is_text] = dates.astype('datetime64[ns]')
+    if (~is_text).any():
+        # Cells Excel already typed as dates
+        parsed[~is_text] = pd.to_datetime(uniques[~is_text]).astype('datetime64[ns]')
+
+    return pd.Series(broadcast(parsed.to_numpy(), codes, np.datetime64('NaT', 'ns')), index=values.index)
+
+def parse_dates_by_source(values, sources):
+    # Formats are detected per source file; every department comes from its own workbook
+    if sources is None:
+        return parse_dates(values)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for rows in sources.groupby(sources, observed=True, dropna=False, sort=False).indices.values():
+        parsed.iloc[rows] = parse_dates(values.iloc[rows]).to_numpy()
+    return parsed
+
+def clock_offsets(uniques):
+    # Offset from midnight of each distinct clock time; NaT where it is not a valid 'H:MM'
+    seconds = np.full(len(uniques), np.nan)
+    for i, value in enumerate(uniques):
+        if isinstance(value, str):
+            match = CLOCK_TIME.match(value)
+            if match and int(match.group(1)) < 24 and int(match.group(2)) < 60:
+                seconds[i] = int(match.group(1)) * 3600 + int(match.group(2)) * 60
+        elif hasattr(value, 'hour') and hasattr(value, 'minute'):
+            # Cells Excel already typed as times
+            seconds[i] = value.hour * 3600 + value.minute * 60 + getattr(value, 'second', 0)
+    return pd.to_timedelta(seconds, unit='s').to_numpy(dtype='timedelta64[ns]')
+
+def parse_clock_times(values):
+    # At most 1440 distinct 'H:MM' values, whatever the number of rows
+    codes, uniques = pd.factorize(values.astype(object))
+    return pd.Series(broadcast(clock_offsets(uniques), codes, np.timedelta64('NaT', 'ns')), index=values.index)
+
+def combine_date_time(dates, times):
+    # Day of the date plus the clock time; NaT when either part is missing or invalid
+    return dates.dt.normalize() + parse_clock_times(times)
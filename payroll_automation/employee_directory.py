@@ -0,0 +1,247 @@
+import os
+import numpy as np
+import pandas as pd
+from payroll_logging import get_logger, stage_event
+from store_lock import store_lock
+
+logger = get_logger('employee_directory')
+
+# Persistent employee directory. Every employee gets a stable integer key and
+# the directory keeps one row per alias of that key: the employee id, each
+# "first last" name variant seen in the timesheets and, for Temp workers (who
+# share their team's number in the timesheets), the name under their team.
+# Timesheets, schedules, the payrate list and the production report are all
+# resolved to the key through hash lookups on these aliases, so later joins are
+# integer joins. Keys are never reassigned; a run only appends new employees
+# and aliases, and the store is saved like the period hours store, one store
+# per site, under a lock. Names are not unique over time (a new hire may share
+# a leaver's name), so schedule names are only resolved against the employees
+# of the current timesheets.
+
+DIRECTORY_COLUMNS = ['Employee Key', 'Alias Type', 'Alias', 'Employee Number', 'Department', 'Team']
+UNMATCHED_COLUMNS = ['Source', 'Identifier', 'Name', 'Department', 'Rows', 'Reason']
+IDENTITY_COLUMNS = ['Employee Number', 'First name', 'Last name', 'Department']
+TEMP_DEPARTMENT = 'Temp'
+
+# Resolved keys of records with no alias in the directory, or whose name belongs to several employees
+UNMATCHED = -1
+AMBIGUOUS = -2
+
+def empty_directory():
+    return pd.DataFrame({
+        'Employee Key': pd.Series(dtype='int64'),
+        **{column: pd.Series(dtype=object) for column in DIRECTORY_COLUMNS[1:]}
+    })
+
+def load_employee_directory(path):
+    if path is None or not os.path.exists(path):
+        return empty_directory()
+
+    with np.load(path, allow_pickle=False) as store:
+        directory = pd.DataFrame({
+            'Employee Key': store['key'].astype('int64'),
+            **{column: store[column.lower().replace(' ', '_')].astype(object) for column in DIRECTORY_COLUMNS[1:]}
+        })
+    # Missing values are stored as empty strings
+    directory = directory.replace('', None)
+    logger.info("Loaded %d aliases of %d employees from %s", len(directory), directory['Employee Key'].nunique(), path)
+    return directory
+
+def save_employee_directory(path, directory):
+    # Write to a temporary file first so an interrupted run never corrupts the store
+    temp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(temp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            key=directory['Employee Key'].to_numpy(dtype='int64'),
+            **{column.lower().replace(' ', '_'): directory[column].fillna('').astype(str).to_numpy(dtype=str)
+               for column in DIRECTORY_COLUMNS[1:]}
+        )
+    os.replace(temp_path, path)
+
+def id_text(value):
+    # Ids read as numbers (101 or 101.0) match the same id read as text
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def normalize_ids(values):
+    return pd.Series([id_text(value) for value in values], dtype=object)
+
+def normalize_names(values):
+    # Case, surrounding and repeated whitespace do not distinguish people
+    return pd.Series(values, dtype=object).astype(str).str.casefold().str.split().str.join(' ')
+
+def full_names(first, last):
+    return first.astype(object).fillna('').astype(str) + ' ' + last.astype(object).fillna('').astype(str)
+
+def alias_index(directory, alias_types):
+    # Hash index from alias to key; an alias shared by several keys resolves to AMBIGUOUS
+    aliases = directory.loc[directory['Alias Type'].isin(alias_types), ['Alias', 'Employee Key']].drop_duplicates()
+    shared = aliases['Alias'].duplicated(keep=False)
+    keys = aliases['Employee Key'].where(~shared, AMBIGUOUS)
+    unique = ~aliases['Alias'].duplicated()
+    return pd.Series(keys[unique].to_numpy(dtype='int64'), index=pd.Index(aliases.loc[unique, 'Alias']))
+
+def resolve(index, values, normalize):
+    # Each distinct value is normalized and looked up once; missing values stay UNMATCHED
+    codes, uniques = pd.factorize(pd.Series(values).astype(object))
+    positions = index.index.get_indexer(normalize(uniques)) if len(uniques) else np.array([], dtype='int64')
+    keys = np.where(positions >= 0, index.to_numpy()[positions], UNMATCHED) if len(index) else np.full(len(uniques), UNMATCHED)
+    # codes of missing values are -1, which picks the trailing UNMATCHED
+    return np.append(keys, UNMATCHED).astype('int64')[codes]
+
+def timesheet_identities(timesheet_df):
+    # Distinct (number, name, department) rows of the timesheet and the identity of every row
+    groups = timesheet_df.groupby(IDENTITY_COLUMNS, sort=False, dropna=False, observed=True)
+    identities = groups.size().index.to_frame(index=False)
+    is_temp = identities['Department'].astype(object).eq(TEMP_DEPARTMENT)
+    return groups.ngroup().to_numpy(), pd.DataFrame({
+        'Id': normalize_ids(identities['Employee Number'].astype(object)).where(~is_temp & identities['Employee Number'].notna().to_numpy()),
+        'Name': normalize_names(full_names(identities['First name'], identities['Last name'])),
+        'Department': identities['Department'].astype(object).to_numpy(),
+        'Team': identities['Employee Number'].astype(object).where(is_temp).to_numpy(),
+        'Temp': is_temp.to_numpy()
+    })
+
+def payrate_id_column(payrate_df, known_ids):
+    # 'Employee ID' when present, otherwise the column whose values match the most timesheet employee numbers
+    if 'Employee ID' in payrate_df.columns:
+        return 'Employee ID'
+    matches = {column: int(normalize_ids(payrate_df[column].dropna()).isin(known_ids).sum()) for column in payrate_df.columns}
+    best = max(matches, key=matches.get, default=None)
+    return best if best is not None and matches[best] > 0 else None
+
+def identity_keys(directory, identities):
+    # Keys of already known identities: by id for employees, by name under their team for Temp workers
+    keys = np.full(len(identities), UNMATCHED, dtype='int64')
+    has_id = identities['Id'].notna().to_numpy()
+    keys[has_id] = resolve(alias_index(directory, ['id']), identities.loc[has_id, 'Id'], normalize_ids)
+    is_temp = identities['Temp'].to_numpy()
+    keys[is_temp] = resolve(alias_index(directory, ['temp']), identities.loc[is_temp, 'Name'], normalize_names)
+    return keys
+
+def update_employee_directory(directory, identities, payrate_ids):
+    # Adds the employees and aliases not seen before; existing keys never change
+    candidates = pd.concat([
+        identities[['Id', 'Name', 'Department', 'Team', 'Temp']],
+        pd.DataFrame({'Id': normalize_ids(payrate_ids), 'Name': None, 'Department': None, 'Team': None, 'Temp': False})
+    ], ignore_index=True)
+    candidates = candidates[candidates['Id'].notna() | candidates['Temp']].reset_index(drop=True)
+
+    keys = identity_keys(directory, candidates)
+    new = keys == UNMATCHED
+    if new.any():
+        # One new key per distinct id, or per distinct Temp name
+        identity = candidates['Id'].where(candidates['Id'].notna(), 'temp:' + candidates['Name'].astype(str))
+        codes, _ = pd.factorize(identity[new])
+        next_key = int(directory['Employee Key'].max()) + 1 if not directory.empty else 0
+        keys[new] = next_key + codes
+    candidates['Employee Key'] = keys
+
+    employees = candidates[~candidates['Temp']]
+    temps = candidates[candidates['Temp']]
+    aliases = [
+        pd.DataFrame({'Employee Key': employees['Employee Key'], 'Alias Type': 'id', 'Alias': employees['Id'],
+                      'Employee Number': employees['Id'], 'Department': employees['Department'], 'Team': None}),
+        pd.DataFrame({'Employee Key': employees['Employee Key'], 'Alias Type': 'name', 'Alias': employees['Name'],
+                      'Employee Number': employees['Id'], 'Department': employees['Department'], 'Team': None}),
+        pd.DataFrame({'Employee Key': temps['Employee Key'], 'Alias Type': 'temp', 'Alias': temps['Name'],
+                      'Employee Number': None, 'Department': temps['Department'], 'Team': temps['Team']})
+    ]
+    aliases = pd.concat(aliases, ignore_index=True)
+    aliases = aliases[aliases['Alias'].notna() & aliases['Alias'].ne('')]
+
+    updated = pd.concat([directory, aliases], ignore_index=True)
+    updated = updated.drop_duplicates(['Employee Key', 'Alias Type', 'Alias', 'Team'], keep='first').reset_index(drop=True)
+    updated['Employee Key'] = updated['Employee Key'].astype('int64')
+
+    new_employees = updated['Employee Key'].nunique() - (directory['Employee Key'].nunique() if not directory.empty else 0)
+    stage_event(logger, 'employee_directory', f"Directory has {updated['Employee Key'].nunique()} employees ({new_employees} new)",
+                employees=int(updated['Employee Key'].nunique()), new_employees=int(new_employees),
+                new_aliases=len(updated) - len(directory))
+    return updated
+
+def unmatched_group(source, reason, df, identifier, name=None, department=None):
+    # One row per distinct unmatched identifier with its row count
+    if df.empty:
+        return pd.DataFrame(columns=UNMATCHED_COLUMNS)
+    frame = pd.DataFrame({
+        'Identifier': df[identifier].astype(object).to_numpy(),
+        'Name': df[name].astype(object).to_numpy() if name is not None else None,
+        'Department': df[department].astype(object).to_numpy() if department is not None else None
+    })
+    grouped = frame.groupby(['Identifier', 'Name', 'Department'], dropna=False, sort=True).size().reset_index(name='Rows')
+    grouped.insert(0, 'Source', source)
+    grouped['Reason'] = reason
+    return grouped[UNMATCHED_COLUMNS]
+
+def unmatched_records(timesheet_df, schedule_df, payrate_df, production_df):
+    # Every record that could not be joined to another source, in a single report
+    timesheet_keys = timesheet_df['Employee Key'].unique() if 'Employee Key' in timesheet_df.columns else []
+    payrate_keys = payrate_df['Employee Key'].unique() if 'Employee Key' in payrate_df.columns else []
+
+    employees = timesheet_df[~timesheet_df['Department'].astype(object).eq(TEMP_DEPARTMENT)] if not timesheet_df.empty else timesheet_df
+    groups = []
+    if not employees.empty:
+        no_payrate = employees[~employees['Employee Key'].isin(payrate_keys)].assign(
+            **{'Full Name': lambda df: full_names(df['First name'], df['Last name'])})
+        groups.append(unmatched_group('Timesheet', 'No payrate record', no_payrate, 'Employee Number', 'Full Name', 'Department'))
+    if 'Employee Key' in payrate_df.columns and 'Employee ID' in payrate_df.columns:
+        groups.append(unmatched_group('Payrate', 'Missing employee id', payrate_df[payrate_df['Employee Key'].eq(UNMATCHED)], 'Employee ID'))
+        groups.append(unmatched_group('Payrate', 'No timesheet rows',
+                                      payrate_df[payrate_df['Employee Key'].ge(0) & ~payrate_df['Employee Key'].isin(timesheet_keys)], 'Employee ID'))
+    if schedule_df is not None and 'Employee Key' in schedule_df.columns:
+        groups.append(unmatched_group('Schedule', 'No employee with this name in the timesheets', schedule_df[schedule_df['Employee Key'].eq(UNMATCHED)], 'Users'))
+        groups.append(unmatched_group('Schedule', 'Name shared by several employees', schedule_df[schedule_df['Employee Key'].eq(AMBIGUOUS)], 'Users'))
+    if production_df is not None and 'Employee Key' in production_df.columns:
+        groups.append(unmatched_group('Production', 'Not in directory', production_df[production_df['Employee Key'].eq(UNMATCHED)], 'Employee ID'))
+
+    groups = [group for group in groups if not group.empty]
+    if not groups:
+        return pd.DataFrame(columns=UNMATCHED_COLUMNS)
+    return pd.concat(groups, ignore_index=True)
+
+def resolve_employee_keys(timesheet_df, schedule_df, payrate_df, production_df, directory_path=None):
+    # Adds an integer 'Employee Key' column to every source and reports what could not be matched.
+    # The directory is read from and saved back to directory_path when given.
+    identity_codes, identities = timesheet_identities(timesheet_df)
+
+    payrate_df = payrate_df.copy(deep=False)
+    id_column = payrate_id_column(payrate_df, set(identities['Id'].dropna()))
+    if id_column is None:
+        logger.warning("No payrate column matches the timesheet employee numbers; payrate rows stay unmatched.")
+        payrate_ids = pd.Series(dtype=object)
+    else:
+        if id_column != 'Employee ID':
+            logger.warning("'Employee ID' column not found. Matched payrate rows on '%s'.", id_column)
+            payrate_df = payrate_df.rename(columns={id_column: 'Employee ID'})
+        payrate_ids = payrate_df['Employee ID'].dropna()
+
+    # Concurrent runs of the same site would otherwise lose each other's new employees
+    with store_lock(directory_path):
+        directory = update_employee_directory(load_employee_directory(directory_path), identities, payrate_ids)
+        if directory_path is not None:
+            save_employee_directory(directory_path, directory)
+
+    ids = alias_index(directory, ['id'])
+    identity_key = identity_keys(directory, identities)
+    timesheet_df = timesheet_df.copy(deep=False)
+    timesheet_df['Employee Key'] = identity_key[identity_codes].astype('int32')
+    payrate_df['Employee Key'] = resolve(ids, payrate_df['Employee ID'], normalize_ids) if id_column is not None else UNMATCHED
+
+    if schedule_df is not None and 'Users' in schedule_df.columns:
+        # Only names of employees in these timesheets; a leaver's name never shadows a new hire's
+        current = directory[directory['Employee Key'].isin(identity_key[identity_key >= 0])]
+        schedule_df = schedule_df.copy(deep=False)
+        schedule_df['Employee Key'] = resolve(alias_index(current, ['name', 'temp']), schedule_df['Users'], normalize_names)
+    if production_df is not None and 'Employee ID' in production_df.columns:
+        production_df = production_df.copy(deep=False)
+        production_df['Employee Key'] = resolve(ids, production_df['Employee ID'], normalize_ids)
+
+    unmatched = unmatched_records(timesheet_df, schedule_df, payrate_df, production_df)
+    stage_event(logger, 'employee_directory', f"{len(unmatched)} unmatched identifiers across all sources",
+                unmatched=len(unmatched), unmatched_rows=int(unmatched['Rows'].sum()) if not unmatched.empty else 0)
+    logger.debug("Unmatched records:\n%s", unmatched)
+    return timesheet_df, schedule_df, payrate_df, production_df, unmatched
@@ -0,0 +1,496 @@
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import reference_engines
+from data_loading import load_timesheets, load_schedules, load_payrate_list, load_production_report, load_holiday_list, load_public_holidays
+from time_adjustments import process_vacations, combine_time, adjust_business_hours, update_from_schedule
+from salary_calculation import adjust_timesheet, calculate_salary, last_period_end
+from period_hours import empty_period_hours, period_hours_records, upsert_period_hours, previous_biweekly_hours
+from employee_directory import resolve_employee_keys
+from timesheet_schema import enforce_timesheet_schema
+from benchmark import parse_scale, site_files, START_DATE, DEFAULT_DATA_DIR
+from cli import DEFAULT_PATTERNS, find_files
+
+# Golden-output equivalence of the optimized engines against the baseline
+# engines in reference_engines.py:
+#   python equivalence.py --scale 100x1 1000x2
+#   python equivalence.py --site exports/site_a_anonymized --start-date 2024-12-16 --periods 2
+# The reference chain runs on what the baseline loaders read from the raw
+# workbooks, the optimized chain on what the current loaders read, and each
+# check compares one stage: combine_time, update_from_schedule and the salary
+# calculation, period by period. Every adjusted timestamp and every pay
+# component is compared; money must agree to the cent and hours to a second.
+# The baseline's holiday pay lives in a function its salary engine can no
+# longer reach, so the harness hands that function back to it. Differences the
+# optimized engines make on purpose are marked expected with their reason; a
+# pay difference they cause is expected only when the reference engine, rerun
+# on the optimized timesheet, gives the optimized value. Differences are
+# written per dataset and engine to the output directory, and the run exits
+# with status 1 when any check has an unexpected difference. Real sites should
+# be anonymized exports; --mask-ids also hashes employee numbers and names in
+# the written differences.
+
+MONEY_TOLERANCE = 0.005
+HOURS_TOLERANCE = 1 / 3600
+DEFAULT_OUTPUT_DIR = os.path.join('temp', 'equivalence')
+
+# Rows are matched on the employee and the punch they start from; repeated keys are matched in order
+TIMESHEET_KEYS = ['Employee Number', 'First name', 'Last name', 'Start Datetime']
+TIMESHEET_COLUMNS = {
+    'End Datetime': 0,
+    'Adjusted Start Datetime': 0,
+    'Adjusted End Datetime': 0,
+    'Working Hours': HOURS_TOLERANCE
+}
+SALARY_KEYS = ['Period Start', 'Employee Number']
+SALARY_COLUMNS = {
+    'Total Hours': HOURS_TOLERANCE,
+    'Working Days': 0,
+    'Salary': MONEY_TOLERANCE,
+    'Regular Pay': MONEY_TOLERANCE,
+    'Overtime Pay': MONEY_TOLERANCE,
+    'Bonus': MONEY_TOLERANCE,
+    'Total Compensation': MONEY_TOLERANCE
+}
+IDENTITY_COLUMNS = ['Employee Number', 'First name', 'Last name']
+
+# Deliberate changes of the optimized engines, reported instead of patched into the reference
+MIDNIGHT_MERGE = "baseline combine_time keeps the second half of a midnight merge on an employee's last record"
+ISO_DATES = "baseline reads ISO dates day-first"
+OT_RATE_FALLBACK = "optimized holiday pay uses the REG rate when the OT rate is missing, as base pay does; the baseline gives NaN"
+UNMATCHED_HOLIDAY = "optimized holiday pay is 0 for employees without payrate data; the baseline gives NaN"
+
+SUMMARY_COLUMNS = ['Dataset', 'Engine', 'Reference Rows', 'Optimized Rows', 'Compared', 'Differences', 'Expected Differences',
+                   'Max Difference', 'Reference Seconds', 'Optimized Seconds', 'Speedup', 'Status']
+DIFF_COLUMNS = ['Column', 'Reference', 'Optimized', 'Difference', 'Expected']
+
+def timed(compute):
+    started = time.perf_counter()
+    result = compute()
+    return result, time.perf_counter() - started
+
+def keyed(df, keys, columns):
+    # Plain key values plus the occurrence of each key, so duplicates pair up in order
+    df = df[keys + columns].copy()
+    for key in keys:
+        if isinstance(df[key].dtype, pd.CategoricalDtype) or df[key].dtype == object:
+            df[key] = df[key].astype(object).where(df[key].notna(), None).map(lambda value: None if value is None else str(value))
+    df['Occurrence'] = df.groupby(keys, dropna=False, sort=False).cumcount()
+    return df
+
+def values_differ(reference, optimized, tolerance):
+    both_missing = reference.isna() & optimized.isna()
+    if pd.api.types.is_datetime64_any_dtype(reference) or pd.api.types.is_datetime64_any_dtype(optimized):
+        equal = pd.to_datetime(reference) == pd.to_datetime(optimized)
+        difference = (pd.to_datetime(optimized) - pd.to_datetime(reference)).dt.total_seconds() / 3600
+    else:
+        difference = optimized.astype(float) - reference.astype(float)
+        equal = difference.abs() <= tolerance
+    return ~(equal | both_missing), difference
+
+def compare_frames(reference, optimized, keys, columns):
+    # Long table of every differing value, plus rows present in only one output
+    columns = {column: tolerance for column, tolerance in columns.items()
+               if column in reference.columns and column in optimized.columns}
+    merged = pd.merge(keyed(reference, keys, list(columns)), keyed(optimized, keys, list(columns)),
+                      on=keys + ['Occurrence'], how='outer', suffixes=(' (reference)', ' (optimized)'), indicator=True)
+    matched = merged['_merge'] == 'both'
+
+    diffs = []
+    max_difference = 0.0
+    for column, tolerance in columns.items():
+        differ, difference = values_differ(merged.loc[matched, f"{column} (reference)"], merged.loc[matched, f"{column} (optimized)"], tolerance)
+        if differ.any():
+            rows = merged.loc[differ[differ].index]
+            diffs.append(pd.DataFrame({
+                **{key: rows[key] for key in keys},
+                'Column': column,
+                'Reference': rows[f"{column} (reference)"].astype(str),
+                'Optimized': rows[f"{column} (optimized)"].astype(str),
+                'Difference': difference[differ]
+            }))
+            max_difference = max(max_difference, float(difference[differ].abs().max()))
+
+    only = merged[~matched]
+    if not only.empty:
+        diffs.append(pd.DataFrame({
+            **{key: only[key] for key in keys},
+            'Column': '(row)',
+            'Reference': np.where(only['_merge'] == 'left_only', 'present', 'missing'),
+            'Optimized': np.where(only['_merge'] == 'right_only', 'present', 'missing'),
+            'Difference': np.nan
+        }))
+
+    diffs = pd.concat(diffs, ignore_index=True) if diffs else pd.DataFrame(columns=keys + DIFF_COLUMNS)
+    diffs['Expected'] = ''
+    return diffs, int(matched.sum()) * len(columns), max_difference
+
+def kept_merge_segments(reference):
+    # Rows the baseline should have merged away: they start at midnight and end
+    # with the record before them, whose end was already extended to theirs
+    previous = reference.shift(1)
+    same_employee = (reference[IDENTITY_COLUMNS] == previous[IDENTITY_COLUMNS]).all(axis=1)
+    start = reference['Adjusted Start Datetime']
+    kept = same_employee & (start == start.dt.normalize()) & (reference['Adjusted End Datetime'] == previous['Adjusted End Datetime'])
+    return reference.loc[kept, TIMESHEET_KEYS]
+
+def swapped_day_month(stamps):
+    # The timestamps with day and month exchanged, NaT where that is no date
+    return pd.to_datetime(pd.DataFrame({'year': stamps.dt.year, 'month': stamps.dt.day, 'day': stamps.dt.month}), errors='coerce') + \
+        (stamps - stamps.dt.normalize())
+
+def mark_rows(diffs, rows, side, reason):
+    # Marks the row-only differences present on one side that match the given rows
+    rows = keyed(rows, TIMESHEET_KEYS, [])[TIMESHEET_KEYS]
+    candidates = keyed(diffs, TIMESHEET_KEYS, [])[TIMESHEET_KEYS]
+    present = diffs['Column'].eq('(row)') & diffs[side].eq('present')
+    matches = candidates.reset_index().merge(rows.drop_duplicates(), on=TIMESHEET_KEYS)['index']
+    diffs.loc[present & diffs.index.isin(matches), 'Expected'] = reason
+
+def mark_timesheet_diffs(diffs, kept_segments):
+    # Kept segments are found on the combine_time output; later stages may move their start off midnight
+    mark_rows(diffs, kept_segments, 'Reference', MIDNIGHT_MERGE)
+    # A date read day-first by the baseline leaves the row only in the reference
+    # output, with its day and month swapped relative to the optimized row
+    rows = diffs['Column'].eq('(row)')
+    reference_only = diffs[rows & diffs['Reference'].eq('present')]
+    optimized_only = diffs[rows & diffs['Optimized'].eq('present')]
+    swapped = reference_only.assign(**{'Start Datetime': swapped_day_month(pd.to_datetime(reference_only['Start Datetime']))})
+    matched = keyed(swapped, TIMESHEET_KEYS, []).merge(keyed(optimized_only, TIMESHEET_KEYS, [])[TIMESHEET_KEYS].drop_duplicates(), on=TIMESHEET_KEYS)
+    mark_rows(diffs, reference_only[reference_only['Start Datetime'].isin(swapped_day_month(matched['Start Datetime']))], 'Reference', ISO_DATES)
+    mark_rows(diffs, matched, 'Optimized', ISO_DATES)
+    # A row whose start date reads the same either way can still have its end date swapped
+    ends = diffs[diffs['Column'].eq('End Datetime')]
+    swapped_end = pd.to_datetime(ends['Reference']) == swapped_day_month(pd.to_datetime(ends['Optimized']))
+    swapped_rows = keyed(ends[swapped_end], TIMESHEET_KEYS, [])[TIMESHEET_KEYS].drop_duplicates()
+    rows = keyed(diffs, TIMESHEET_KEYS, [])[TIMESHEET_KEYS].reset_index().merge(swapped_rows, on=TIMESHEET_KEYS)['index']
+    diffs.loc[diffs.index.isin(rows) & ~diffs['Column'].eq('(row)') & diffs['Expected'].eq(''), 'Expected'] = ISO_DATES
+    # Swapped dates also reorder the baseline's records, breaking its midnight pairs for the rest of that employee
+    identity = keyed(diffs, IDENTITY_COLUMNS, [])[IDENTITY_COLUMNS].apply(tuple, axis=1)
+    swapped_employees = set(identity[diffs['Expected'].eq(ISO_DATES)])
+    diffs.loc[identity.isin(swapped_employees) & diffs['Expected'].eq(''), 'Expected'] = ISO_DATES
+    return diffs
+
+def expected_employees(results):
+    # Reason per employee number of the expected timesheet differences, for the pay they carry into
+    reasons = {}
+    for _, diffs in results:
+        for employee, reason in diffs.loc[diffs['Expected'] != '', ['Employee Number', 'Expected']].itertuples(index=False):
+            reasons.setdefault(str(employee), reason)
+    return reasons
+
+def reproduced_by(diffs, rerun, columns):
+    # Whether a rerun of the reference gives each differing optimized value
+    present = keyed(rerun, SALARY_KEYS, [])[SALARY_KEYS].drop_duplicates().assign(Present=True)
+    values = keyed(rerun, SALARY_KEYS, [column for column in columns if column in rerun.columns])
+    values = values.melt(id_vars=SALARY_KEYS + ['Occurrence'], var_name='Column', value_name='Rerun')
+    values = values[values['Occurrence'].eq(0)].drop(columns='Occurrence')
+    keys = keyed(diffs, SALARY_KEYS, ['Column', 'Optimized']).reset_index()
+    keys = keys.merge(present, on=SALARY_KEYS, how='left').merge(values, on=SALARY_KEYS + ['Column'], how='left').set_index('index')
+
+    rows = keys['Column'].eq('(row)')
+    row_present = keys['Present'].fillna(False).astype(bool)
+    row_reproduced = row_present.eq(keys['Optimized'].eq('present'))
+    optimized = pd.to_numeric(keys['Optimized'].where(~rows), errors='coerce')
+    rerun_values = pd.to_numeric(keys['Rerun'], errors='coerce')
+    tolerance = keys['Column'].map(columns).fillna(0)
+    value_reproduced = ((rerun_values - optimized).abs() <= tolerance) | (rerun_values.isna() & optimized.isna() & row_present)
+    return pd.Series(np.where(rows, row_reproduced, value_reproduced), index=keys.index).reindex(diffs.index, fill_value=False)
+
+def mark_reproduced(diffs, reasons, rerun, columns):
+    explained = diffs['Expected'].eq('') & reasons.ne('') & reproduced_by(diffs, rerun, columns)
+    diffs.loc[explained, 'Expected'] = reasons[explained]
+
+def mark_salary_diffs(diffs, employee_reasons, reruns, unpaid, columns):
+    # Pay of an employee whose timesheet differs on purpose is expected to differ,
+    # but only by what the reference engine itself computes from the corrected rows
+    reasons = diffs['Employee Number'].map(lambda employee: employee_reasons.get(str(employee), '') if pd.notna(employee) else '')
+    mark_reproduced(diffs, reasons, reruns['corrected'], columns)
+    # Holiday pay the baseline leaves NaN: a missing OT rate must give what the
+    # reference gives with the REG rate filled in, no payrate data must give 0
+    missing = diffs['Column'].str.startswith('Holiday ') & pd.to_numeric(diffs['Reference'], errors='coerce').isna()
+    mark_reproduced(diffs, pd.Series(np.where(missing, OT_RATE_FALLBACK, ''), index=diffs.index), reruns['ot_filled'], columns)
+    employees = keyed(diffs, SALARY_KEYS, [])[SALARY_KEYS].apply(tuple, axis=1)
+    zero = pd.to_numeric(diffs['Optimized'], errors='coerce').eq(0)
+    diffs.loc[missing & zero & employees.isin(unpaid) & diffs['Expected'].eq(''), 'Expected'] = UNMATCHED_HOLIDAY
+    return diffs
+
+def check_result(dataset, engine, reference, optimized, keys, columns, reference_seconds, optimized_seconds, mark=None, extra_diffs=None):
+    diffs, compared, max_difference = compare_frames(reference, optimized, keys, columns)
+    if extra_diffs is not None and not extra_diffs.empty:
+        diffs = pd.concat([diffs, extra_diffs], ignore_index=True)
+    if mark is not None and not diffs.empty:
+        diffs = mark(diffs)
+    unexpected = int(diffs['Expected'].eq('').sum())
+    summary = {
+        'Dataset': dataset,
+        'Engine': engine,
+        'Reference Rows': len(reference),
+        'Optimized Rows': len(optimized),
+        'Compared': compared,
+        'Differences': len(diffs),
+        'Expected Differences': len(diffs) - unexpected,
+        'Max Difference': round(max_difference, 6),
+        'Reference Seconds': round(reference_seconds, 4),
+        'Optimized Seconds': round(optimized_seconds, 4),
+        'Speedup': round(reference_seconds / optimized_seconds, 1) if reference_seconds > 0 and optimized_seconds > 0 else None,
+        'Status': 'equal' if diffs.empty else ('expected' if unexpected == 0 else 'DIFF')
+    }
+    return summary, diffs
+
+def check_combine_time(dataset, reference_input, optimized_input):
+    reference, reference_seconds = timed(lambda: reference_engines.combine_time(reference_input))
+    optimized, optimized_seconds = timed(lambda: combine_time(optimized_input))
+    result = check_result(dataset, 'combine_time', reference, optimized, TIMESHEET_KEYS, TIMESHEET_COLUMNS, reference_seconds, optimized_seconds,
+                          mark=lambda diffs: mark_timesheet_diffs(diffs, kept_merge_segments(reference)))
+    return result, reference, optimized
+
+def check_update_from_schedule(dataset, reference_input, reference_schedule, optimized_input, optimized_schedule, kept_segments):
+    (reference, _, _), reference_seconds = timed(lambda: reference_engines.update_from_schedule(reference_input, reference_schedule))
+    (optimized, _, _), optimized_seconds = timed(lambda: update_from_schedule(optimized_input, optimized_schedule))
+    result = check_result(dataset, 'update_from_schedule', reference, optimized, TIMESHEET_KEYS, TIMESHEET_COLUMNS, reference_seconds, optimized_seconds,
+                          mark=lambda diffs: mark_timesheet_diffs(diffs, kept_segments))
+    return result, reference
+
+def optimized_pay_columns(salary_df, pay_components):
+    # Holiday components summed into the reference's per-holiday pay columns
+    holiday = pay_components[pay_components['Component'].isin(['Holiday Worked', 'Holiday Allowance'])]
+    if holiday.empty:
+        return salary_df
+    labels = 'Holiday Pay ' + holiday['Holiday Date'].dt.strftime('%m-%d')
+    columns = holiday.assign(Label=labels).pivot_table(index='Employee Number', columns='Label', values='Amount', aggfunc='sum', observed=True)
+    return salary_df.merge(columns, left_on='Employee Number', right_index=True, how='left')
+
+def baseline_holiday_pay(start_date, holidays_df):
+    # The baseline's calculate_holiday_pay, defined only inside its shadowed first
+    # calculate_salary and closed over that call's start_date and holidays_df. The
+    # second calculate_salary calls it by its global name with the employee's row
+    # where the first passed the employee number; otherwise it is verbatim.
+    def calculate_holiday_pay(employee_id, holiday_date, merged_df, timesheet_df, previous_biweekly_hours):
+        if isinstance(employee_id, pd.Series):
+            employee_id = employee_id['Employee Number']
+        employee_data = merged_df[merged_df['Employee Number'] == employee_id].iloc[0]
+        employee_timesheet = timesheet_df[(timesheet_df['Employee Number'] == employee_id) &
+                                          (timesheet_df['Start Date'].dt.date == holiday_date.date())]
+
+        # Part 1: Pay for adjusted work hours on the holiday
+        if not employee_timesheet.empty:
+            holiday_hours = employee_timesheet['Working Hours'].sum()
+            part1_pay = holiday_hours * employee_data['OT Pay Rate (加班时薪）']
+        else:
+            part1_pay = 0
+
+        # Part 2: Additional holiday pay based on previous 2 biweekly periods
+        current_period_hours = employee_data['Total Hours']
+        total_4_weeks_hours = sum(previous_biweekly_hours.get(employee_id, [0, 0])) + current_period_hours
+
+        # Calculate the cap based on trigger hours
+        cap_hours = 0
+        for i in range(2):  # Check for holidays in current and previous biweekly period
+            period_start = start_date - timedelta(days=14*i)
+            period_end = period_start + timedelta(days=13)
+            if any(h in holidays_df['Date'].values for h in pd.date_range(period_start, period_end)):
+                cap_hours += employee_data['Bi-weekly 加班费触发小时（有holiday）']
+            else:
+                cap_hours += employee_data['Bi-weekly 加班费触发小时（没有holiday）']
+
+        capped_hours = min(total_4_weeks_hours, cap_hours)
+        part2_pay = (capped_hours / 10) * employee_data['REG Pay Rate (正常时薪)']
+
+        total_holiday_pay = part1_pay + part2_pay
+        return total_holiday_pay
+    return calculate_holiday_pay
+
+def reference_salary(timesheet_df, payrate_df, holidays_df, production_df, period_start, previous_hours):
+    # Baseline calculate_salary with its holiday pay function reachable for this one call
+    reference_engines.calculate_holiday_pay = baseline_holiday_pay(pd.to_datetime(period_start), holidays_df)
+    try:
+        return reference_engines.calculate_salary(timesheet_df, payrate_df, holidays_df, production_df, period_start, previous_hours)
+    finally:
+        del reference_engines.calculate_holiday_pay
+
+def baseline_typed(timesheet_df):
+    # The optimized timesheet in the baseline's column types (plain strings, float64 hours)
+    df = timesheet_df.copy()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object).where(df[column].notna(), np.nan)
+    return df.astype({'Working Hours': 'float64'})
+
+def failed_period(period_start, error):
+    # A period the reference cannot compute is never a passing check
+    return {'Period Start': period_start, 'Employee Number': None, 'Column': '(period)', 'Reference': f"failed: {error!r}",
+            'Optimized': 'computed', 'Difference': np.nan, 'Expected': ''}
+
+def check_salary(dataset, engine, reference_input, optimized_input, holidays_df, start_date, num_periods, employee_reasons):
+    # Both engines see the same previous-period hours, taken from the optimized run
+    reference_timesheet, reference_payrate, reference_production = reference_input
+    timesheet_df, payrate_df, production_df = optimized_input
+    # Reruns of the reference that explain expected pay differences: on the
+    # optimized timesheet, and with missing OT rates filled with the REG rate
+    rerun_inputs = {
+        'corrected': (baseline_typed(timesheet_df), reference_payrate),
+        'ot_filled': (reference_timesheet, reference_payrate.assign(**{
+            'OT Pay Rate (加班时薪）': reference_payrate['OT Pay Rate (加班时薪）'].fillna(reference_payrate['REG Pay Rate (正常时薪)'])}))
+    }
+    history = empty_period_hours()
+    reference_frames, optimized_frames, failures = [], [], []
+    rerun_frames = {name: [] for name in rerun_inputs}
+    reference_seconds = optimized_seconds = 0.0
+    for period in range(num_periods):
+        period_start = pd.Timestamp(start_date) + pd.Timedelta(days=14 * period)
+        previous_hours = previous_biweekly_hours(history, period_start)
+
+        (optimized, pay_components, next_period_hours), seconds = timed(lambda: calculate_salary(
+            timesheet_df, payrate_df, holidays_df, production_df, period_start, previous_hours))
+        optimized_seconds += seconds
+        history = upsert_period_hours(history, period_hours_records(period_start, next_period_hours))
+        optimized_frames.append(optimized_pay_columns(optimized, pay_components).assign(**{'Period Start': period_start}))
+        try:
+            (reference, _), seconds = timed(lambda: reference_salary(
+                reference_timesheet, reference_payrate, holidays_df, reference_production, period_start, previous_hours))
+            reruns = {name: reference_salary(rerun_timesheet, rerun_payrate, holidays_df, reference_production, period_start, previous_hours)[0]
+                      for name, (rerun_timesheet, rerun_payrate) in rerun_inputs.items()}
+        except Exception as error:
+            failures.append(failed_period(period_start, error))
+            continue
+        reference_seconds += seconds
+
+        reference_frames.append(reference.assign(**{'Period Start': period_start}))
+        for name, rerun in reruns.items():
+            rerun_frames[name].append(rerun.assign(**{'Period Start': period_start}))
+
+    empty = pd.DataFrame(columns=SALARY_KEYS + list(SALARY_COLUMNS))
+    reference = pd.concat(reference_frames, ignore_index=True) if reference_frames else empty
+    optimized = pd.concat(optimized_frames, ignore_index=True) if optimized_frames else empty
+    reruns = {name: pd.concat(frames, ignore_index=True) if frames else empty for name, frames in rerun_frames.items()}
+    # Periods the reference failed on are reported once as a failure, not row by row
+    failed_starts = [failure['Period Start'] for failure in failures]
+    optimized = optimized[~optimized['Period Start'].isin(failed_starts)]
+    holiday_columns = [column for column in reference.columns.union(optimized.columns) if column.startswith('Holiday ')]
+    for df in (reference, optimized, *reruns.values()):
+        # A holiday column only one side has is compared against missing pay
+        for column in holiday_columns:
+            if column not in df.columns:
+                df[column] = np.nan
+    columns = {**SALARY_COLUMNS, **{column: MONEY_TOLERANCE for column in holiday_columns}}
+    # Employees the baseline has no payrate data for, per period
+    unpaid = set(keyed(reference[reference['REG Pay Rate (正常时薪)'].isna()], SALARY_KEYS, [])[SALARY_KEYS].apply(tuple, axis=1)) \
+        if 'REG Pay Rate (正常时薪)' in reference.columns else set()
+    return check_result(dataset, engine, reference, optimized, SALARY_KEYS, columns, reference_seconds, optimized_seconds,
+                        mark=lambda diffs: mark_salary_diffs(diffs, employee_reasons, reruns, unpaid, columns), extra_diffs=pd.DataFrame(failures))
+
+def load_reference_site(files):
+    # Baseline-typed input: what the baseline loaders read from the raw workbooks
+    timesheet_df = reference_engines.load_timesheets(files['timesheets'])
+    schedule_df = reference_engines.load_schedules(files['schedules']) if files['schedules'] else pd.DataFrame()
+    payrate_df = reference_engines.load_payrate_list(files['payrate'])
+    production_df = reference_engines.load_production_report(os.path.dirname(files['production'])) if files['production'] else pd.DataFrame()
+    return timesheet_df, schedule_df, payrate_df, production_df
+
+def load_site(files, start_date, num_periods):
+    timesheet_df = load_timesheets(files['timesheets'], max_workers=1)
+    schedule_df = load_schedules(files['schedules'], max_workers=1) if files['schedules'] else pd.DataFrame()
+    payrate_df = load_payrate_list(files['payrate'])
+    production_df = load_production_report(files['production'])
+    holidays_df = load_holiday_list(files['holidays']) if files['holidays'] else load_public_holidays(start_date, last_period_end(start_date, num_periods))
+    timesheet_df, schedule_df, payrate_df, production_df, _ = resolve_employee_keys(timesheet_df, schedule_df, payrate_df, production_df)
+    return timesheet_df, schedule_df, payrate_df, production_df, holidays_df
+
+def run_checks(dataset, files, start_date, num_periods):
+    # Holidays are the one input both chains share: the baseline had no holiday workbook loader
+    timesheet_df, schedule_df, payrate_df, production_df, holidays_df = load_site(files, start_date, num_periods)
+    reference_timesheet, reference_schedule, reference_payrate, reference_production = load_reference_site(files)
+
+    reference_timesheet, _ = reference_engines.process_vacations(reference_timesheet)
+    timesheet_df, _ = process_vacations(timesheet_df)
+    timesheet_df = enforce_timesheet_schema(timesheet_df)
+    result, reference_combined, combined = check_combine_time(dataset, reference_timesheet, timesheet_df)
+    results = [result]
+
+    reference_adjusted, _ = reference_engines.adjust_business_hours(reference_combined)
+    if schedule_df is not None and not schedule_df.empty:
+        combined, _ = adjust_business_hours(enforce_timesheet_schema(combined))
+        result, reference_adjusted = check_update_from_schedule(dataset, reference_adjusted, reference_schedule,
+                                                                enforce_timesheet_schema(combined), schedule_df,
+                                                                kept_merge_segments(reference_combined))
+        results.append(result)
+    reference_adjusted, _ = reference_engines.adjust_lunch_time(reference_adjusted)
+
+    adjusted, _, _, _ = adjust_timesheet(timesheet_df, schedule_df)
+    employee_reasons = expected_employees(results)
+    reference_input = (reference_adjusted, reference_payrate, reference_production)
+    optimized_input = (adjusted, payrate_df, production_df)
+    results.append(check_salary(dataset, 'calculate_salary', reference_input, optimized_input, holidays_df,
+                                start_date, num_periods, employee_reasons))
+    return results
+
+def synthetic_datasets(scales, seed, data_dir):
+    for scale in scales:
+        employees, periods = parse_scale(scale)
+        _, files = site_files(data_dir, employees, periods, seed)
+        yield f"synthetic {scale} seed {seed}", files, START_DATE, periods
+
+def site_datasets(site_dirs, start_date, num_periods):
+    for site_dir in site_dirs:
+        files = {kind: find_files(site_dir, patterns) for kind, patterns in DEFAULT_PATTERNS.items()}
+        if not files['timesheets'] or not files['payrate']:
+            raise FileNotFoundError(f"No timesheet or payrate workbooks found in {site_dir}")
+        files = {kind: paths if kind in ('timesheets', 'schedules') else (paths[0] if paths else None) for kind, paths in files.items()}
+        yield os.path.basename(os.path.normpath(site_dir)), files, start_date, num_periods
+
+def mask_identity(value):
+    if pd.isna(value):
+        return value
+    return hashlib.sha256(str(value).encode('utf-8')).hexdigest()[:10]
+
+def write_diffs(output_dir, dataset, engine, diffs, mask_ids=False):
+    if mask_ids:
+        diffs = diffs.copy()
+        for column in IDENTITY_COLUMNS:
+            if column in diffs.columns:
+                diffs[column] = diffs[column].map(mask_identity)
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, re.sub(r'\W+', '_', f"{dataset} {engine}").strip('_') + '_diffs.csv')
+    diffs.to_csv(path, index=False, encoding='utf-8-sig')
+    return path
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the optimized payroll engines with the row-wise reference engines.")
+    parser.add_argument('--scale', nargs='*', default=['100x1'], metavar='EMPLOYEESxPERIODS', help="Synthetic scales to check (default: 100x1)")
+    parser.add_argument('--seed', type=int, nargs='+', default=[0], help="Seeds of the synthetic workbooks")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Where synthetic workbooks are generated and reused")
+    parser.add_argument('--site', nargs='*', default=[], metavar='SITE_DIR', help="Site directories of (anonymized) real workbooks to check")
+    parser.add_argument('--start-date', default=START_DATE, help="First day of the first period of the --site datasets")
+    parser.add_argument('--periods', type=int, default=1, help="Number of biweekly periods of the --site datasets")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="Where differences and the summary are written")
+    parser.add_argument('--mask-ids', action='store_true', help="Hash employee numbers and names in the written differences")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    datasets = [dataset for seed in args.seed for dataset in synthetic_datasets(args.scale, seed, args.data_dir)]
+    datasets += list(site_datasets(args.site, args.start_date, args.periods))
+
+    summaries = []
+    for dataset, files, start_date, num_periods in datasets:
+        print(f"{dataset}", flush=True)
+        for summary, diffs in run_checks(dataset, files, start_date, num_periods):
+            if not diffs.empty:
+                summary['Differences File'] = write_diffs(args.output_dir, dataset, summary['Engine'], diffs, args.mask_ids)
+            summaries.append(summary)
+
+    summary_df = pd.DataFrame(summaries).reindex(columns=SUMMARY_COLUMNS + ['Differences File'])
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary_df.to_csv(os.path.join(args.output_dir, 'equivalence_summary.csv'), index=False, encoding='utf-8-sig')
+    print(summary_df[SUMMARY_COLUMNS].to_string(index=False))
+    return 1 if summary_df['Status'].eq('DIFF').any() else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import os
+import sys
+import argparse
+import subprocess
+import py_compile
+
+# Import check for every module of the package:
+#   python import_check.py
+# Each module is imported on its own in a fresh interpreter, so an import cycle
+# that only breaks when a given module is imported first is caught too. The
+# Streamlit app runs its UI at import time and is only compiled.
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Not modules: the project tree listing and this script
+SKIPPED = {'Project_Structure', 'import_check'}
+COMPILE_ONLY = {'app'}
+
+def module_names(module_dir=MODULE_DIR):
+    names = (name[:-3] for name in os.listdir(module_dir) if name.endswith('.py'))
+    return sorted(name for name in names if name not in SKIPPED)
+
+def check_module(name, module_dir=MODULE_DIR):
+    # Returns None when the module imports cleanly, else the last line of the error
+    if name in COMPILE_ONLY:
+        try:
+            py_compile.compile(os.path.join(module_dir, f"{name}.py"), doraise=True)
+        except py_compile.PyCompileError as e:
+            return str(e).strip().splitlines()[-1]
+        return None
+    result = subprocess.run([sys.executable, '-c', f"import {name}"], cwd=module_dir, capture_output=True, text=True)
+    if result.returncode == 0:
+        return None
+    lines = result.stderr.strip().splitlines()
+    return lines[-1] if lines else f"exit status {result.returncode}"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import every payroll module in a fresh interpreter.")
+    parser.add_argument('modules', nargs='*', help="Modules to check (default: all)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    failures = 0
+    for name in args.modules or module_names():
+        error = check_module(name)
+        print(f"{name}: {'ok' if error is None else error}")
+        failures += error is not None
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import os
+import time
+import cProfile
+import tracemalloc
+import threading
+import pandas as pd
+from payroll_logging import get_logger
+
+logger = get_logger('instrumentation')
+
+# Per-stage run report: wall time, rows in/out and peak traced memory of every
+# measured stage, plus an optional cProfile dump of one chosen stage. A stage
+# measured more than once (one call per department or per period) accumulates
+# into a single row, and its profile covers every call: one profiler is enabled
+# around each call and dumped once when the report is closed. tracemalloc is process-wide, so only one report at a time
+# may trace memory; a report asking for it while another one traces runs
+# without memory figures instead of corrupting the other report's peaks.
+
+RUN_REPORT_COLUMNS = ['Stage', 'Calls', 'Seconds', 'Rows In', 'Rows Out', 'Peak MB']
+
+# The report currently tracing memory, if any
+_tracing_lock = threading.Lock()
+_tracing_report = None
+
+def count_rows(value):
+    # Rows of a DataFrame result, or of the first DataFrame in a tuple of results
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, (tuple, list)) and value and isinstance(value[0], (pd.DataFrame, pd.Series)):
+        return len(value[0])
+    return None
+
+class RunReport:
+    def __init__(self, trace_memory=False, profile_stage=None, profile_dir='.'):
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self.profile_path = None
+        self._profiler = None
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        self.memory_refused = False
+        if trace_memory:
+            self.trace_memory = self.claim_tracing()
+
+    def claim_tracing(self):
+        global _tracing_report
+        with _tracing_lock:
+            if _tracing_report is not None:
+                self.memory_refused = True
+                logger.warning("Memory tracing is in use by another run; peak memory is not recorded for this run")
+                return False
+            _tracing_report = self
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            return True
+
+    def measure(self, stage, compute, rows_in=None):
+        profiler = self.stage_profiler(stage)
+        if self.trace_memory:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = compute()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds = time.perf_counter() - started
+            peak_mb = (tracemalloc.get_traced_memory()[1] - baseline) / 2 ** 20 if self.trace_memory else None
+
+        self.record(stage, seconds, rows_in, count_rows(result), peak_mb)
+        return result
+
+    def record(self, stage, seconds, rows_in=None, rows_out=None, peak_mb=None):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {'Stage': stage, 'Calls': 0, 'Seconds': 0.0,
+                                                    'Rows In': None, 'Rows Out': None, 'Peak MB': None})
+            entry['Calls'] += 1
+            entry['Seconds'] += seconds
+            if rows_in is not None:
+                entry['Rows In'] = (entry['Rows In'] or 0) + rows_in
+            if rows_out is not None:
+                entry['Rows Out'] = (entry['Rows Out'] or 0) + rows_out
+            if peak_mb is not None:
+                entry['Peak MB'] = max(entry['Peak MB'] or 0.0, peak_mb)
+
+    def stage_profiler(self, stage):
+        if stage != self.profile_stage:
+            return None
+        with self._lock:
+            if self._profiler is None:
+                self._profiler = cProfile.Profile()
+            return self._profiler
+
+    def save_profile(self):
+        # Dumps the calls of the profiled stage so far; a no-op if it never ran
+        with self._lock:
+            profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.profile_path = os.path.join(self.profile_dir, f"{self.profile_stage}.prof")
+        profiler.dump_stats(self.profile_path)
+        logger.info("Wrote cProfile dump of %s to %s", self.profile_stage, self.profile_path)
+
+    def records(self):
+        with self._lock:
+            return [{key: round(value, 3) if isinstance(value, float) else value for key, value in entry.items()}
+                    for entry in self._stages.values()]
+
+    def to_frame(self):
+        return pd.DataFrame(self.records(), columns=RUN_REPORT_COLUMNS)
+
+    def close(self):
+        global _tracing_report
+        self.save_profile()
+        with _tracing_lock:
+            if _tracing_report is self:
+                _tracing_report = None
+                if self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+                self.trace_memory = False
+
+def measure_stage(run_report, stage, compute, rows_in=None):
+    # Call sites stay the same whether or not a run report is being collected
+    if run_report is None:
+        return compute()
+    return run_report.measure(stage, compute, rows_in)
@@ -0,0 +1,187 @@
+import io
+import os
+import re
+import time
+import uuid
+import hashlib
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from data_loading import load_timesheets, load_schedules, load_public_holidays, load_holiday_list, load_production_report, load_payrate_list
+from salary_calculation import adjust_timesheet_by_department, calculate_period_salaries, last_period_end
+from period_hours import load_period_hours, store_period_hours, earlier_hours_digest
+from employee_directory import resolve_employee_keys
+from report_generator import generate_excel_report
+from workbook_cache import DEFAULT_CACHE_DIR
+from instrumentation import RunReport
+from payroll_logging import StageCounters, counting
+
+# Background payroll runs for the Streamlit app. Each stage is memoized on a
+# fingerprint of the inputs it depends on, so changing the start date only
+# reruns the salary and report stages instead of re-reading every workbook.
+
+STAGES = ['Load workbooks', 'Adjust timesheet', 'Calculate salary', 'Generate report']
+
+# Fine-grained stages recorded in the run report; any of them can be profiled
+MEASURED_STAGES = ['load_timesheets', 'load_schedules', 'load_payrate_list', 'load_production_report', 'load_holidays', 'resolve_employee_keys',
+                   'process_vacations', 'combine_time', 'adjust_business_hours', 'update_from_schedule',
+                   'adjust_lunch_time', 'calculate_salary', 'generate_excel_report']
+PROFILE_DIR = os.path.join('temp', 'profiles')
+# Every site keeps its own persistent stores, like the CLI's per-site output directories
+SITES_DIR = os.path.join('temp', 'sites')
+DEFAULT_SITE = 'default'
+
+def site_dir(site):
+    name = re.sub(r'[^\w.-]+', '_', str(site or '')).strip('._') or DEFAULT_SITE
+    return os.path.join(SITES_DIR, name)
+
+def fingerprint(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            digest.update(b'None')
+        elif isinstance(part, (list, tuple)):
+            digest.update(fingerprint(*part).encode('utf-8'))
+        elif hasattr(part, 'getbuffer'):
+            with part.getbuffer() as view:
+                digest.update(view)
+        else:
+            digest.update(repr(part).encode('utf-8'))
+        digest.update(b'|')
+    return digest.hexdigest()
+
+class StageCache:
+    # Keeps the latest result of each stage; a new key for a stage replaces the old result
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def get(self, stage, key):
+        with self._lock:
+            cached_key, result = self._results.get(stage, (None, None))
+            return result if cached_key == key else None
+
+    def put(self, stage, key, result):
+        with self._lock:
+            self._results[stage] = (key, result)
+
+class PayrollJob:
+    def __init__(self, profile_stage=None, trace_memory=False):
+        self.progress = {stage: {'Status': 'pending', 'Seconds': None} for stage in STAGES}
+        # Profiles go to a directory of their own, so concurrent jobs never overwrite each other's dumps
+        self.job_id = uuid.uuid4().hex[:12]
+        self.run_report = RunReport(trace_memory=trace_memory, profile_stage=profile_stage,
+                                    profile_dir=os.path.join(PROFILE_DIR, self.job_id))
+        # Stage event counts of this job only, filled while run_payroll runs
+        self.counters = StageCounters()
+        # Per-workbook parse report (file, rows, seconds, error) once the workbooks are loaded
+        self.workbooks = None
+        self.future = None
+
+    def set_status(self, stage, status, seconds=None):
+        self.progress[stage] = {'Status': status, 'Seconds': seconds}
+
+    def completed_fraction(self):
+        finished = sum(1 for state in self.progress.values() if state['Status'] in ('done', 'cached'))
+        return finished / len(STAGES)
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+def run_stage(job, cache, stage, key, compute):
+    result = cache.get(stage, key)
+    if result is not None:
+        job.set_status(stage, 'cached')
+        return result
+
+    job.set_status(stage, 'running')
+    started = time.perf_counter()
+    try:
+        result = compute()
+    except Exception:
+        job.set_status(stage, 'failed', round(time.perf_counter() - started, 3))
+        raise
+    cache.put(stage, key, result)
+    job.set_status(stage, 'done', round(time.perf_counter() - started, 3))
+    return result
+
+def run_payroll(job, cache, inputs, start_date, hours_store_path=None, cache_dir=DEFAULT_CACHE_DIR, directory_path=None):
+    try:
+        with counting(job.counters):
+            return run_payroll_stages(job, cache, inputs, start_date, hours_store_path, cache_dir, directory_path)
+    finally:
+        job.run_report.close()
+
+def run_payroll_stages(job, cache, inputs, start_date, hours_store_path, cache_dir, directory_path):
+    timesheet_files = inputs['timesheets']
+    schedule_files = inputs['schedules']
+    payrate_file = inputs['payrate']
+    production_report_file = inputs.get('production_report')
+    public_holidays_file = inputs.get('public_holidays')
+    measure = job.run_report.measure
+
+    load_key = fingerprint(
+        [(getattr(f, 'name', ''), f) for f in timesheet_files],
+        [(getattr(f, 'name', ''), f) for f in schedule_files],
+        payrate_file, production_report_file, directory_path
+    )
+    def load_workbooks():
+        # A workbook that fails to parse fails the run instead of silently dropping its rows
+        timesheet, timesheet_report = measure('load_timesheets', lambda: load_timesheets(timesheet_files, return_report=True, cache_dir=cache_dir))
+        schedule, schedule_report = measure('load_schedules', lambda: load_schedules(schedule_files, return_report=True, cache_dir=cache_dir))
+        payrate = measure('load_payrate_list', lambda: load_payrate_list(payrate_file, cache_dir=cache_dir))
+        production = measure('load_production_report', lambda: load_production_report(production_report_file))
+        # Every source is resolved to employee directory keys before any join
+        resolved = measure('resolve_employee_keys', lambda: resolve_employee_keys(timesheet, schedule, payrate, production, directory_path),
+                           rows_in=len(timesheet))
+        loaded = dict(zip(['timesheet', 'schedule', 'payrate', 'production', 'unmatched'], resolved))
+        loaded['workbooks'] = pd.concat([timesheet_report, schedule_report], ignore_index=True)
+        return loaded
+
+    loaded = run_stage(job, cache, 'Load workbooks', load_key, load_workbooks)
+    job.workbooks = loaded['workbooks']
+
+    # Timesheet adjustments do not depend on the start date; unchanged departments
+    # are reused from the partition cache when a single workbook is corrected
+    adjusted = run_stage(job, cache, 'Adjust timesheet', load_key,
+                         lambda: adjust_timesheet_by_department(loaded['timesheet'], loaded['schedule'], cache_dir, job.run_report))
+    processed_timesheet, vacation_info, schedule_changes, schedule_alerts = adjusted
+
+    # The salary stage reads earlier periods from the site's hours store, so their
+    # state is part of its key; the stage itself never writes the store
+    period_hours_history = load_period_hours(hours_store_path)
+    salary_key = fingerprint(load_key, str(start_date), public_holidays_file, earlier_hours_digest(period_hours_history, start_date))
+    def load_holidays():
+        # An uploaded holiday list replaces the generated Ontario holidays
+        if public_holidays_file is not None:
+            return load_holiday_list(public_holidays_file)
+        return load_public_holidays(start_date, last_period_end(start_date, 1))
+    salary_info, pay_components, period_hours = run_stage(job, cache, 'Calculate salary', salary_key, lambda: calculate_period_salaries(
+        processed_timesheet, measure('load_holidays', load_holidays), loaded['production'], loaded['payrate'],
+        start_date, 1, period_hours_history, run_report=job.run_report
+    ))
+    # Written on every run, cached or not, so the store always holds this period's hours
+    store_period_hours(hours_store_path, period_hours)
+
+    def build_report():
+        report_buffer = io.BytesIO()
+        generate_excel_report(salary_info, pay_components, processed_timesheet, vacation_info, schedule_changes, schedule_alerts, report_buffer,
+                              unmatched_records=loaded['unmatched'])
+        return report_buffer.getvalue()
+
+    return run_stage(job, cache, 'Generate report', salary_key,
+                     lambda: measure('generate_excel_report', build_report, rows_in=len(processed_timesheet)))
+
+def submit_payroll_job(executor, cache, inputs, start_date, site=DEFAULT_SITE, profile_stage=None, trace_memory=False):
+    job = PayrollJob(profile_stage, trace_memory)
+    hours_store_path = os.path.join(site_dir(site), 'period_hours.npz')
+    directory_path = os.path.join(site_dir(site), 'employee_directory.npz')
+    job.future = executor.submit(run_payroll, job, cache, inputs, start_date, hours_store_path, directory_path=directory_path)
+    return job
+
+def create_executor():
+    # One background worker per session; stages inside a run already parallelize workbook parsing
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='payroll')
@@ -0,0 +1,104 @@
+import sys
+import json
+import logging
+import threading
+import contextlib
+import contextvars
+from collections import defaultdict
+
+# Structured logging for the payroll modules. Every module logs through a
+# child of the 'payroll' logger; stage events carry their counts as fields,
+# which the optional JSONL sink writes out one object per line, and add them to
+# the counters of the run they belong to (see counting), so concurrent runs and
+# app sessions never mix their totals. Nothing below WARNING is shown until configure_logging is
+# called, so library use and production runs stay quiet.
+
+LOGGER_NAME = 'payroll'
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# Counters of the run executing in the current thread/context, if any
+_run_counters = contextvars.ContextVar('payroll_run_counters', default=None)
+
+class JsonlHandler(logging.Handler):
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def emit(self, record):
+        try:
+            entry = {
+                'time': record.created,
+                'level': record.levelname,
+                'logger': record.name,
+                'stage': getattr(record, 'stage', None),
+                'message': record.getMessage()
+            }
+            entry.update(getattr(record, 'fields', {}))
+            with self.lock:
+                self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+                self._file.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        try:
+            self._file.close()
+        finally:
+            super().close()
+
+def get_logger(name):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+def configure_logging(level='INFO', jsonl_path=None, stream=None):
+    # Replaces any handlers from an earlier call, so it is safe to call once per run
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+    console = logging.StreamHandler(stream or sys.stderr)
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(console)
+    if jsonl_path is not None:
+        logger.addHandler(JsonlHandler(jsonl_path))
+    return logger
+
+class StageCounters:
+    # Per-stage totals of one run's stage event fields
+    def __init__(self):
+        self._counts = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def add(self, stage, name, value=1):
+        with self._lock:
+            self._counts[stage][name] += value
+
+    def to_dict(self):
+        with self._lock:
+            return {stage: dict(values) for stage, values in self._counts.items()}
+
+@contextlib.contextmanager
+def counting(counters):
+    # Route stage event counts in this context to the given run's counters
+    token = _run_counters.set(counters)
+    try:
+        yield counters
+    finally:
+        _run_counters.reset(token)
+
+def count(stage, name, value=1):
+    # Counts outside a run (plain library use) are not kept
+    counters = _run_counters.get()
+    if counters is not None:
+        counters.add(stage, name, value)
+
+def stage_event(logger, stage, message, level=logging.INFO, **fields):
+    # Log one line for a stage and add its numeric fields to the run's counters
+    for name, value in fields.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            count(stage, name, value)
+    logger.log(level, message, extra={'stage': stage, 'fields': fields})
@@ -0,0 +1,85 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from payroll_logging import get_logger
+from store_lock import store_lock
+
+logger = get_logger('period_hours')
+
+# Per-employee biweekly hours history used for the holiday pay 4-week cap.
+# Stored on disk as a compressed .npz of three columns, one store per site.
+# Each (employee, period) pair has a single record: re-running a period
+# replaces its hours. Writes re-read the store under a lock, so concurrent
+# runs of the same site never drop each other's periods.
+
+def empty_period_hours():
+    return pd.DataFrame({
+        'Employee Number': pd.Series(dtype=str),
+        'Period Start': pd.Series(dtype='datetime64[ns]'),
+        'Hours': pd.Series(dtype=float)
+    })
+
+def load_period_hours(path):
+    if path is None or not os.path.exists(path):
+        return empty_period_hours()
+
+    with np.load(path, allow_pickle=False) as store:
+        history = pd.DataFrame({
+            'Employee Number': store['employee'].astype(str),
+            'Period Start': store['period_start'].astype('datetime64[ns]'),
+            'Hours': store['hours']
+        })
+    logger.info("Loaded %d period hour records from %s", len(history), path)
+    return history
+
+def save_period_hours(path, history):
+    # Write to a temporary file first so an interrupted run never corrupts the store
+    temp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(temp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            employee=history['Employee Number'].astype(str).to_numpy(dtype=str),
+            period_start=history['Period Start'].to_numpy(dtype='datetime64[D]'),
+            hours=history['Hours'].to_numpy(dtype=float)
+        )
+    os.replace(temp_path, path)
+
+def period_hours_records(period_start, period_hours):
+    return pd.DataFrame({
+        'Employee Number': [str(employee) for employee in period_hours],
+        'Period Start': pd.Timestamp(period_start).normalize(),
+        'Hours': np.fromiter(period_hours.values(), dtype=float, count=len(period_hours))
+    })
+
+def upsert_period_hours(history, records):
+    replaced = pd.Series(False, index=history.index)
+    for period_start, period_records in records.groupby('Period Start'):
+        replaced |= (history['Period Start'] == period_start) & history['Employee Number'].isin(period_records['Employee Number'])
+    return pd.concat([history[~replaced], records], ignore_index=True)
+
+def store_period_hours(path, records):
+    # Upserts the records into the latest store on disk, not into a copy loaded before the run
+    if path is None or records.empty:
+        return
+    with store_lock(path):
+        save_period_hours(path, upsert_period_hours(load_period_hours(path), records))
+
+def earlier_hours_digest(history, period_start):
+    # Identifies the history a run starting at period_start reads, to key memoized salary results
+    earlier = history[history['Period Start'] < pd.Timestamp(period_start).normalize()]
+    earlier = earlier.sort_values(['Employee Number', 'Period Start'], kind='stable')
+    return hashlib.sha256(pd.util.hash_pandas_object(earlier, index=False).to_numpy().tobytes()).hexdigest()
+
+def previous_biweekly_hours(history, period_start, num_periods=2):
+    # Hours of the biweekly periods right before period_start, oldest first
+    period_start = pd.Timestamp(period_start).normalize()
+    starts = [period_start - pd.Timedelta(days=14 * i) for i in range(num_periods, 0, -1)]
+
+    recent = history[history['Period Start'].isin(starts)]
+    recent = recent.drop_duplicates(['Employee Number', 'Period Start'], keep='last')
+    hours = recent.pivot(index='Employee Number', columns='Period Start', values='Hours')
+    hours = hours.reindex(columns=starts).fillna(0)
+
+    return dict(zip(hours.index, hours.to_numpy().tolist()))
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+# Declarative time adjustment policies. Each policy selects rows by department
+# and/or employee number; None means "any". Policies are compiled into boolean
+# masks and applied to whole columns; when several policies match a row the
+# first one in the list wins.
+
+# Fixed working windows: the adjusted start and end are moved to these clock
+# times on the day the shift started
+SHIFT_WINDOW_POLICIES = [
+    {
+        'name': 'Business hours',
+        'departments': ['Business'],
+        'employees': None,
+        'exclude_employees': ['EE109', 'EE037', 'EE034', 'EE059'],
+        'start': '09:00',
+        'end': '19:30',
+        'reason': 'Adjusted business hours'
+    },
+]
+
+# Lunch deductions: shifts longer than min_hours lose deduct_hours
+LUNCH_POLICIES = [
+    {
+        'name': 'Lunch break',
+        'departments': None,
+        'employees': None,
+        'exclude_employees': None,
+        'min_hours': 7,
+        'deduct_hours': 0.5,
+        'reason': 'Subtracted 0.5 hours for lunch'
+    },
+]
+
+def clock_offset(value):
+    # 'HH:MM' -> offset from midnight
+    hours, minutes = value.split(':')
+    return pd.Timedelta(hours=int(hours), minutes=int(minutes))
+
+def policy_mask(df, policy):
+    mask = pd.Series(True, index=df.index)
+    if policy.get('departments') is not None:
+        mask &= df['Department'].isin(policy['departments'])
+    if policy.get('employees') is not None:
+        mask &= df['Employee Number'].isin(policy['employees'])
+    if policy.get('exclude_employees'):
+        mask &= ~df['Employee Number'].isin(policy['exclude_employees'])
+    return mask
+
+def first_match(masks, length):
+    # Index of the first matching policy per row, -1 where none matches
+    if not masks:
+        return np.full(length, -1)
+    return np.select([mask.to_numpy() for mask in masks], list(range(len(masks))), default=-1)
+
+def compile_shift_windows(df, policies):
+    # Per-row window offsets and reasons; NaT/None where no policy applies
+    matched = first_match([policy_mask(df, policy) for policy in policies], len(df))
+    window_start = pd.Series(pd.NaT, index=df.index, dtype='timedelta64[ns]')
+    window_end = pd.Series(pd.NaT, index=df.index, dtype='timedelta64[ns]')
+    reason = pd.Series(None, index=df.index, dtype=object)
+    for i, policy in enumerate(policies):
+        rows = matched == i
+        window_start[rows] = clock_offset(policy['start'])
+        window_end[rows] = clock_offset(policy['end'])
+        reason[rows] = policy['reason']
+    return pd.Series(matched >= 0, index=df.index), window_start, window_end, reason
+
+def compile_lunch_deductions(df, policies):
+    # Per-row deduction in hours (0 where no policy applies) and the reason
+    masks = [policy_mask(df, policy) & (df['Working Hours'] > policy['min_hours']) for policy in policies]
+    matched = first_match(masks, len(df))
+    deduction = pd.Series(0.0, index=df.index)
+    reason = pd.Series(None, index=df.index, dtype=object)
+    for i, policy in enumerate(policies):
+        rows = matched == i
+        deduction[rows] = policy['deduct_hours']
+        reason[rows] = policy['reason']
+    return pd.Series(matched >= 0, index=df.index), deduction, reason
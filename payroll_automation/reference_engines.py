@@ -0,0 +1,589 @@
+import os
+from glob import glob
+from zipfile import BadZipFile
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+# The row-wise engines as they were before any optimization: the baseline
+# loaders, time adjustments and salary calculation, verbatim apart from the
+# imports they relied on the app for and the removed debug prints (and the
+# values computed only to be printed). They are the golden model equivalence.py
+# checks the optimized engines against and are never called by the pipeline.
+# Their bugs are kept on purpose; the harness reports the differences the
+# optimized engines make deliberately as expected instead of patching them here.
+
+# Data Loading functions
+def read_excel_safe(file_path, usecols):
+    if not os.path.exists(file_path):
+        return pd.DataFrame()
+
+    if not os.access(file_path, os.R_OK):
+        return pd.DataFrame()
+
+    try:
+        return pd.read_excel(file_path, usecols=usecols, engine='openpyxl')
+    except BadZipFile:
+        return pd.DataFrame()
+    except ValueError as e:
+        return pd.DataFrame()
+    except Exception as e:
+        return pd.DataFrame()
+
+def load_timesheets(file_paths):
+    all_timesheets = []
+
+    for file_path in file_paths:
+        # Check the filename to determine how to process the file
+        if 'Temp' in file_path:
+            df = process_temp_timesheet(file_path)
+        else:
+            df = process_timesheet(file_path)
+
+        if not df.empty:
+            all_timesheets.append(df)
+
+    # Combine all timesheets into a single DataFrame
+    combined_timesheet = pd.concat(all_timesheets, ignore_index=True) if all_timesheets else pd.DataFrame()
+
+    return combined_timesheet
+
+def load_schedules(file_paths):
+    all_schedules = []
+
+    for file in file_paths:
+        df = process_schedule(file)
+        if not df.empty:
+            # Add a column to indicate the source file type
+            df['Source'] = 'Schedule-Export' if 'Schedule-Export' in file else 'Shift'
+            all_schedules.append(df)
+
+    if all_schedules:
+        combined_schedule = pd.concat(all_schedules, ignore_index=True)
+    else:
+        combined_schedule = pd.DataFrame()
+
+    return combined_schedule
+
+def load_production_report(directory):
+    production_files = glob(os.path.join(directory, '*Production Report*.xlsx'))
+    if not production_files:
+        return pd.DataFrame()
+
+    df = pd.read_excel(production_files[0])
+    df = df[['Date', 'Employee ID', 'Silver Bonus', 'Gold Bonus']]
+
+    # Fill null values with 0
+    df['Silver Bonus'] = df['Silver Bonus'].fillna(0)
+    df['Gold Bonus'] = df['Gold Bonus'].fillna(0)
+
+    df['Bonus'] = df['Silver Bonus'] + df['Gold Bonus']
+    df = df.groupby(['Date', 'Employee ID'])['Bonus'].sum().reset_index()
+    return df
+
+def load_payrate_list(file_path):
+    df = pd.read_excel(file_path)
+
+    # Replace empty strings with NaN
+    df = df.replace(r'^\s*$', np.nan, regex=True)
+
+    # Check if 'Employee ID' column exists, if not, try to find a similar column
+    if 'Employee ID' not in df.columns:
+        possible_id_columns = [col for col in df.columns if 'id' in col.lower() or 'number' in col.lower()]
+        if possible_id_columns:
+            df = df.rename(columns={possible_id_columns[0]: 'Employee ID'})
+
+    return df
+
+# Combine timesheet and schedules functions
+
+def get_department(file_path):
+    return os.path.basename(file_path).split()[0]
+
+def process_timesheet(file_path):
+    df = read_excel_safe(file_path, [
+        "Start Date", "Start time", "End Date", "End time",
+        "Employee Number", "First name", "Last name", "Job", "Employee notes"
+    ])
+    if not df.empty:
+        # Forward fill Employee Number, First name, and Last name
+        df['Employee Number'] = df['Employee Number'].ffill()
+        df['First name'] = df['First name'].ffill()
+        df['Last name'] = df['Last name'].ffill()
+
+        # Drop rows where date and time fields are all empty
+        df = df.dropna(subset=['Start Date', 'Start time', 'End Date', 'End time'], how='all')
+
+        # Add Department column
+        df['Department'] = get_department(file_path)
+
+        df = df.sort_values(by=['Employee Number', 'First name', 'Last name', 'Start time'])
+
+    return df
+
+def process_temp_timesheet(file_path):
+    df = read_excel_safe(file_path, ["Start Date", "Start time", "End Date", "End time", "First name", "Last name", "Team", "Job", "Employee notes"])
+    if not df.empty:
+        # Rename 'Team' to 'Employee Number'
+        df = df.rename(columns={'Team': 'Employee Number'})
+        df['Employee Number'] = df['Employee Number'].ffill()
+        df['First name'] = df['First name'].ffill()
+        df['Last name'] = df['Last name'].ffill()
+
+        # Drop rows where date and time fields are all empty
+        df = df.dropna(subset=['Start Date', 'Start time', 'End Date', 'End time'], how='all')
+
+        # Add Department column
+        df['Department'] = get_department(file_path)
+
+        df = df.sort_values(by=['Employee Number', 'First name', 'Last name', 'Start time'])
+    return df
+
+def process_schedule(file_path):
+    df = read_excel_safe(file_path, ["Date", "Start", "End", "Users", "Availability status"])
+    if not df.empty:
+        # Drop rows where Start is "All Day" or End is empty
+        df = df[(df['Start'] != "All Day") & (df['Availability status'] != "Unavailable") & (df['End'].notna())]
+
+        # Add Department column
+        df['Department'] = get_department(file_path)
+    return df
+
+# Time adjustment functions
+
+def process_vacations(df):
+    # Make a copy to avoid SettingWithCopyWarning
+    df = df.copy()
+
+    # Sort the dataframe by Employee Number and Start Date
+    df = df.sort_values(['Employee Number', 'Start Date'], ascending=[True, True])
+
+    # Create a new column to identify consecutive vacation days
+    df['is_vacation'] = df['Job'] == 'Vacation - paid'
+    df['vacation_group'] = (
+        (df['is_vacation'] != df['is_vacation'].shift()) |
+        (df['Employee Number'] != df['Employee Number'].shift())
+    ).cumsum()
+
+    # Group by employee and vacation group
+    vacation_groups = df[df['is_vacation']].groupby(['Employee Number', 'vacation_group'])
+    vacation_counts = vacation_groups.size()
+
+    # Create a DataFrame to store vacation information
+    vacation_info = []
+
+    # Process all vacation periods
+    for (employee, group), count in vacation_counts.items():
+        vacation_data = vacation_groups.get_group((employee, group)).iloc[0]
+        vacation_info.append({
+            'Employee Number': vacation_data['Employee Number'],
+            'First Name': vacation_data['First name'],
+            'Last Name': vacation_data['Last name'],
+            'Department': vacation_data['Department'],
+            'Vacation Days': count
+        })
+
+    # Create a DataFrame with vacation information
+    vacation_df = pd.DataFrame(vacation_info)
+
+    # Identify vacation records that are part of vacations longer than 1 day
+    long_vacation_mask = df['is_vacation'] & (df.groupby(['Employee Number', 'vacation_group'])['is_vacation'].transform('count') > 1)
+
+    # Print details of vacation records to be dropped
+    dropped_vacations = df[long_vacation_mask]
+    if not dropped_vacations.empty:
+
+        # Drop vacation records that are part of vacations longer than 1 day
+        df = df[~long_vacation_mask]
+
+    # Drop the temporary columns
+    df = df.drop(columns=['is_vacation', 'vacation_group'])
+
+    return df, vacation_df
+
+def adjust_start_time(dt):
+    if dt.minute >= 0 and dt.minute <= 5:
+        return dt.replace(minute=0)
+    elif dt.minute >= 6 and dt.minute <= 35:
+        return dt.replace(minute=30)
+    else:
+        return (dt + pd.Timedelta(hours=1)).replace(minute=0)
+
+def adjust_end_time(dt):
+    if dt.minute >= 0 and dt.minute <= 24:
+        return dt.replace(minute=0)
+    elif dt.minute >= 25 and dt.minute <= 54:
+        return dt.replace(minute=30)
+    else:
+        return (dt + pd.Timedelta(hours=1)).replace(minute=0)
+
+def combine_time(df):
+    # Make a copy to avoid SettingWithCopyWarning
+    df = df.copy()
+
+    # Convert date columns to datetime
+    df['Start Date'] = pd.to_datetime(df['Start Date'], format='mixed', dayfirst=True)
+    df['End Date'] = pd.to_datetime(df['End Date'], format='mixed', dayfirst=True)
+
+    # Combine start date and start time into start datetime
+    df['Start Datetime'] = pd.to_datetime(df['Start Date'].dt.strftime('%Y-%m-%d') + ' ' + df['Start time'], format='%Y-%m-%d %H:%M', errors='coerce')
+
+    # Combine end date and end time into end datetime
+    df['End Datetime'] = pd.to_datetime(df['End Date'].dt.strftime('%Y-%m-%d') + ' ' + df['End time'], format='%Y-%m-%d %H:%M', errors='coerce')
+
+    # Drop rows where datetime conversion failed
+    df.dropna(subset=['Start Datetime', 'End Datetime'], inplace=True)
+
+    # Adjust start and end times
+    df['Adjusted Start Datetime'] = df['Start Datetime'].apply(adjust_start_time)
+    df['Adjusted End Datetime'] = df['End Datetime'].apply(adjust_end_time)
+
+    # Calculate working hours
+    df['Working Hours'] = (df['Adjusted End Datetime'] - df['Adjusted Start Datetime']).dt.total_seconds() / 3600
+
+    # Sort the dataframe by 'Employee Number', 'First name', 'Last name', and 'Start Datetime'
+    df = df.sort_values(by=['Employee Number', 'First name', 'Last name', 'Start Datetime'], ascending=[True, True, True, True]).reset_index(drop=True)
+
+    # Identify rows where the end time is after midnight and the next record for the same employee starts at 00:00
+    end_after_midnight = (df['Adjusted End Datetime'].dt.date > df['Adjusted Start Datetime'].dt.date)
+    start_at_midnight = (df['Adjusted Start Datetime'].dt.hour == 0) & (df['Adjusted Start Datetime'].dt.minute == 0)
+    same_employee = (df['Employee Number'] == df['Employee Number'].shift(-1)) & \
+                    (df['First name'] == df['First name'].shift(-1)) & \
+                    (df['Last name'] == df['Last name'].shift(-1))
+    combine_rows = end_after_midnight & start_at_midnight.shift(-1) & same_employee
+
+    # Combine the records
+    for idx in df[combine_rows].index:
+        df.loc[idx, 'Adjusted End Datetime'] = df.loc[idx+1, 'Adjusted End Datetime']
+        df.loc[idx, 'Working Hours'] += df.loc[idx+1, 'Working Hours']
+        df.loc[idx, 'End Date'] = df.loc[idx+1, 'End Date']
+        df.loc[idx, 'End time'] = df.loc[idx+1, 'End time']
+        df.loc[idx, 'End Datetime'] = df.loc[idx+1, 'End Datetime']
+
+    # Remove the second part of combined pairs
+    df = df[~(combine_rows.shift(1, fill_value=False) & same_employee)].reset_index(drop=True)
+
+    return df
+
+def adjust_business_hours(df):
+    # Make a copy to avoid SettingWithCopyWarning
+    df = df.copy()
+
+    changes = []
+
+    # Identify Business department employees, excluding specific employee numbers
+    business_mask = (df['Department'] == 'Business') & (~df['Employee Number'].isin(['EE109', 'EE037', 'EE034','EE059']))
+
+    # Update start and end times for Business department
+    for idx in df[business_mask].index:
+        original_start = df.loc[idx, 'Adjusted Start Datetime']
+        original_end = df.loc[idx, 'Adjusted End Datetime']
+        new_start = original_start.replace(hour=9, minute=0)
+        new_end = original_start.replace(hour=19, minute=30)
+
+        if original_start != new_start or original_end != new_end:
+            changes.append({
+                'Employee Number': df.loc[idx, 'Employee Number'],
+                'Full Name': f"{df.loc[idx, 'First name']} {df.loc[idx, 'Last name']}",
+                'Original Start': original_start,
+                'New Start': new_start,
+                'Original End': original_end,
+                'New End': new_end,
+                'Reason': 'Adjusted business hours'
+            })
+            df.loc[idx, 'Adjusted Start Datetime'] = new_start
+            df.loc[idx, 'Adjusted End Datetime'] = new_end
+
+    # Recalculate working hours
+    df.loc[business_mask, 'Working Hours'] = (df.loc[business_mask, 'Adjusted End Datetime'] - df.loc[business_mask, 'Adjusted Start Datetime']).dt.total_seconds() / 3600
+
+    return df, changes
+
+def update_from_schedule(timesheet_df, schedule_df):
+    # Make copies to avoid SettingWithCopyWarning
+    timesheet_df = timesheet_df.copy()
+    schedule_df = schedule_df.copy()
+
+    # Convert schedule date and time columns to datetime
+    schedule_df['Date'] = pd.to_datetime(schedule_df['Date'], format='mixed', dayfirst=False)
+    schedule_df['Start'] = pd.to_datetime(schedule_df['Date'].astype(str) + ' ' + schedule_df['Start'], format='mixed', errors='coerce')
+
+    # For Temp employees, split the Users column into First name and Last name
+    schedule_df[['First name', 'Last name']] = schedule_df['Users'].str.split(n=1, expand=True)
+
+    # Create a full name column in both dataframes
+    timesheet_df['Full Name'] = timesheet_df['First name'] + ' ' + timesheet_df['Last name']
+    schedule_df['Full Name'] = schedule_df['First name'] + ' ' + schedule_df['Last name']
+
+    # Convert Start Date to date for merging
+    timesheet_df['Merge Date'] = timesheet_df['Start Date'].dt.date
+    schedule_df['Merge Date'] = schedule_df['Date'].dt.date
+
+    # Merge timesheet with schedule
+    merged_df = pd.merge(
+        timesheet_df,
+        schedule_df[['Merge Date', 'Start', 'Full Name']],
+        left_on=['Merge Date', 'Full Name'],
+        right_on=['Merge Date', 'Full Name'],
+        how='left'
+    )
+
+    changes = []
+    alerts = []
+
+    # Update start time if schedule start time is later, but not more than 1 hour earlier
+    for idx, row in merged_df.iterrows():
+        if pd.notna(row['Start']):
+            time_diff = (row['Start'] - row['Start Datetime']).total_seconds() / 3600
+            if -1 <= time_diff <= 1:
+                original_start = row['Start Datetime']
+                new_start = row['Start']
+                merged_df.at[idx, 'Adjusted Start Datetime'] = new_start
+                changes.append({
+                    'Employee Number': row['Employee Number'],
+                    'Full Name': row['Full Name'],
+                    'Original Start': original_start,
+                    'New Start': new_start,
+                    'Time Difference (hours)': time_diff,
+                    'Reason': 'Schedule start time adjustment'
+                })
+            elif abs(time_diff) > 1:
+                alerts.append({
+                    'Employee Number': row['Employee Number'],
+                    'Full Name': row['Full Name'],
+                    'Timesheet Start': row['Start Datetime'],
+                    'Schedule Start': row['Start'],
+                    'Time Difference (hours)': time_diff,
+                    'Reason': 'Large time difference between timesheet and schedule'
+                })
+
+    # Recalculate working hours
+    merged_df['Working Hours'] = (merged_df['Adjusted End Datetime'] - merged_df['Adjusted Start Datetime']).dt.total_seconds() / 3600
+
+    # Drop unnecessary columns
+    merged_df = merged_df.drop(columns=['Merge Date', 'Start', 'Full Name'])
+
+    return merged_df, changes, alerts
+
+def adjust_lunch_time(df):
+    # Make a copy to avoid SettingWithCopyWarning
+    df = df.copy()
+
+    changes = []
+
+    # Identify records with more than 7 working hours
+    long_day_mask = df['Working Hours'] > 7
+
+    for idx in df[long_day_mask].index:
+        original_hours = df.loc[idx, 'Working Hours']
+        new_hours = original_hours - 0.5
+
+        changes.append({
+            'Employee Number': df.loc[idx, 'Employee Number'],
+            'Full Name': f"{df.loc[idx, 'First name']} {df.loc[idx, 'Last name']}",
+            'Original Hours': original_hours,
+            'New Hours': new_hours,
+            'Reason': 'Subtracted 0.5 hours for lunch'
+        })
+
+        df.loc[idx, 'Working Hours'] = new_hours
+
+    return df, changes
+
+# Salary Calculation functions
+
+def calculate_employee_salary(row, holidays_df, start_date, end_date):
+    # For Temp employees or employees without payrate data, just return total hours
+    if pd.isna(row['REG Pay Rate (正常时薪)']) or row['Department'] == 'Temp':
+        return pd.Series({
+            'Salary': 0,
+            'Regular Pay': 0,
+            'Overtime Pay': 0,
+            'Total Compensation': 0
+        })
+
+    # Check for missing crucial information
+    if pd.isna(row['Annual Or Hourly']) or not any(keyword in str(row['Annual Or Hourly']).lower() for keyword in ['annual', 'hourly', 'daily']):
+        return pd.Series({'Salary': 0, 'Regular Pay': 0, 'Overtime Pay': 0, 'Total Compensation': 0})
+
+    # Handle NaN values
+    row['不需要计算'] = 'No' if pd.isna(row['不需要计算']) else row['不需要计算']
+    row['Follow 打卡时间'] = 'No' if pd.isna(row['Follow 打卡时间']) else row['Follow 打卡时间']
+    row['OT Pay Rate (加班时薪）'] = row['REG Pay Rate (正常时薪)'] if pd.isna(row['OT Pay Rate (加班时薪）']) else row['OT Pay Rate (加班时薪）']
+    row['Bi-weekly 加班费触发小时（有holiday）'] = 80 if pd.isna(row['Bi-weekly 加班费触发小时（有holiday）']) else row['Bi-weekly 加班费触发小时（有holiday）']
+    row['Bi-weekly 加班费触发小时（没有holiday）'] = 80 if pd.isna(row['Bi-weekly 加班费触发小时（没有holiday）']) else row['Bi-weekly 加班费触发小时（没有holiday）']
+
+    if row['不需要计算'] == 'Yes':
+        return pd.Series({'Salary': 0, 'Regular Pay': 0, 'Overtime Pay': 0, 'Total Compensation': 0})
+
+    annual_or_hourly = str(row['Annual Or Hourly']).strip().lower()
+
+    if 'daily' in annual_or_hourly:
+        salary = row['Working Days'] * row['REG Pay Rate (正常时薪)']
+        return pd.Series({'Salary': salary, 'Regular Pay': salary, 'Overtime Pay': 0, 'Total Compensation': salary})
+
+    elif 'annual' in annual_or_hourly:
+        salary = row['REG Pay Rate (正常时薪)']
+        return pd.Series({'Salary': salary, 'Regular Pay': salary, 'Overtime Pay': 0, 'Total Compensation': salary})
+
+    elif 'hourly' in annual_or_hourly:
+        holiday_in_period = any(h in holidays_df['Date'].values for h in pd.date_range(start_date, end_date))
+
+        if row['Follow 打卡时间'] == 'Yes':
+            salary = row['Total Hours'] * row['REG Pay Rate (正常时薪)']
+            return pd.Series({'Salary': salary, 'Regular Pay': salary, 'Overtime Pay': 0, 'Total Compensation': salary})
+        else:
+            if holiday_in_period:
+                regular_hours = row['Bi-weekly 加班费触发小时（有holiday）']
+            else:
+                regular_hours = row['Bi-weekly 加班费触发小时（没有holiday）']
+
+            overtime_hours = max(0, row['Total Hours'] - regular_hours)
+            regular_pay = regular_hours * row['REG Pay Rate (正常时薪)']
+            overtime_pay = overtime_hours * row['OT Pay Rate (加班时薪）']
+            total_salary = regular_pay + overtime_pay
+            return pd.Series({'Salary': total_salary, 'Regular Pay': regular_pay, 'Overtime Pay': overtime_pay, 'Total Compensation': total_salary})
+
+    else:
+        return pd.Series({'Salary': 0, 'Regular Pay': 0, 'Overtime Pay': 0, 'Total Compensation': 0})
+
+def calculate_salary(timesheet_df, payrate_df, holidays_df, production_df, start_date, previous_biweekly_hours):
+    # Convert start_date to datetime
+    start_date = pd.to_datetime(start_date)
+    end_date = start_date + timedelta(days=13)  # Biweekly period
+
+    # Filter timesheet for the biweekly period
+    timesheet_df = timesheet_df[(timesheet_df['Start Date'] >= start_date) & (timesheet_df['Start Date'] <= end_date)]
+
+    # Calculate total working hours and days for each employee
+    employee_totals = timesheet_df.groupby('Employee Number').agg({
+        'Working Hours': 'sum',
+        'Start Date': 'nunique'
+    }).reset_index()
+    employee_totals.columns = ['Employee Number', 'Total Hours', 'Working Days']
+
+    # Merge with payrate data
+    if 'Employee ID' in payrate_df.columns:
+        merged_df = pd.merge(employee_totals, payrate_df, left_on='Employee Number', right_on='Employee ID', how='left')
+    else:
+        merged_df = pd.merge(employee_totals, payrate_df, on='Employee Number', how='left')
+
+    merged_df['Salary'] = merged_df.apply(lambda row: calculate_employee_salary(row, holidays_df, start_date, end_date), axis=1)
+
+    # Calculate holiday pay
+    def calculate_holiday_pay(employee_id, holiday_date, merged_df, timesheet_df, previous_biweekly_hours):
+        employee_data = merged_df[merged_df['Employee Number'] == employee_id].iloc[0]
+        employee_timesheet = timesheet_df[(timesheet_df['Employee Number'] == employee_id) &
+                                          (timesheet_df['Start Date'].dt.date == holiday_date.date())]
+
+        # Part 1: Pay for adjusted work hours on the holiday
+        if not employee_timesheet.empty:
+            holiday_hours = employee_timesheet['Working Hours'].sum()
+            part1_pay = holiday_hours * employee_data['OT Pay Rate (加班时薪）']
+        else:
+            part1_pay = 0
+
+        # Part 2: Additional holiday pay based on previous 2 biweekly periods
+        current_period_hours = employee_data['Total Hours']
+        total_4_weeks_hours = sum(previous_biweekly_hours.get(employee_id, [0, 0])) + current_period_hours
+
+        # Calculate the cap based on trigger hours
+        cap_hours = 0
+        for i in range(2):  # Check for holidays in current and previous biweekly period
+            period_start = start_date - timedelta(days=14*i)
+            period_end = period_start + timedelta(days=13)
+            if any(h in holidays_df['Date'].values for h in pd.date_range(period_start, period_end)):
+                cap_hours += employee_data['Bi-weekly 加班费触发小时（有holiday）']
+            else:
+                cap_hours += employee_data['Bi-weekly 加班费触发小时（没有holiday）']
+
+        capped_hours = min(total_4_weeks_hours, cap_hours)
+        part2_pay = (capped_hours / 10) * employee_data['REG Pay Rate (正常时薪)']
+
+        total_holiday_pay = part1_pay + part2_pay
+        return total_holiday_pay
+
+    # Calculate holiday pay
+    for _, holiday in holidays_df.iterrows():
+        if start_date <= holiday['Date'] <= end_date:
+            merged_df[f'Holiday Pay {holiday["Date"].strftime("%m-%d")}'] = merged_df['Employee Number'].apply(
+                lambda x: calculate_holiday_pay(x, holiday['Date'], merged_df, timesheet_df, previous_biweekly_hours)
+            )
+
+    # Add bonus from production report
+    production_df = production_df[(production_df['Date'] >= start_date) & (production_df['Date'] <= end_date)]
+    bonus_totals = production_df.groupby('Employee ID')['Bonus'].sum().reset_index()
+    merged_df = pd.merge(merged_df, bonus_totals, left_on='Employee Number', right_on='Employee ID', how='left')
+    merged_df['Bonus'] = merged_df['Bonus'].fillna(0)
+
+    # Calculate total compensation
+    merged_df['Total Compensation'] = merged_df.apply(
+        lambda row: row['Salary'] + row['Bonus'] if row['Department'] != 'Temp' else 0,
+        axis=1
+    )
+
+    # Prepare data for next period
+    next_period_hours = merged_df.set_index('Employee Number')['Total Hours'].to_dict()
+
+    return merged_df, next_period_hours
+
+def calculate_salary(timesheet_df, payrate_df, holidays_df, production_df, start_date, previous_biweekly_hours):
+    # Convert start_date to datetime
+    start_date = pd.to_datetime(start_date)
+    end_date = start_date + pd.Timedelta(days=13)  # Biweekly period
+
+    # Filter timesheet for the biweekly period
+    timesheet_df = timesheet_df[(timesheet_df['Start Date'] >= start_date) & (timesheet_df['Start Date'] <= end_date)]
+
+    # Calculate total working hours and days for each employee
+    employee_totals = timesheet_df.groupby('Employee Number').agg({
+        'Working Hours': 'sum',
+        'Start Date': 'nunique',
+        'Department': 'first',
+        'First name': 'first',
+        'Last name': 'first'
+    }).reset_index()
+    employee_totals.columns = ['Employee Number', 'Total Hours', 'Working Days', 'Department', 'First name', 'Last name']
+
+    # Merge with payrate data
+    # merged_df = pd.merge(employee_totals, payrate_df, on='Employee Number', how='left')
+
+    # Determine the matching column
+    if 'Employee Number' in payrate_df.columns:
+        match_column = 'Employee Number'
+    elif 'Employee ID' in payrate_df.columns:
+        match_column = 'Employee ID'
+    else:
+        return pd.DataFrame(), {}
+
+    # Merge with payrate data, but keep all employees even if they don't have a match
+    merged_df = pd.merge(employee_totals, payrate_df, left_on='Employee Number', right_on=match_column, how='left')
+
+    # Calculate basic salary
+    # merged_df['Salary'] = merged_df.apply(lambda row: calculate_employee_salary(row, holidays_df, start_date, end_date), axis=1)
+    salary_info = merged_df.apply(lambda row: calculate_employee_salary(row, holidays_df, start_date, end_date), axis=1)
+    merged_df = pd.concat([merged_df, salary_info], axis=1)
+
+    # Calculate holiday pay (excluding Temp employees)
+    for _, holiday in holidays_df.iterrows():
+        if start_date <= holiday['Date'] <= end_date:
+            merged_df[f'Holiday Pay {holiday["Date"].strftime("%m-%d")}'] = merged_df.apply(
+                lambda row: calculate_holiday_pay(row, holiday['Date'], merged_df, timesheet_df, previous_biweekly_hours) if row['Department'] != 'Temp' else 0,
+                axis=1
+            )
+
+    # Handle production bonus
+    if production_df is not None and 'Date' in production_df.columns:
+        production_df = production_df[(production_df['Date'] >= start_date) & (production_df['Date'] <= end_date)]
+        bonus_totals = production_df.groupby('Employee ID')['Bonus'].sum().reset_index()
+        merged_df = pd.merge(merged_df, bonus_totals, left_on='Employee Number', right_on='Employee ID', how='left')
+        merged_df['Bonus'] = merged_df['Bonus'].fillna(0)
+    else:
+        merged_df['Bonus'] = 0
+
+    # Adjust Total Compensation to include Bonus for all employees
+    merged_df['Total Compensation'] = merged_df['Total Compensation'] + merged_df['Bonus']
+
+    next_period_hours = merged_df.set_index('Employee Number')['Total Hours'].to_dict()
+
+    return merged_df, next_period_hours
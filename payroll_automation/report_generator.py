@@ -1,222 +1,300 @@
+import os
+import re
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
 from openpyxl.utils import get_column_letter
 import contextlib
+from salary_calculation import PAY_COMPONENTS
+from employee_directory import UNMATCHED_COLUMNS
+from payroll_logging import get_logger, stage_event
+
+logger = get_logger('report_generator')
+
+# The report is written with openpyxl's write-only mode: rows are streamed to
+# disk in order and column widths are computed up front from the DataFrames,
+# so memory stays flat no matter how many employee sheets there are.
+
+HEADER_FONT = Font(bold=True)
+HEADER_FILL = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+
+# Columns of an employee's salary row the report relies on, even when there are no rows
+SALARY_KEY_COLUMNS = ['Employee Number', 'Period Start', 'Period End', 'First name', 'Last name', 'Department']
+SUMMARY_HEADERS = ["Employee Number", "Employee Name", "Department", "Total Hours", "Regular Pay", "Overtime Pay", "Holiday Pay", "Bonus", "Total Compensation"]
+TIMESHEET_COLUMNS = ['Employee Number', 'First name', 'Last name', 'Job', 'Department',
+                     'Start Datetime', 'End Datetime', 'Adjusted Start Datetime',
+                     'Adjusted End Datetime', 'Working Hours']
+VACATION_HEADERS = ["Employee Number", "Employee Name", "Department", "Vacation Days", "Start Date", "End Date"]
+SCHEDULE_CHANGE_HEADERS = ["Employee Number", "Full Name", "Original Start", "New Start", "Time Difference (hours)", "Reason"]
+SCHEDULE_ALERT_HEADERS = ["Employee Number", "Full Name", "Timesheet Start", "Schedule Start", "Time Difference (hours)", "Reason"]
+
+# Upper bound on worker processes writing individual payslip files
+MAX_PAYSLIP_WORKERS = 8
 
 @contextlib.contextmanager
 def managed_workbook(filename):
-    wb = Workbook()
+    wb = Workbook(write_only=True)
     try:
         yield wb
     finally:
         wb.save(filename)
         wb.close()
 
-def generate_excel_report(salary_info, processed_timesheet, vacation_info, schedule_changes, schedule_alerts, output_file):
+def as_frame(records, headers):
+    # Change and alert logs may arrive as DataFrames or lists of dicts
+    if isinstance(records, pd.DataFrame):
+        df = records
+    elif isinstance(records, list):
+        df = pd.DataFrame([record for record in records if isinstance(record, dict)])
+    else:
+        df = pd.DataFrame()
+    return df.reindex(columns=headers)
+
+def column_widths(df, headers):
+    # Widest of the header and the string form of every value, per column
+    widths = []
+    for header, column in zip(headers, df.columns):
+        values = df[column].dropna()
+        longest = values.astype(str).str.len().max() if not values.empty else 0
+        widths.append(max(len(str(header)), int(longest)) + 2)
+    return widths
+
+def set_column_widths(ws, widths):
+    for col_num, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
+
+def header_row(ws, headers, font=HEADER_FONT, fill=HEADER_FILL):
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        cells.append(cell)
+    return cells
+
+def cell_value(value):
+    # Styled cells and strings pass through; missing scalars become empty cells
+    if isinstance(value, str) or not pd.api.types.is_scalar(value):
+        return value
+    return None if pd.isna(value) else value
+
+def table_rows(df):
+    # Missing values become empty cells; everything else is written as-is
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+def write_table_sheet(wb, title, df, headers):
+    ws = wb.create_sheet(title=title)
+    set_column_widths(ws, column_widths(df, headers))
+    ws.append(header_row(ws, headers))
+    for row in table_rows(df):
+        ws.append(row)
+    return ws
+
+def employee_names(df, first_column, last_column):
+    if 'Employee Name' in df.columns:
+        return df['Employee Name']
+    return df[first_column].astype(object).fillna('').astype(str) + ' ' + df[last_column].astype(object).fillna('').astype(str)
+
+def pay_summary(pay_components):
+    # Pivot the salary stage's pay components: one column per component, plus
+    # one 'Holiday Pay MM-DD' column per holiday in the periods being reported
+    keys = ['Employee Number', 'Period Start']
+    amounts = pay_components.groupby(keys + ['Component'], observed=True)['Amount'].sum().unstack('Component', fill_value=0.0)
+    amounts = amounts.reindex(columns=PAY_COMPONENTS, fill_value=0.0)
+    amounts.columns = list(amounts.columns)
+
+    holiday_components = pay_components[pay_components['Holiday Date'].notna()]
+    by_holiday = holiday_components.groupby(keys + ['Holiday Date'])['Amount'].sum().unstack('Holiday Date', fill_value=0.0)
+    by_holiday.columns = [f'Holiday Pay {holiday_date.strftime("%m-%d")}' for holiday_date in by_holiday.columns]
+
+    summary = amounts.join(by_holiday).fillna(0.0)
+    summary['Holiday Pay'] = summary['Holiday Worked'] + summary['Holiday Allowance']
+    return summary.reset_index(), list(by_holiday.columns)
+
+def summary_headers(holiday_columns):
+    position = SUMMARY_HEADERS.index('Holiday Pay') + 1
+    return SUMMARY_HEADERS[:position] + holiday_columns + SUMMARY_HEADERS[position:]
+
+def period_label(employee, date_format):
+    # Reports and payslips cover several periods, so every employee sheet and file names its period
+    period_start = employee.get('Period Start')
+    return '' if period_start is None or pd.isna(period_start) else f" {pd.Timestamp(period_start).strftime(date_format)}"
+
+def write_employee_sheet(wb, employee, employee_timesheet, holiday_columns=()):
+    sheet_name = f"{employee['Employee Number']}{period_label(employee, '%y%m%d')} - {employee['Employee Name']}"[:31]  # Excel has a 31 character limit for sheet names
+    ws = wb.create_sheet(title=sheet_name)
+
+    set_column_widths(ws, column_widths(employee_timesheet, TIMESHEET_COLUMNS))
+
+    def bold(value, size=None):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = Font(bold=True, size=size) if size else HEADER_FONT
+        return cell
+
+    # Employee Information, Payroll Summary and Additional Information blocks
+    rows = [
+        [bold("Employee Payroll Report", size=14)],
+        [],
+        [f"Employee Number: {employee['Employee Number']}"],
+        [f"Name: {employee['Employee Name']}"],
+        [f"Department: {employee['Department']}"],
+        [],
+        [bold("Payroll Summary")],
+        ["Total Hours:", employee['Total Hours']],
+        ["Regular Pay Rate:", employee.get('REG Pay Rate (正常时薪)')],
+        ["Regular Pay:", employee['Regular Pay']],
+        ["Overtime Pay Rate:", employee.get('OT Pay Rate (加班时薪）', 0)],
+        ["Overtime Pay:", employee['Overtime Pay']],
+        ["Holiday Pay:", employee['Holiday Pay']],
+        *[[f"  {column}:", employee[column]] for column in holiday_columns],
+        ["Bonus:", employee.get('Bonus', 0)],
+        ["Total Compensation:", employee['Total Compensation']],
+        [],
+        [bold("Additional Information")],
+        ["Bi-weekly Overtime Threshold (with holiday):", employee.get('Bi-weekly 加班费触发小时（有holiday）', 'N/A')],
+        ["Bi-weekly Overtime Threshold (without holiday):", employee.get('Bi-weekly 加班费触发小时（没有holiday）', 'N/A')],
+        ["Annual Or Hourly:", employee.get('Annual Or Hourly', 'N/A')],
+        ["Follow 打卡时间:", employee.get('Follow 打卡时间', 'N/A')],
+    ]
+    for row in rows:
+        ws.append([cell_value(value) for value in row])
+
+    # Timesheet data
+    ws.append(TIMESHEET_COLUMNS)
+    for row in table_rows(employee_timesheet):
+        ws.append(row)
+
+def prepare_salary_info(salary_info, pay_components):
+    # Attach the pivoted pay components to each (employee, period) salary row
+    if salary_info is None or salary_info.empty:
+        # Every period failed or had no employees; the report is still written, with empty tables
+        salary_info = pd.DataFrame({column: pd.Series(dtype='datetime64[ns]' if column.startswith('Period') else object)
+                                    for column in SALARY_KEY_COLUMNS})
+    summary, holiday_columns = pay_summary(pay_components)
+    pay_columns = [column for column in summary.columns if column not in ('Employee Number', 'Period Start')]
+    salary_info = salary_info.drop(columns=pay_columns, errors='ignore')
+    salary_info = salary_info.merge(summary, on=['Employee Number', 'Period Start'], how='left')
+    salary_info[pay_columns] = salary_info[pay_columns].fillna(0.0)
+    salary_info['Employee Name'] = employee_names(salary_info, 'First name', 'Last name')
+    salary_info['Department'] = salary_info['Department'].fillna('N/A') if 'Department' in salary_info.columns else 'N/A'
+    return salary_info, holiday_columns
+
+def timesheet_periods(salary_info, processed_timesheet):
+    # Start of the pay period each timesheet row falls in, by its start date; NaT outside every period
+    periods = salary_info[['Period Start', 'Period End']].drop_duplicates().sort_values('Period Start')
+    starts = periods['Period Start'].to_numpy(dtype='datetime64[ns]')
+    ends = periods['Period End'].to_numpy(dtype='datetime64[ns]')
+    dates = processed_timesheet['Start Date'].to_numpy(dtype='datetime64[ns]')
+    period_start = np.full(len(dates), np.datetime64('NaT'), dtype='datetime64[ns]')
+    if len(starts):
+        period = (np.searchsorted(starts, dates, side='right') - 1).clip(0)
+        in_period = (dates >= starts[period]) & (dates <= ends[period])
+        period_start[in_period] = starts[period[in_period]]
+    return pd.Series(period_start, index=processed_timesheet.index, name='Period Start')
+
+def employee_timesheets(salary_info, processed_timesheet):
+    # Group the timesheet once by employee and pay period and hand each salary
+    # row the punches of its own period, instead of filtering the whole table
+    # for every employee
+    timesheet = processed_timesheet.reindex(columns=TIMESHEET_COLUMNS)
+    no_rows = timesheet.iloc[0:0]
+    by_period = {'Period Start', 'Period End'} <= set(salary_info.columns) and 'Start Date' in processed_timesheet.columns
+    if by_period:
+        keys = [timesheet['Employee Number'], timesheet_periods(salary_info, processed_timesheet)]
+    else:
+        keys = 'Employee Number'
+    positions = timesheet.groupby(keys, sort=False, observed=True).indices
+    for employee in salary_info.to_dict('records'):
+        key = (employee['Employee Number'], pd.Timestamp(employee['Period Start'])) if by_period else employee['Employee Number']
+        rows = positions.get(key)
+        yield employee, (timesheet.iloc[rows] if rows is not None else no_rows)
+
+def payslip_filename(employee):
+    name = f"{employee['Employee Number']} - {employee['Employee Name']}{period_label(employee, '%Y-%m-%d')}"
+    return re.sub(r'[\\/:*?"<>|]+', '_', name).strip() + '.xlsx'
+
+def write_payslips(payslips, output_dir, holiday_columns=()):
+    # Runs in a worker process: one single-sheet workbook per employee
+    paths = []
+    for employee, employee_timesheet in payslips:
+        path = os.path.join(output_dir, payslip_filename(employee))
+        with managed_workbook(path) as wb:
+            write_employee_sheet(wb, employee, employee_timesheet, holiday_columns)
+        paths.append(path)
+    return paths
+
+def generate_payslips(salary_info, pay_components, processed_timesheet, output_dir, max_workers=None):
+    os.makedirs(output_dir, exist_ok=True)
+    salary_info, holiday_columns = prepare_salary_info(salary_info, pay_components)
+    payslips = list(employee_timesheets(salary_info, processed_timesheet))
+    if max_workers is None:
+        max_workers = min(len(payslips), os.cpu_count() or 1, MAX_PAYSLIP_WORKERS)
+
+    if max_workers <= 1:
+        paths = write_payslips(payslips, output_dir, holiday_columns)
+    else:
+        # Contiguous batches keep the per-task pickling overhead low
+        batch_size = -(-len(payslips) // max_workers)
+        batches = [payslips[i:i + batch_size] for i in range(0, len(payslips), batch_size)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            batch_paths = executor.map(write_payslips, batches, [output_dir] * len(batches), [holiday_columns] * len(batches))
+            paths = [path for paths_of_batch in batch_paths for path in paths_of_batch]
+
+    stage_event(logger, 'generate_payslips', f"Generated {len(paths)} payslips in {output_dir}", payslips=len(paths))
+    return paths
+
+def generate_excel_report(salary_info, pay_components, processed_timesheet, vacation_info, schedule_changes, schedule_alerts, output_file, payslip_dir=None, max_workers=None, unmatched_records=None):
+    report_salary_info, holiday_columns = prepare_salary_info(salary_info, pay_components)
+
     with managed_workbook(output_file) as wb:
-        # 1. Summary Salary Report
-        ws = wb.active
-        ws.title = "Summary Salary Report"
-        
-        # Add headers
-        headers = ["Employee Number", "Employee Name", "Department", "Total Hours", "Regular Pay", "Overtime Pay", "Holiday Pay", "Bonus", "Total Compensation"]
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-        
-        # Add data
-        for row, (_, employee) in enumerate(salary_info.iterrows(), start=2):
-            employee_timesheet = combined_timesheet[combined_timesheet['Employee Number'] == employee['Employee Number']]
-            department = employee_timesheet['Department'].iloc[0] if not employee_timesheet.empty else 'N/A'
-            
-            ws.cell(row=row, column=1, value=employee['Employee Number'])
-            ws.cell(row=row, column=2, value=employee['Employee Name'])
-            ws.cell(row=row, column=3, value=department)
-            ws.cell(row=row, column=4, value=employee['Total Hours'])
-            ws.cell(row=row, column=5, value=employee['Salary'] - employee['OT Pay Rate (加班时薪）'] * max(0, employee['Total Hours'] - employee['Bi-weekly 加班费触发小时（有holiday）']))
-            ws.cell(row=row, column=6, value=employee['OT Pay Rate (加班时薪）'] * max(0, employee['Total Hours'] - employee['Bi-weekly 加班费触发小时（有holiday）']))
-            ws.cell(row=row, column=7, value=employee['Holiday Pay 08-05'] if 'Holiday Pay 08-05' in employee else 0)
-            ws.cell(row=row, column=8, value=employee['Bonus'])
-            ws.cell(row=row, column=9, value=employee['Total Compensation'])
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # # 2. Individual Payroll Reports
-        for _, employee in salary_info.iterrows():
-            sheet_name = f"{employee['Employee Number']} - {employee['Employee Name']}"[:31]  # Excel has a 31 character limit for sheet names
-            ws = wb.create_sheet(title=sheet_name)
-            
-            employee_timesheet = processed_timesheet[processed_timesheet['Employee Number'] == employee['Employee Number']].copy()
-            department = employee_timesheet['Department'].iloc[0] if not employee_timesheet.empty else 'N/A'
-            
-            # Employee Information
-            ws['A1'] = "Employee Payroll Report"
-            ws['A1'].font = Font(bold=True, size=14)
-            ws['A3'] = f"Employee Number: {employee['Employee Number']}"
-            ws['A4'] = f"Name: {employee['Employee Name']}"
-            ws['A5'] = f"Department: {department}"
-            
-            # Payroll Summary
-            ws['A7'] = "Payroll Summary"
-            ws['A7'].font = Font(bold=True)
-            ws['A8'] = "Total Hours:"
-            ws['B8'] = employee['Total Hours']
-            ws['A9'] = "Regular Pay Rate:"
-            ws['B9'] = employee['REG Pay Rate (正常时薪)']
-            ws['A10'] = "Regular Pay:"
-            regular_pay = employee['Salary'] - employee.get('OT Pay Rate (加班时薪）', 0) * max(0, employee['Total Hours'] - employee.get('Bi-weekly 加班费触发小时（有holiday）', 0))
-            ws['B10'] = regular_pay
-            ws['A11'] = "Overtime Pay Rate:"
-            ws['B11'] = employee.get('OT Pay Rate (加班时薪）', 0)
-            ws['A12'] = "Overtime Pay:"
-            overtime_pay = employee.get('OT Pay Rate (加班时薪）', 0) * max(0, employee['Total Hours'] - employee.get('Bi-weekly 加班费触发小时（有holiday）', 0))
-            ws['B12'] = overtime_pay
-            ws['A13'] = "Holiday Pay:"
-            ws['B13'] = employee.get('Holiday Pay 08-05', 0)
-            ws['A14'] = "Bonus:"
-            ws['B14'] = employee.get('Bonus', 0)
-            ws['A15'] = "Total Compensation:"
-            ws['B15'] = employee['Total Compensation']
-            
-            # Additional Information
-            ws['A17'] = "Additional Information"
-            ws['A17'].font = Font(bold=True)
-            ws['A18'] = "Bi-weekly Overtime Threshold (with holiday):"
-            ws['B18'] = employee.get('Bi-weekly 加班费触发小时（有holiday）', 'N/A')
-            ws['A19'] = "Bi-weekly Overtime Threshold (without holiday):"
-            ws['B19'] = employee.get('Bi-weekly 加班费触发小时（没有holiday）', 'N/A')
-            ws['A20'] = "Annual Or Hourly:"
-            ws['B20'] = employee.get('Annual Or Hourly', 'N/A')
-            ws['A21'] = "Follow 打卡时间:"
-            ws['B21'] = employee.get('Follow 打卡时间', 'N/A')
-            
-            # Select and reorder columns for the timesheet
-            timesheet_columns = ['Employee Number', 'First name', 'Last name', 'Job', 'Department', 
-                                 'Start Datetime', 'End Datetime', 'Adjusted Start Datetime', 
-                                 'Adjusted End Datetime', 'Working Hours']
-            
-            employee_timesheet_filtered = employee_timesheet[timesheet_columns]
-            
-            # Add timesheet data
-            for r in dataframe_to_rows(employee_timesheet_filtered, index=False, header=True):
-                ws.append(r)
-
-            # Auto-adjust column widths for timesheet
-            for col_num, column_title in enumerate(timesheet_columns, start=1):
-                column_letter = get_column_letter(col_num)
-                max_length = len(str(column_title))
-                for cell in ws[column_letter][24:]:  # Start from row 24 (after the header)
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(cell.value)
-                    except:
-                        pass
-                adjusted_width = (max_length + 2)
-                ws.column_dimensions[column_letter].width = adjusted_width
-
-        
+        # 1. Summary Salary Report, with a column per holiday in the reported periods
+        headers = summary_headers(holiday_columns)
+        write_table_sheet(wb, "Summary Salary Report", report_salary_info.reindex(columns=headers), headers)
+
+        # 2. Individual Payroll Reports
+        for employee, employee_timesheet in employee_timesheets(report_salary_info, processed_timesheet):
+            write_employee_sheet(wb, employee, employee_timesheet, holiday_columns)
+
         # 3. Vacation Report
-        ws = wb.create_sheet(title="Vacation Report")
-        
-        # Add headers
-        headers = ["Employee Number", "Employee Name", "Department", "Vacation Days"]
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-        
-        # Add data
-        for row, (_, vacation) in enumerate(vacation_info.iterrows(), start=2):
-            ws.cell(row=row, column=1, value=vacation['Employee Number'])
-            ws.cell(row=row, column=2, value=f"{vacation['First Name']} {vacation['Last Name']}")
-            ws.cell(row=row, column=3, value=vacation['Department'])
-            ws.cell(row=row, column=4, value=vacation['Vacation Days'])
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-         # 4. Schedule Changes Report
-        if isinstance(schedule_changes, list) and schedule_changes:
-            ws = wb.create_sheet(title="Schedule Changes")
-            
-            # Add headers
-            headers = ["Employee Number", "Full Name", "Original Start", "New Start", "Time Difference (hours)", "Reason"]
-            for col, header in enumerate(headers, start=1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-            
-            # Add data
-            for row, change in enumerate(schedule_changes, start=2):
-                if isinstance(change, dict):
-                    for col, key in enumerate(headers, start=1):
-                        ws.cell(row=row, column=col, value=change.get(key, ''))
-                else:
-                    print(f"Warning: Unexpected type in schedule_changes: {type(change)}")
+        vacation_report = pd.DataFrame(columns=VACATION_HEADERS)
+        if vacation_info is not None and not vacation_info.empty:
+            vacation_report = pd.DataFrame({
+                'Employee Number': vacation_info['Employee Number'],
+                'Employee Name': employee_names(vacation_info, 'First Name', 'Last Name'),
+                'Department': vacation_info['Department'],
+                'Vacation Days': vacation_info['Vacation Days'],
+                'Start Date': vacation_info.get('Start Date'),
+                'End Date': vacation_info.get('End Date')
+            })
+        write_table_sheet(wb, "Vacation Report", vacation_report, VACATION_HEADERS)
+
+        # 4. Schedule Changes Report
+        changes_report = as_frame(schedule_changes, SCHEDULE_CHANGE_HEADERS)
+        if not changes_report.empty:
+            write_table_sheet(wb, "Schedule Changes", changes_report, SCHEDULE_CHANGE_HEADERS)
         else:
-            print("No schedule changes to report or invalid data type.")
+            logger.info("No schedule changes to report or invalid data type.")
 
         # 5. Schedule Alerts Report
-        if isinstance(schedule_alerts, list) and schedule_alerts:
-            ws = wb.create_sheet(title="Schedule Alerts")
-            
-            # Add headers
-            headers = ["Employee Number", "Full Name", "Timesheet Start", "Schedule Start", "Time Difference (hours)", "Reason"]
-            for col, header in enumerate(headers, start=1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-            
-            # Add data
-            for row, alert in enumerate(schedule_alerts, start=2):
-                if isinstance(alert, dict):
-                    for col, key in enumerate(headers, start=1):
-                        ws.cell(row=row, column=col, value=alert.get(key, ''))
-                else:
-                    print(f"Warning: Unexpected type in schedule_alerts: {type(alert)}")
+        alerts_report = as_frame(schedule_alerts, SCHEDULE_ALERT_HEADERS)
+        if not alerts_report.empty:
+            write_table_sheet(wb, "Schedule Alerts", alerts_report, SCHEDULE_ALERT_HEADERS)
         else:
-            print("No schedule alerts to report or invalid data type.")
-
-        # Auto-adjust column widths for new sheets
-        for sheet_name in ["Schedule Changes", "Schedule Alerts"]:
-            if sheet_name in wb.sheetnames:
-                ws = wb[sheet_name]
-                for column in ws.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(cell.value)
-                        except:
-                            pass
-                    adjusted_width = (max_length + 2)
-                    ws.column_dimensions[column_letter].width = adjusted_width
-
-    print(f"Excel report generated: {output_file}")
-
-    print(f"Excel report generated: {output_file}")
+            logger.info("No schedule alerts to report or invalid data type.")
+
+        # 6. Records of any source that could not be matched to an employee
+        unmatched_report = as_frame(unmatched_records, UNMATCHED_COLUMNS)
+        if not unmatched_report.empty:
+            write_table_sheet(wb, "Unmatched Records", unmatched_report, UNMATCHED_COLUMNS)
+
+    stage_event(logger, 'generate_excel_report', f"Excel report generated: {getattr(output_file, 'name', output_file)}",
+                employees=len(report_salary_info))
+
+    # Optionally also emit each employee's sheet as a separate payslip file
+    if payslip_dir is not None:
+        generate_payslips(salary_info, pay_components, processed_timesheet, payslip_dir, max_workers)
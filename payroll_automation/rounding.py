@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+# Half-hour rounding rules shared by the payroll and performance pipelines.
+# Each rule is (first minute, last minute, rounded minute); a rounded minute of
+# 60 rolls the punch over to the top of the next hour.
+START_TIME_RULES = (
+    (0, 5, 0),
+    (6, 35, 30),
+    (36, 59, 60),
+)
+
+END_TIME_RULES = (
+    (0, 24, 0),
+    (25, 54, 30),
+    (55, 59, 60),
+)
+
+MINUTE_NS = 60 * 1_000_000_000
+HOUR_NS = 60 * MINUTE_NS
+
+def validate_rules(rules):
+    covered = np.zeros(60, dtype=int)
+    for first_minute, last_minute, rounded_minute in rules:
+        if not 0 <= first_minute <= last_minute <= 59:
+            raise ValueError(f"Invalid minute range in rounding rule: {first_minute}-{last_minute}")
+        if not 0 <= rounded_minute <= 60:
+            raise ValueError(f"Invalid rounded minute in rounding rule: {rounded_minute}")
+        covered[first_minute:last_minute + 1] += 1
+    if (covered != 1).any():
+        raise ValueError("Rounding rules must cover every minute 0-59 exactly once")
+
+def round_datetimes(values, rules):
+    # Work on the int64 nanosecond representation so the whole column is
+    # rounded with a handful of array operations instead of one Timestamp per row
+    validate_rules(rules)
+    series = pd.Series(values)
+    stamps = series.to_numpy(dtype='datetime64[ns]')
+    ns = stamps.view('i8')
+    missing = np.isnat(stamps)
+
+    hour_start = ns - np.mod(ns, HOUR_NS)
+    minute = (ns - hour_start) // MINUTE_NS
+    # Seconds are carried through untouched, as datetime.replace(minute=...) does
+    below_minute = np.mod(ns, MINUTE_NS)
+
+    rounded_minute = np.zeros_like(minute)
+    for first_minute, last_minute, target in rules:
+        mask = (minute >= first_minute) & (minute <= last_minute)
+        rounded_minute[mask] = target
+
+    rounded = hour_start + rounded_minute * MINUTE_NS + below_minute
+    rounded[missing] = np.iinfo(np.int64).min
+    return pd.Series(rounded.view('datetime64[ns]'), index=series.index, name=series.name)
+
+def adjust_start_times(values, rules=START_TIME_RULES):
+    return round_datetimes(values, rules)
+
+def adjust_end_times(values, rules=END_TIME_RULES):
+    return round_datetimes(values, rules)
@@ -1,321 +1,412 @@
+import logging
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from time_adjustments import ADJUSTMENT_RULES_VERSION, process_vacations, combine_time, adjust_business_hours, update_from_schedule, adjust_lunch_time
+from period_hours import load_period_hours, store_period_hours, period_hours_records, upsert_period_hours, previous_biweekly_hours, empty_period_hours
+from policies import SHIFT_WINDOW_POLICIES, LUNCH_POLICIES
+from workbook_cache import frame_key, cache_get, cache_put
+from payroll_logging import get_logger, stage_event
+from instrumentation import measure_stage
+from employee_directory import resolve_employee_keys
+from timesheet_schema import enforce_timesheet_schema, plain_strings
+
+logger = get_logger('salary_calculation')
+
 # Salary Calculation functions
 
-def calculate_employee_salary(row, holidays_df, start_date, end_date):
-    print(f"\nCalculating salary for Employee {row['Employee Number']}:")
-    print(f"  Department: {row['Department']}")
-    print(f"  Total Hours: {row['Total Hours']}")
-    print(f"  Working Days: {row['Working Days']}")
-    
-    # For Temp employees or employees without payrate data, just return total hours
-    if pd.isna(row['REG Pay Rate (正常时薪)']) or row['Department'] == 'Temp':
-        return pd.Series({
-            'Salary': 0,
-            'Regular Pay': 0,
-            'Overtime Pay': 0,
-            'Total Compensation': 0
-        })
-    
-    print(f"  不需要计算: {row['不需要计算']}")
-    print(f"  Follow 打卡时间: {row['Follow 打卡时间']}")
-    print(f"  Annual Or Hourly: {row['Annual Or Hourly']}")
-    print(f"  REG Pay Rate: {row['REG Pay Rate (正常时薪)']}")
-    print(f"  OT Pay Rate: {row['OT Pay Rate (加班时薪）']}")
-    
-    # Check for missing crucial information
-    if pd.isna(row['Annual Or Hourly']) or not any(keyword in str(row['Annual Or Hourly']).lower() for keyword in ['annual', 'hourly', 'daily']):
-        print("  Missing or invalid Annual Or Hourly value. Setting salary to 0.")
-        return pd.Series({'Salary': 0, 'Regular Pay': 0, 'Overtime Pay': 0, 'Total Compensation': 0})
-    
-    # Handle NaN values
-    row['不需要计算'] = 'No' if pd.isna(row['不需要计算']) else row['不需要计算']
-    row['Follow 打卡时间'] = 'No' if pd.isna(row['Follow 打卡时间']) else row['Follow 打卡时间']
-    row['OT Pay Rate (加班时薪）'] = row['REG Pay Rate (正常时薪)'] if pd.isna(row['OT Pay Rate (加班时薪）']) else row['OT Pay Rate (加班时薪）']
-    row['Bi-weekly 加班费触发小时（有holiday）'] = 80 if pd.isna(row['Bi-weekly 加班费触发小时（有holiday）']) else row['Bi-weekly 加班费触发小时（有holiday）']
-    row['Bi-weekly 加班费触发小时（没有holiday）'] = 80 if pd.isna(row['Bi-weekly 加班费触发小时（没有holiday）']) else row['Bi-weekly 加班费触发小时（没有holiday）']
-
-    print(f"  Adjusted values:")
-    print(f"    不需要计算: {row['不需要计算']}")
-    print(f"    Follow 打卡时间: {row['Follow 打卡时间']}")
-    print(f"    OT Pay Rate: {row['OT Pay Rate (加班时薪）']}")
-    print(f"    Bi-weekly 加班费触发小时（有holiday）: {row['Bi-weekly 加班费触发小时（有holiday）']}")
-    print(f"    Bi-weekly 加班费触发小时（没有holiday）: {row['Bi-weekly 加班费触发小时（没有holiday）']}")
-
-    if row['不需要计算'] == 'Yes':
-        print("  不需要计算 = Yes, Salary = 0")
-        return pd.Series({'Salary': 0, 'Regular Pay': 0, 'Overtime Pay': 0, 'Total Compensation': 0})
-    
-    annual_or_hourly = str(row['Annual Or Hourly']).strip().lower()
+# Pay components: one typed row per employee, period and component. Holiday
+# components carry the holiday they were paid for, so the report can pivot this
+# table into its columns instead of recomputing any pay.
+PAY_COMPONENTS = ['Regular Pay', 'Overtime Pay', 'Holiday Worked', 'Holiday Allowance', 'Bonus']
+PAY_COMPONENT_COLUMNS = ['Employee Number', 'Period Start', 'Component', 'Holiday Date', 'Hours', 'Rate', 'Amount']
 
-    if 'daily' in annual_or_hourly:
-        salary = row['Working Days'] * row['REG Pay Rate (正常时薪)']
-        print(f"  Daily, Salary = {row['Working Days']} * {row['REG Pay Rate (正常时薪)']} = {salary}")
-        return pd.Series({'Salary': salary, 'Regular Pay': salary, 'Overtime Pay': 0, 'Total Compensation': salary})
-    
-    elif 'annual' in annual_or_hourly:
-        salary = row['REG Pay Rate (正常时薪)']
-        print(f"  Annual, Salary = {row['REG Pay Rate (正常时薪)']} = {salary}")
-        return pd.Series({'Salary': salary, 'Regular Pay': salary, 'Overtime Pay': 0, 'Total Compensation': salary})
-    
-    elif 'hourly' in annual_or_hourly:
-        holiday_in_period = any(h in holidays_df['Date'].values for h in pd.date_range(start_date, end_date))
-        
-        if row['Follow 打卡时间'] == 'Yes':
-            salary = row['Total Hours'] * row['REG Pay Rate (正常时薪)']
-            print(f"  Hourly, Follow 打卡时间 = Yes, Salary = {row['Total Hours']} * {row['REG Pay Rate (正常时薪)']} = {salary}")
-            return pd.Series({'Salary': salary, 'Regular Pay': salary, 'Overtime Pay': 0, 'Total Compensation': salary})
-        else:
-            if holiday_in_period:
-                regular_hours = row['Bi-weekly 加班费触发小时（有holiday）']
-                print(f"  Holiday in period, using 加班费触发小时（有holiday）: {regular_hours}")
-            else:
-                regular_hours = row['Bi-weekly 加班费触发小时（没有holiday）']
-                print(f"  No holiday in period, using 加班费触发小时（没有holiday）: {regular_hours}")
-            
-            overtime_hours = max(0, row['Total Hours'] - regular_hours)
-            regular_pay = regular_hours * row['REG Pay Rate (正常时薪)']
-            overtime_pay = overtime_hours * row['OT Pay Rate (加班时薪）']
-            total_salary = regular_pay + overtime_pay
-            print(f"  Hourly, Follow 打卡时间 = No, Salary = ({regular_hours} * {row['REG Pay Rate (正常时薪)']} + {overtime_hours} * {row['OT Pay Rate (加班时薪）']}) = {total_salary}")
-            return pd.Series({'Salary': total_salary, 'Regular Pay': regular_pay, 'Overtime Pay': overtime_pay, 'Total Compensation': total_salary})
-    
-    else:
-        print(f"  Unknown Annual Or Hourly value: {row['Annual Or Hourly']}, Setting salary to 0")
-        return pd.Series({'Salary': 0, 'Regular Pay': 0, 'Overtime Pay': 0, 'Total Compensation': 0})
+def pay_component_rows(employee_numbers, component, hours, rate, amount, holiday_date=pd.NaT):
+    return pd.DataFrame({
+        'Employee Number': np.asarray(employee_numbers),
+        'Component': component,
+        'Holiday Date': pd.Timestamp(holiday_date),
+        'Hours': np.asarray(hours, dtype=float),
+        'Rate': np.asarray(rate, dtype=float),
+        'Amount': np.asarray(amount, dtype=float)
+    })
 
-def calculate_salary(timesheet_df, payrate_df, holidays_df, production_df, start_date, previous_biweekly_hours):
-    print("\nCalculating Salary")
-    
-    # Convert start_date to datetime
-    start_date = pd.to_datetime(start_date)
-    end_date = start_date + timedelta(days=13)  # Biweekly period
-    print(f"Calculation period: {start_date.date()} to {end_date.date()}")
-    
-    # Filter timesheet for the biweekly period
-    timesheet_df = timesheet_df[(timesheet_df['Start Date'] >= start_date) & (timesheet_df['Start Date'] <= end_date)]
-    
-    # Calculate total working hours and days for each employee
-    employee_totals = timesheet_df.groupby('Employee Number').agg({
-        'Working Hours': 'sum',
-        'Start Date': 'nunique'
-    }).reset_index()
-    employee_totals.columns = ['Employee Number', 'Total Hours', 'Working Days']
-    print("\nEmployee Totals (sample):")
-    print(employee_totals.head())
-    
-    # Merge with payrate data
-    if 'Employee ID' in payrate_df.columns:
-        merged_df = pd.merge(employee_totals, payrate_df, left_on='Employee Number', right_on='Employee ID', how='left')
+def typed_pay_components(frames, period_start=pd.NaT):
+    frames = [frame for frame in frames if not frame.empty]
+    components = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=PAY_COMPONENT_COLUMNS)
+    components['Period Start'] = pd.Timestamp(period_start)
+    components['Component'] = pd.Categorical(components['Component'], categories=PAY_COMPONENTS)
+    components['Holiday Date'] = pd.to_datetime(components['Holiday Date']).astype('datetime64[ns]')
+    components['Period Start'] = components['Period Start'].astype('datetime64[ns]')
+    components = components.astype({'Hours': 'float64', 'Rate': 'float64', 'Amount': 'float64'})
+    return components[PAY_COMPONENT_COLUMNS]
+
+def empty_pay_components():
+    return typed_pay_components([])
+
+def is_holiday_in_period(holidays_df, start_date, end_date):
+    holiday_dates = pd.to_datetime(holidays_df['Date']).dt.normalize()
+    return bool(holiday_dates.between(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date)).any())
+
+def calculate_base_pay(merged_df, holiday_in_period):
+    # Evaluate the Daily/Annual/Hourly branches over whole columns at once
+    reg_rate = merged_df['REG Pay Rate (正常时薪)'].astype(float)
+    ot_rate = merged_df['OT Pay Rate (加班时薪）'].astype(float).fillna(reg_rate)
+    total_hours = merged_df['Total Hours'].astype(float)
+    working_days = merged_df['Working Days'].astype(float)
+    pay_type = merged_df['Annual Or Hourly'].astype(str).str.strip().str.lower()
+    skip = merged_df['不需要计算'].eq('Yes')
+    follow_punches = merged_df['Follow 打卡时间'].eq('Yes')
+
+    # Temp employees, employees without payrate data or a valid pay type are not paid here
+    no_pay = (
+        reg_rate.isna()
+        | merged_df['Department'].eq('Temp')
+        | merged_df['Annual Or Hourly'].isna()
+        | ~pay_type.str.contains('annual|hourly|daily')
+        | skip
+    )
+    is_daily = ~no_pay & pay_type.str.contains('daily')
+    is_annual = ~no_pay & ~is_daily & pay_type.str.contains('annual')
+    is_hourly = ~no_pay & ~is_daily & ~is_annual & pay_type.str.contains('hourly')
+    is_hourly_follow = is_hourly & follow_punches
+    is_hourly_overtime = is_hourly & ~follow_punches
+
+    # Overtime trigger hours depend on whether the period has a holiday
+    if holiday_in_period:
+        trigger_hours = merged_df['Bi-weekly 加班费触发小时（有holiday）']
     else:
-        print("Warning: 'Employee ID' column not found in payrate data. Merging on 'Employee Number'.")
-        merged_df = pd.merge(employee_totals, payrate_df, on='Employee Number', how='left')
-    
-    # Check for unmatched employees
-    unmatched = merged_df[merged_df['REG Pay Rate (正常时薪)'].isna()]
-    if not unmatched.empty:
-        print(f"\nWarning: {len(unmatched)} employees not matched with payrate data:")
-        print(unmatched[['Employee Number', 'Total Hours', 'Working Days']])
-    
-    merged_df['Salary'] = merged_df.apply(lambda row: calculate_employee_salary(row, holidays_df, start_date, end_date), axis=1)
-    
-    # Calculate holiday pay
-    def calculate_holiday_pay(employee_id, holiday_date, merged_df, timesheet_df, previous_biweekly_hours):
-        employee_data = merged_df[merged_df['Employee Number'] == employee_id].iloc[0]
-        employee_timesheet = timesheet_df[(timesheet_df['Employee Number'] == employee_id) & 
-                                          (timesheet_df['Start Date'].dt.date == holiday_date.date())]
-        
-        # Part 1: Pay for adjusted work hours on the holiday
-        if not employee_timesheet.empty:
-            holiday_hours = employee_timesheet['Working Hours'].sum()
-            part1_pay = holiday_hours * employee_data['OT Pay Rate (加班时薪）']
-        else:
-            part1_pay = 0
-        
-        # Part 2: Additional holiday pay based on previous 2 biweekly periods
-        current_period_hours = employee_data['Total Hours']
-        total_4_weeks_hours = sum(previous_biweekly_hours.get(employee_id, [0, 0])) + current_period_hours
-        
-        # Calculate the cap based on trigger hours
-        cap_hours = 0
-        for i in range(2):  # Check for holidays in current and previous biweekly period
-            period_start = start_date - timedelta(days=14*i)
-            period_end = period_start + timedelta(days=13)
-            if any(h in holidays_df['Date'].values for h in pd.date_range(period_start, period_end)):
-                cap_hours += employee_data['Bi-weekly 加班费触发小时（有holiday）']
-            else:
-                cap_hours += employee_data['Bi-weekly 加班费触发小时（没有holiday）']
-        
-        capped_hours = min(total_4_weeks_hours, cap_hours)
-        part2_pay = (capped_hours / 10) * employee_data['REG Pay Rate (正常时薪)']
-        
-        total_holiday_pay = part1_pay + part2_pay
-        print(f"  Holiday Pay for {employee_id} on {holiday_date.date()}: Part1 = {part1_pay}, Part2 = {part2_pay}, Total = {total_holiday_pay}")
-        return total_holiday_pay
-    
-    # Calculate holiday pay
-    for _, holiday in holidays_df.iterrows():
-        if start_date <= holiday['Date'] <= end_date:
-            print(f"\nCalculating Holiday Pay for {holiday['Date'].date()}:")
-            merged_df[f'Holiday Pay {holiday["Date"].strftime("%m-%d")}'] = merged_df['Employee Number'].apply(
-                lambda x: calculate_holiday_pay(x, holiday['Date'], merged_df, timesheet_df, previous_biweekly_hours)
-            )
-    
-    # Add bonus from production report
-    production_df = production_df[(production_df['Date'] >= start_date) & (production_df['Date'] <= end_date)]
-    bonus_totals = production_df.groupby('Employee ID')['Bonus'].sum().reset_index()
-    merged_df = pd.merge(merged_df, bonus_totals, left_on='Employee Number', right_on='Employee ID', how='left')
-    merged_df['Bonus'] = merged_df['Bonus'].fillna(0)
-    
-    # Calculate total compensation
-    merged_df['Total Compensation'] = merged_df.apply(
-        lambda row: row['Salary'] + row['Bonus'] if row['Department'] != 'Temp' else 0,
-        axis=1
+        trigger_hours = merged_df['Bi-weekly 加班费触发小时（没有holiday）']
+    regular_hours = trigger_hours.astype(float).fillna(80)
+    overtime_hours = (total_hours - regular_hours).clip(lower=0)
+
+    regular_pay = np.select(
+        [is_daily, is_annual, is_hourly_follow, is_hourly_overtime],
+        [working_days * reg_rate, reg_rate, total_hours * reg_rate, regular_hours * reg_rate],
+        default=0.0
     )
-    
-    # Prepare data for next period
-    next_period_hours = merged_df.set_index('Employee Number')['Total Hours'].to_dict()
-    
-    return merged_df, next_period_hours
+    overtime_pay = np.where(is_hourly_overtime, overtime_hours * ot_rate, 0.0)
+    salary = regular_pay + overtime_pay
+
+    # Hours the pay was computed from; daily and annual pay are not hour based
+    paid_regular_hours = np.select([is_hourly_follow, is_hourly_overtime], [total_hours, regular_hours], default=np.nan)
+    paid_overtime_hours = np.where(is_hourly_overtime, overtime_hours, 0.0)
+
+    return pd.DataFrame({
+        'Salary': salary,
+        'Regular Hours': paid_regular_hours,
+        'Regular Pay': regular_pay,
+        'Overtime Hours': paid_overtime_hours,
+        'Overtime Pay': overtime_pay,
+        'Total Compensation': salary
+    }, index=merged_df.index)
+
+def base_pay_components(merged_df):
+    reg_rate = merged_df['REG Pay Rate (正常时薪)'].astype(float)
+    ot_rate = merged_df['OT Pay Rate (加班时薪）'].astype(float).fillna(reg_rate)
+    employees = merged_df['Employee Number']
+    return [
+        pay_component_rows(employees, 'Regular Pay', merged_df['Regular Hours'], reg_rate, merged_df['Regular Pay']),
+        pay_component_rows(employees, 'Overtime Pay', merged_df['Overtime Hours'], ot_rate, merged_df['Overtime Pay'])
+    ]
+
+def calculate_hours_by_day(timesheet_df):
+    # Hours keyed by (Employee Number, work date), built once per period
+    work_date = timesheet_df['Start Date'].dt.normalize().rename('Work Date')
+    return timesheet_df.groupby(['Employee Number', work_date], observed=True)['Working Hours'].sum().astype('float64')
+
+def calculate_holiday_pay(merged_df, hours_by_day, holidays_df, start_date, holiday_dates, previous_biweekly_hours):
+    reg_rate = merged_df['REG Pay Rate (正常时薪)'].astype(float)
+    ot_rate = merged_df['OT Pay Rate (加班时薪）'].astype(float).fillna(reg_rate)
+    with_holiday = merged_df['Bi-weekly 加班费触发小时（有holiday）'].astype(float).fillna(80)
+    without_holiday = merged_df['Bi-weekly 加班费触发小时（没有holiday）'].astype(float).fillna(80)
+
+    # Part 2 cap: trigger hours of the current and previous biweekly periods
+    cap_hours = 0
+    for i in range(2):
+        period_start = start_date - timedelta(days=14 * i)
+        period_end = period_start + timedelta(days=13)
+        cap_hours = cap_hours + (with_holiday if is_holiday_in_period(holidays_df, period_start, period_end) else without_holiday)
+
+    previous_hours = merged_df['Employee Number'].astype(str).map(
+        {employee: sum(hours) for employee, hours in previous_biweekly_hours.items()}
+    ).fillna(0)
+    total_4_weeks_hours = previous_hours + merged_df['Total Hours']
+    part2_hours = np.minimum(total_4_weeks_hours, cap_hours) / 10
+
+    # Part 1: hours worked on each holiday, joined once from the (employee, date) index
+    on_holiday = hours_by_day[hours_by_day.index.get_level_values('Work Date').isin(holiday_dates)]
+    holiday_hours = on_holiday.unstack('Work Date').reindex(
+        index=merged_df['Employee Number'], columns=holiday_dates, fill_value=0
+    ).fillna(0)
+
+    # One worked and one allowance component per holiday; Temp and unmatched employees get 0
+    paid = merged_df['Department'].ne('Temp') & reg_rate.notna()
+    employees = merged_df['Employee Number']
+    components = []
+    for holiday_date in holiday_dates:
+        part1_hours = pd.Series(holiday_hours[holiday_date].to_numpy(), index=merged_df.index)
+        part1_pay = (part1_hours * ot_rate).where(paid, 0)
+        part2_pay = (part2_hours * reg_rate).where(paid, 0)
+        components.append(pay_component_rows(employees, 'Holiday Worked', part1_hours, ot_rate, part1_pay, holiday_date))
+        components.append(pay_component_rows(employees, 'Holiday Allowance', part2_hours, reg_rate, part2_pay, holiday_date))
+        logger.info("Calculated Holiday Pay %s: total %.2f", holiday_date.strftime('%m-%d'), part1_pay.sum() + part2_pay.sum())
+
+    return components
 
 def calculate_salary(timesheet_df, payrate_df, holidays_df, production_df, start_date, previous_biweekly_hours):
-    print("\nCalculating Salary")
-    
     # Convert start_date to datetime
     start_date = pd.to_datetime(start_date)
     end_date = start_date + pd.Timedelta(days=13)  # Biweekly period
-    print(f"Calculation period: {start_date.date()} to {end_date.date()}")
+    logger.debug("Calculation period: %s to %s", start_date.date(), end_date.date())
     
     # Filter timesheet for the biweekly period
     timesheet_df = timesheet_df[(timesheet_df['Start Date'] >= start_date) & (timesheet_df['Start Date'] <= end_date)]
     
     # Calculate total working hours and days for each employee
-    employee_totals = timesheet_df.groupby('Employee Number').agg({
+    # Hours are summed in float64; the float32 timesheet column only saves memory
+    employee_totals = timesheet_df.astype({'Working Hours': 'float64'}).groupby('Employee Number', observed=True).agg({
         'Working Hours': 'sum',
         'Start Date': 'nunique',
         'Department': 'first',
         'First name': 'first',
-        'Last name': 'first'
+        'Last name': 'first',
+        'Employee Key': 'first'
     }).reset_index()
-    employee_totals.columns = ['Employee Number', 'Total Hours', 'Working Days', 'Department', 'First name', 'Last name']
-    
-    # Merge with payrate data
-    # merged_df = pd.merge(employee_totals, payrate_df, on='Employee Number', how='left')
-
-    # Print column names for debugging
-    print("Columns in employee_totals:")
-    print(employee_totals.columns)
-    print("\nColumns in payrate_df:")
-    print(payrate_df.columns)
-    
-    # Determine the matching column
-    if 'Employee Number' in payrate_df.columns:
-        match_column = 'Employee Number'
-    elif 'Employee ID' in payrate_df.columns:
-        match_column = 'Employee ID'
-    else:
-        print("Error: No suitable matching column found in payrate_df")
-        return pd.DataFrame(), {}
+    employee_totals.columns = ['Employee Number', 'Total Hours', 'Working Days', 'Department', 'First name', 'Last name', 'Employee Key']
+    employee_totals = plain_strings(employee_totals, ['Employee Number', 'Department', 'First name', 'Last name'])
+
+    logger.debug("Columns in employee_totals: %s", employee_totals.columns.tolist())
+    logger.debug("Columns in payrate_df: %s", payrate_df.columns.tolist())
     
-    # Merge with payrate data, but keep all employees even if they don't have a match
-    merged_df = pd.merge(employee_totals, payrate_df, left_on='Employee Number', right_on=match_column, how='left')
+    # Both sides carry the employee directory key (see employee_directory.resolve_employee_keys)
+    if 'Employee Key' not in payrate_df.columns:
+        logger.error("Payrate rows are not resolved to employee keys")
+        return pd.DataFrame(), empty_pay_components(), {}
     
+    # Integer join with the payrate data, keeping all employees even if they don't have a match
+    matched_payrate = payrate_df[payrate_df['Employee Key'] >= 0].astype({'Employee Key': 'int64'})
+    merged_df = pd.merge(employee_totals.astype({'Employee Key': 'int64'}), matched_payrate, on='Employee Key', how='left')
     
     # Check for unmatched employees
     unmatched = merged_df[merged_df['REG Pay Rate (正常时薪)'].isna()]
     if not unmatched.empty:
-        print(f"\nWarning: {len(unmatched)} employees not matched with payrate data:")
-        print(unmatched[['Employee Number', 'Total Hours', 'Working Days']])
-    
-    # Calculate basic salary
-    # merged_df['Salary'] = merged_df.apply(lambda row: calculate_employee_salary(row, holidays_df, start_date, end_date), axis=1)
-    salary_info = merged_df.apply(lambda row: calculate_employee_salary(row, holidays_df, start_date, end_date), axis=1)
+        stage_event(logger, 'calculate_salary', f"{len(unmatched)} employees not matched with payrate data",
+                    level=logging.WARNING, unmatched_employees=len(unmatched))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Unmatched employees:\n%s", unmatched[['Employee Number', 'Total Hours', 'Working Days']])
+    
+    # Calculate basic salary, checking for holidays once for the whole period
+    holiday_in_period = is_holiday_in_period(holidays_df, start_date, end_date)
+    salary_info = calculate_base_pay(merged_df, holiday_in_period)
     merged_df = pd.concat([merged_df, salary_info], axis=1)
-    
-    # Calculate holiday pay (excluding Temp employees)
-    for _, holiday in holidays_df.iterrows():
-        if start_date <= holiday['Date'] <= end_date:
-            print(f"\nCalculating Holiday Pay for {holiday['Date'].date()}:")
-            merged_df[f'Holiday Pay {holiday["Date"].strftime("%m-%d")}'] = merged_df.apply(
-                lambda row: calculate_holiday_pay(row, holiday['Date'], merged_df, timesheet_df, previous_biweekly_hours) if row['Department'] != 'Temp' else 0,
-                axis=1
-            )
+    components = base_pay_components(merged_df)
+    
+    # Calculate holiday pay (excluding Temp employees) from a single (employee, date) hours index
+    holiday_dates = pd.to_datetime(holidays_df['Date']).dt.normalize()
+    holiday_dates = holiday_dates[holiday_dates.between(start_date, end_date)].drop_duplicates()
+    if not holiday_dates.empty:
+        hours_by_day = calculate_hours_by_day(timesheet_df)
+        components.extend(calculate_holiday_pay(merged_df, hours_by_day, holidays_df, start_date, holiday_dates, previous_biweekly_hours))
             
     # Handle production bonus
     if production_df is not None and 'Date' in production_df.columns:
         production_df = production_df[(production_df['Date'] >= start_date) & (production_df['Date'] <= end_date)]
-        bonus_totals = production_df.groupby('Employee ID')['Bonus'].sum().reset_index()
-        merged_df = pd.merge(merged_df, bonus_totals, left_on='Employee Number', right_on='Employee ID', how='left')
+        bonus_totals = production_df[production_df['Employee Key'] >= 0].groupby('Employee Key')['Bonus'].sum().reset_index()
+        merged_df = pd.merge(merged_df, bonus_totals.astype({'Employee Key': 'int64'}), on='Employee Key', how='left')
         merged_df['Bonus'] = merged_df['Bonus'].fillna(0)
     else:
         merged_df['Bonus'] = 0
     
     # Adjust Total Compensation to include Bonus for all employees
     merged_df['Total Compensation'] = merged_df['Total Compensation'] + merged_df['Bonus']
+    components.append(pay_component_rows(merged_df['Employee Number'], 'Bonus', np.nan, np.nan, merged_df['Bonus']))
+    pay_components = typed_pay_components(components, start_date)
     
-    print("\nFinal Calculations (sample):")
-    print(merged_df[['Employee Number', 'Department', 'Total Hours', 'Salary', 'Bonus', 'Total Compensation']].head())
+    # Per-employee trace, only built when debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        trace = merged_df[['Employee Number', 'Department', 'Annual Or Hourly', 'Total Hours', 'Working Days',
+                           'Regular Pay', 'Overtime Pay', 'Bonus', 'Total Compensation']]
+        for employee in trace.itertuples(index=False):
+            logger.debug("Salary trace: %s", employee)
     
     next_period_hours = merged_df.set_index('Employee Number')['Total Hours'].to_dict()
     
-    return merged_df, next_period_hours
+    return merged_df, pay_components, next_period_hours
 
 # Processor 
-def process_data(timesheet_df, schedule_df, holidays_df, production_df, payrate_df, start_date, num_periods=1):
+def concat_frames(frames):
+    # Empty frames are skipped; if all are empty the first one is kept for its columns
+    non_empty = [df for df in frames if not df.empty]
+    if non_empty:
+        return pd.concat(non_empty, ignore_index=True)
+    return frames[0].iloc[0:0].reset_index(drop=True) if frames else pd.DataFrame()
+
+def adjust_timesheet(timesheet_df, schedule_df, run_report=None):
+    # Vacation, combining, business hours, schedule and lunch adjustments; independent of the pay period
     changes = []
-    all_salary_dfs = []
-    previous_4_weeks_hours = {}
-
-    if timesheet_df is not None and not timesheet_df.empty:
-        print(f"Timesheet data shape: {timesheet_df.shape}")
-        timesheet_df, vacation_df = process_vacations(timesheet_df)
-        timesheet_df = combine_time(timesheet_df)
-        timesheet_df, business_changes = adjust_business_hours(timesheet_df)
-        changes.extend(business_changes)
-        
-        if schedule_df is not None and not schedule_df.empty:
-            timesheet_df, schedule_changes, schedule_alerts = update_from_schedule(timesheet_df, schedule_df)
-            changes.extend(schedule_changes)
-        
-        timesheet_df, lunch_changes = adjust_lunch_time(timesheet_df)
-        changes.extend(lunch_changes)
-    else:
-        print("No timesheet data available.")
-        return None, None, None, None
+    schedule_alerts = pd.DataFrame()
+
+    def measured(stage, compute, df):
+        # Every stage hands the next one a frame in the typed timesheet schema
+        result = measure_stage(run_report, stage, compute, rows_in=len(df))
+        if isinstance(result, tuple):
+            return (enforce_timesheet_schema(result[0]),) + result[1:]
+        return enforce_timesheet_schema(result)
+
+    logger.debug("Timesheet data shape: %s", timesheet_df.shape)
+    timesheet_df, vacation_df = measured('process_vacations', lambda: process_vacations(timesheet_df), timesheet_df)
+    timesheet_df = measured('combine_time', lambda: combine_time(timesheet_df), timesheet_df)
+    timesheet_df, business_changes = measured('adjust_business_hours', lambda: adjust_business_hours(timesheet_df), timesheet_df)
+    changes.append(business_changes)
+    
+    if schedule_df is not None and not schedule_df.empty:
+        timesheet_df, schedule_changes, schedule_alerts = measured(
+            'update_from_schedule', lambda: update_from_schedule(timesheet_df, schedule_df), timesheet_df)
+        changes.append(schedule_changes)
+    
+    timesheet_df, lunch_changes = measured('adjust_lunch_time', lambda: adjust_lunch_time(timesheet_df), timesheet_df)
+    changes.append(lunch_changes)
+
+    # Change and alert logs are small; plain strings keep them easy to concatenate and report
+    changes_df = plain_strings(concat_frames(changes), ['Employee Number'])
+    schedule_alerts = plain_strings(schedule_alerts, ['Employee Number'])
+    return timesheet_df, vacation_df, changes_df, schedule_alerts
+
+# Outputs of adjust_timesheet, in order, as stored in the partition cache
+ADJUSTED_FRAMES = ('timesheet', 'vacations', 'changes', 'alerts')
+
+def load_adjusted_partition(cache_dir, key):
+    frames = []
+    for name in ADJUSTED_FRAMES:
+        df = cache_get(cache_dir, f"{key}-{name}")
+        if df is None:
+            return None
+        frames.append(df)
+    return tuple(frames)
+
+def store_adjusted_partition(cache_dir, key, frames):
+    for name, df in zip(ADJUSTED_FRAMES, frames):
+        cache_put(cache_dir, f"{key}-{name}", df)
+
+def schedule_full_names(schedule_df):
+    # Same "First Last" form update_from_schedule matches on
+    return schedule_df['Users'].astype(str).str.split(n=1).str.join(' ')
+
+def adjust_timesheet_by_department(timesheet_df, schedule_df, cache_dir=None, run_report=None):
+    # Each department is adjusted on its own and cached under a hash of its rows,
+    # the schedule rows of its employees and the rule version, so correcting one
+    # department's workbook only reruns that department. All adjustments are
+    # per employee and every employee comes from a single department file.
+    if cache_dir is None or 'Department' not in timesheet_df.columns:
+        return adjust_timesheet(timesheet_df, schedule_df, run_report)
+
+    has_schedule = schedule_df is not None and not schedule_df.empty
+    by_key = has_schedule and 'Employee Key' in schedule_df.columns and 'Employee Key' in timesheet_df.columns
+    schedule_names = schedule_full_names(schedule_df) if has_schedule and not by_key else None
+
+    partitions = []
+    reused = 0
+    for department, partition in timesheet_df.groupby('Department', sort=True, dropna=False, observed=True):
+        schedule_partition = None
+        if by_key:
+            schedule_partition = schedule_df[schedule_df['Employee Key'].isin(partition['Employee Key'])]
+        elif has_schedule:
+            names = partition['First name'].astype(str) + ' ' + partition['Last name'].astype(str)
+            schedule_partition = schedule_df[schedule_names.isin(names)]
+        key = frame_key([partition, schedule_partition], 'adjust_timesheet',
+                        (ADJUSTMENT_RULES_VERSION, SHIFT_WINDOW_POLICIES, LUNCH_POLICIES))
+
+        adjusted = measure_stage(run_report, 'load_adjusted_partition', lambda: load_adjusted_partition(cache_dir, key))
+        if adjusted is None:
+            adjusted = adjust_timesheet(partition, schedule_partition, run_report)
+            store_adjusted_partition(cache_dir, key, adjusted)
+        else:
+            reused += 1
+        partitions.append(adjusted)
+
+    stage_event(logger, 'adjust_timesheet', f"Reused {reused} of {len(partitions)} department partitions from {cache_dir}",
+                partitions=len(partitions), reused_partitions=reused)
+
+    timesheet_df, vacation_df, changes_df, schedule_alerts = (concat_frames(frames) for frames in zip(*partitions))
+    # Restore the order a single pass over all departments would produce
+    # Partitions come back with their own categories, so the schema is restored after the concat
+    timesheet_df = enforce_timesheet_schema(timesheet_df)
+    timesheet_df = timesheet_df.sort_values(['Employee Number', 'First name', 'Last name', 'Start Datetime'], kind='stable').reset_index(drop=True)
+    return timesheet_df, vacation_df, changes_df, schedule_alerts
 
-    changes_df = pd.DataFrame(changes)
+def last_period_end(start_date, num_periods):
+    # Last day of the final biweekly period of a run
+    return pd.to_datetime(start_date) + timedelta(days=14 * num_periods - 1)
+
+def calculate_period_salaries(timesheet_df, holidays_df, production_df, payrate_df, start_date, num_periods, period_hours_history, run_report=None):
+    # Reads earlier periods' hours from period_hours_history but never writes the store;
+    # the hours of the computed periods are returned for the caller to persist
+    all_salary_dfs = []
+    all_period_hours = []
+    all_pay_components = []
     start_date = pd.to_datetime(start_date)
 
     for period in range(num_periods):
         period_start = start_date + timedelta(days=14 * period)
         period_end = period_start + timedelta(days=13)
 
-        print(f"\nProcessing period {period + 1}: {period_start.date()} to {period_end.date()}")
+        logger.info("Processing period %d: %s to %s", period + 1, period_start.date(), period_end.date())
 
         period_timesheet = timesheet_df[(timesheet_df['Start Date'] >= period_start) & (timesheet_df['Start Date'] <= period_end)]
         
         try:
-            salary_df, next_period_hours = calculate_salary(period_timesheet, payrate_df, holidays_df, production_df, period_start, previous_4_weeks_hours)
+            previous_hours = previous_biweekly_hours(period_hours_history, period_start)
+            salary_df, pay_components, next_period_hours = measure_stage(
+                run_report, 'calculate_salary',
+                lambda: calculate_salary(period_timesheet, payrate_df, holidays_df, production_df, period_start, previous_hours),
+                rows_in=len(period_timesheet)
+            )
             salary_df['Period Start'] = period_start
             salary_df['Period End'] = period_end
             all_salary_dfs.append(salary_df)
+            all_pay_components.append(pay_components)
 
-            for emp, hours in next_period_hours.items():
-                if emp in previous_4_weeks_hours:
-                    previous_4_weeks_hours[emp] = previous_4_weeks_hours[emp][1:] + [hours]
-                else:
-                    previous_4_weeks_hours[emp] = [0, 0, 0, hours]
+            records = period_hours_records(period_start, next_period_hours)
+            period_hours_history = upsert_period_hours(period_hours_history, records)
+            all_period_hours.append(records)
 
-            print(f"Processed data for {len(salary_df)} employees")
+            stage_event(logger, 'calculate_salary', f"Processed data for {len(salary_df)} employees",
+                        employees=len(salary_df), periods=1)
         except Exception as e:
-            print(f"Error processing period {period + 1}: {str(e)}")
-            print("Traceback:")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error processing period %d: %s", period + 1, e)
 
     if all_salary_dfs:
         combined_salary_df = pd.concat(all_salary_dfs, ignore_index=True)
-        print(f"Combined data shape: {combined_salary_df.shape}")
+        logger.debug("Combined data shape: %s", combined_salary_df.shape)
     else:
-        print("No data was processed. Creating an empty DataFrame.")
+        logger.warning("No data was processed. Creating an empty DataFrame.")
         combined_salary_df = pd.DataFrame()
 
-    return timesheet_df, vacation_df, changes_df, schedule_alerts, combined_salary_df
\ No newline at end of file
+    # Components of all periods share the same categories and dtypes, so they stack as-is
+    pay_components = pd.concat(all_pay_components, ignore_index=True) if all_pay_components else empty_pay_components()
+    period_hours = pd.concat(all_period_hours, ignore_index=True) if all_period_hours else empty_period_hours()
+
+    return combined_salary_df, pay_components, period_hours
+
+def calculate_periods(timesheet_df, holidays_df, production_df, payrate_df, start_date, num_periods=1, hours_store_path=None, run_report=None):
+    # Hours of earlier periods come from the persisted store, so a run only needs this period's punches
+    combined_salary_df, pay_components, period_hours = calculate_period_salaries(
+        timesheet_df, holidays_df, production_df, payrate_df, start_date, num_periods,
+        load_period_hours(hours_store_path), run_report
+    )
+    store_period_hours(hours_store_path, period_hours)
+    return combined_salary_df, pay_components
+
+def process_data(timesheet_df, schedule_df, holidays_df, production_df, payrate_df, start_date, num_periods=1, hours_store_path=None, cache_dir=None, run_report=None, directory_path=None):
+    if timesheet_df is None or timesheet_df.empty:
+        logger.warning("No timesheet data available.")
+        return None, None, None, None, None, None, None
+
+    timesheet_df, schedule_df, payrate_df, production_df, unmatched = measure_stage(
+        run_report, 'resolve_employee_keys',
+        lambda: resolve_employee_keys(timesheet_df, schedule_df, payrate_df, production_df, directory_path), rows_in=len(timesheet_df))
+    timesheet_df, vacation_df, changes_df, schedule_alerts = adjust_timesheet_by_department(timesheet_df, schedule_df, cache_dir, run_report)
+    combined_salary_df, pay_components = calculate_periods(timesheet_df, holidays_df, production_df, payrate_df, start_date, num_periods, hours_store_path, run_report)
+
+    return timesheet_df, vacation_df, changes_df, schedule_alerts, combined_salary_df, pay_components, unmatched
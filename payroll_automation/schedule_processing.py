@@ -1,13 +1,17 @@
+import os
+import data_loading
+from workbook_columns import TIMESHEET_COLUMNS, TEMP_TIMESHEET_COLUMNS, SCHEDULE_COLUMNS
+
 # Combine timesheet and schedules functions
 
 def get_department(file_path):
-    return os.path.basename(file_path).split()[0]
+    words = os.path.basename(data_loading.source_name(file_path)).split()
+    if not words:
+        raise data_loading.WorkbookLoadError("Workbook has no file name to read the department from")
+    return words[0]
 
-def process_timesheet(file_path):
-    df = read_excel_safe(file_path, [
-        "Start Date", "Start time", "End Date", "End time", 
-        "Employee Number", "First name", "Last name", "Job", "Employee notes"
-    ])
+def process_timesheet(file_path, strict=False, reader='openpyxl'):
+    df = data_loading.read_excel_safe(file_path, TIMESHEET_COLUMNS, strict=strict, reader=reader)
     if not df.empty:
         # Forward fill Employee Number, First name, and Last name
         df['Employee Number'] = df['Employee Number'].ffill()
@@ -24,8 +28,8 @@ def process_timesheet(file_path):
 
     return df
 
-def process_temp_timesheet(file_path):
-    df = read_excel_safe(file_path, ["Start Date", "Start time", "End Date", "End time", "First name", "Last name", "Team", "Job", "Employee notes"])
+def process_temp_timesheet(file_path, strict=False, reader='openpyxl'):
+    df = data_loading.read_excel_safe(file_path, TEMP_TIMESHEET_COLUMNS, strict=strict, reader=reader)
     if not df.empty:
         # Rename 'Team' to 'Employee Number'
         df = df.rename(columns={'Team': 'Employee Number'})
@@ -42,8 +46,8 @@ def process_temp_timesheet(file_path):
         df = df.sort_values(by=['Employee Number', 'First name', 'Last name', 'Start time'])
     return df
 
-def process_schedule(file_path):
-    df = read_excel_safe(file_path, ["Date", "Start", "End", "Users", "Availability status"])
+def process_schedule(file_path, strict=False, reader='openpyxl'):
+    df = data_loading.read_excel_safe(file_path, SCHEDULE_COLUMNS, strict=strict, reader=reader)
     if not df.empty:
         # Drop rows where Start is "All Day" or End is empty
         df = df[(df['Start'] != "All Day") & (df['Availability status'] != "Unavailable") & (df['End'].notna())]
@@ -0,0 +1,58 @@
+import os
+import time
+import threading
+import contextlib
+
+# Lock around the read-modify-write of the persistent per-site stores (employee
+# directory, period hours). Streamlit sessions are threads of one process and
+# CLI sites may run in separate processes, so a per-path thread lock is combined
+# with an exclusive lock file next to the store.
+
+LOCK_TIMEOUT = 60
+# A lock file older than this was left behind by a crashed run and is broken
+STALE_LOCK_SECONDS = 600
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+def thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+def acquire_lock_file(lock_path, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Timed out waiting for {lock_path}")
+        time.sleep(0.05)
+
+@contextlib.contextmanager
+def store_lock(path, timeout=LOCK_TIMEOUT):
+    # No-op for stores that are not persisted (path is None)
+    if path is None:
+        yield
+        return
+    lock = thread_lock(path)
+    if not lock.acquire(timeout=timeout):
+        raise TimeoutError(f"Timed out waiting for {path}")
+    try:
+        lock_path = f"{path}.lock"
+        os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+        acquire_lock_file(lock_path, timeout)
+        try:
+            yield
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(lock_path)
+    finally:
+        lock.release()
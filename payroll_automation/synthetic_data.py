@@ -0,0 +1,242 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from data_loading import load_public_holidays
+from workbook_columns import TIMESHEET_COLUMNS, TEMP_TIMESHEET_COLUMNS, SCHEDULE_COLUMNS
+
+# Synthetic payroll workbooks for benchmarks and equivalence runs, laid out
+# like the real exports so they go through the normal loaders: one timesheet
+# and one shift schedule per department, a Temp timesheet, the payrate list,
+# the production bonus report and the holiday list. Everything is drawn from a
+# seeded generator, so the same arguments always produce the same workbooks.
+#   python synthetic_data.py temp/synthetic/site_1000 --employees 1000 --periods 2
+
+# Department -> share of the (non-Temp) employees
+DEPARTMENT_SHARES = {'Production': 0.6, 'Business': 0.25, 'Warehouse': 0.15}
+TEMP_TEAM_SIZE = 10
+
+FIRST_NAMES = ['Ava', 'Ben', 'Chloe', 'Daniel', 'Emma', 'Felix', 'Grace', 'Hugo', 'Ivy', 'Jack', 'Kate', 'Liam',
+               'Mia', 'Noah', 'Olivia', 'Paul', 'Quinn', 'Ruby', 'Sam', 'Tara', 'Umar', 'Vera', 'Wei', 'Xin',
+               'Yara', 'Zoe', 'Li', 'Ming', 'Hana', 'Omar', 'Priya', 'Rosa', 'Tom', 'Yuki', 'Sofia', 'Leo',
+               'Aisha', 'Carlos', 'Elena', 'Kofi']
+LAST_NAME_SYLLABLES = ['an', 'bel', 'cor', 'da', 'el', 'fan', 'gor', 'han', 'is', 'jo', 'kar', 'lin',
+                       'mor', 'na', 'ov', 'per', 'qui', 'ros', 'san', 'tan', 'ul', 'ver', 'wen', 'zh']
+
+# Clock-in windows (earliest start hour, latest start hour) and shift lengths in hours per department
+SHIFT_STARTS = {'Production': (6, 8), 'Business': (8, 10), 'Warehouse': (6, 9), 'Temp': (6, 9)}
+SHIFT_HOURS = (7.5, 10.5)
+NIGHT_SHIFT_START = 22
+
+def employee_names(count, rng):
+    # Distinct "first last" pairs while there are enough combinations, namesakes after that
+    last_names = [(a + b).capitalize() for a in LAST_NAME_SYLLABLES for b in LAST_NAME_SYLLABLES if a != b]
+    pairs = np.resize(rng.permutation(len(FIRST_NAMES) * len(last_names)), count)
+    return [FIRST_NAMES[pair % len(FIRST_NAMES)] for pair in pairs], [last_names[pair // len(FIRST_NAMES)] for pair in pairs]
+
+def synthetic_employees(employees, temp_share, rng):
+    temps = int(round(employees * temp_share))
+    counts = {department: int(round((employees - temps) * share)) for department, share in DEPARTMENT_SHARES.items()}
+    counts['Production'] += employees - temps - sum(counts.values())
+
+    departments = np.concatenate([np.repeat(list(counts), list(counts.values())), np.repeat('Temp', temps)])
+    numbers = [f"{department[:2].upper()}{i:05d}" for department, count in counts.items() for i in range(count)]
+    numbers += [f"Team{i // TEMP_TEAM_SIZE}" for i in range(temps)]
+    first, last = employee_names(employees, rng)
+    return pd.DataFrame({'Employee Number': numbers, 'First name': first, 'Last name': last, 'Department': departments})
+
+# 'HH:MM' label of every minute of the day
+CLOCK_LABELS = np.array([f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60)], dtype=object)
+
+def clock(minutes):
+    # Minutes from midnight -> 'HH:MM'
+    return CLOCK_LABELS[np.asarray(minutes) % (24 * 60)]
+
+def date_labels(dates, date_format):
+    # Each distinct day is formatted once
+    codes, days = pd.factorize(dates)
+    return np.asarray(days.strftime(date_format), dtype=object)[codes]
+
+def synthetic_shifts(employees, start_date, days, work_share, overnight_share, vacation_share, rng):
+    # One row per worked shift: employee row, day, start minute, length in minutes and job
+    employee = np.repeat(np.arange(len(employees)), days)
+    day = np.tile(np.arange(days), len(employees))
+    worked = rng.random(len(employee)) < work_share
+    employee, day = employee[worked], day[worked]
+
+    departments = employees['Department'].to_numpy()[employee]
+    earliest = np.array([SHIFT_STARTS[department][0] for department in departments]) * 60
+    latest = np.array([SHIFT_STARTS[department][1] for department in departments]) * 60
+    start = rng.integers(earliest, latest + 1)
+    length = (rng.uniform(*SHIFT_HOURS, len(employee)) * 60).astype(int)
+    night = rng.random(len(employee)) < overnight_share
+    start[night] = NIGHT_SHIFT_START * 60 + rng.integers(0, 60, night.sum())
+    job = np.full(len(employee), 'Work', dtype=object)
+
+    # Vacation blocks of 1-5 consecutive days, punched as 09:00-17:00 'Vacation - paid'
+    first_day = rng.integers(0, max(days - 5, 1), len(employees))
+    vacation_days = np.where(rng.random(len(employees)) < vacation_share, rng.integers(1, 6, len(employees)), 0)
+    on_vacation = (day >= first_day[employee]) & (day < first_day[employee] + vacation_days[employee])
+    job[on_vacation] = 'Vacation - paid'
+    start[on_vacation] = 9 * 60
+    length[on_vacation] = 8 * 60
+
+    return pd.DataFrame({
+        'Employee': employee,
+        'Date': pd.Timestamp(start_date) + pd.to_timedelta(day, unit='D'),
+        'Start': start,
+        'Length': length,
+        'Job': job
+    })
+
+def timesheet_rows(employees, shifts):
+    # Shifts crossing midnight are exported as two records, the second starting at 00:00
+    end = shifts['Start'] + shifts['Length']
+    overnight = end > 24 * 60
+    first = shifts.assign(End=np.where(overnight, 24 * 60, end), EndDate=shifts['Date'] + pd.to_timedelta(overnight.astype(int), unit='D'))
+    second = shifts[overnight].assign(Date=shifts.loc[overnight, 'Date'] + pd.Timedelta(days=1), Start=0, End=end[overnight] - 24 * 60)
+    second = second.assign(EndDate=second['Date'])
+    rows = pd.concat([first, second], ignore_index=True).sort_values(['Employee', 'Date', 'Start'], kind='stable')
+
+    people = employees.iloc[rows['Employee'].to_numpy()].reset_index(drop=True)
+    timesheet = pd.DataFrame({
+        'Start Date': date_labels(rows['Date'], '%d/%m/%Y'),
+        'Start time': clock(rows['Start'].to_numpy()),
+        'End Date': date_labels(rows['EndDate'], '%d/%m/%Y'),
+        'End time': clock(rows['End'].to_numpy()),
+        'Employee Number': people['Employee Number'],
+        'First name': people['First name'],
+        'Last name': people['Last name'],
+        'Department': people['Department'],
+        'Job': rows['Job'].to_numpy(),
+        'Employee notes': None
+    })
+    # Exports only name each employee on their first row; the loaders forward fill the rest
+    repeated = timesheet['Employee Number'].eq(timesheet['Employee Number'].shift()) & timesheet['First name'].eq(timesheet['First name'].shift())
+    timesheet.loc[repeated, ['Employee Number', 'First name', 'Last name']] = None
+    return timesheet
+
+def schedule_rows(employees, shifts, schedule_share, late_share, rng):
+    # Scheduled starts on the half hour nearest the punch; a few are over an hour off and become alerts
+    scheduled = shifts[(shifts['Job'] == 'Work') & (rng.random(len(shifts)) < schedule_share)]
+    start = (scheduled['Start'].to_numpy() + 15) // 30 * 30
+    late = rng.random(len(scheduled)) < late_share
+    start[late] += rng.choice([-120, -90, 90, 120], late.sum())
+    start = np.clip(start, 0, 24 * 60 - 30)
+    people = employees.iloc[scheduled['Employee'].to_numpy()].reset_index(drop=True)
+    return pd.DataFrame({
+        'Date': date_labels(scheduled['Date'], '%Y-%m-%d'),
+        'Start': clock(start),
+        'End': clock(start + scheduled['Length'].to_numpy()),
+        'Users': (people['First name'] + ' ' + people['Last name']).to_numpy(),
+        'Availability status': 'Available',
+        'Department': people['Department']
+    })
+
+def payrate_rows(employees, missing_share, rng):
+    # Mostly hourly staff; some annual and daily, a few excluded or paid from punches
+    staff = employees[employees['Department'] != 'Temp']
+    staff = staff[rng.random(len(staff)) >= missing_share]
+    pay_type = rng.choice(['Hourly', 'Annual', 'Daily'], len(staff), p=[0.8, 0.1, 0.1])
+    rate = np.select([pay_type == 'Annual', pay_type == 'Daily'],
+                     [rng.integers(1800, 4000, len(staff)), rng.integers(150, 300, len(staff))],
+                     default=rng.integers(17, 36, len(staff))).astype(float)
+    return pd.DataFrame({
+        'Employee ID': staff['Employee Number'].to_numpy(),
+        'REG Pay Rate (正常时薪)': rate,
+        'OT Pay Rate (加班时薪）': np.where(pay_type == 'Hourly', rate * 1.5, np.nan),
+        'Annual Or Hourly': pay_type,
+        '不需要计算': np.where(rng.random(len(staff)) < 0.02, 'Yes', 'No'),
+        'Follow 打卡时间': np.where(rng.random(len(staff)) < 0.2, 'Yes', 'No'),
+        'Bi-weekly 加班费触发小时（有holiday）': 72,
+        'Bi-weekly 加班费触发小时（没有holiday）': 80
+    })
+
+def production_rows(employees, shifts, bonus_share, rng):
+    worked = shifts[(shifts['Job'] == 'Work') & (employees['Department'].to_numpy()[shifts['Employee'].to_numpy()] == 'Production')]
+    worked = worked[rng.random(len(worked)) < bonus_share]
+    gold = rng.integers(0, 10, len(worked)).astype(float)
+    gold[rng.random(len(worked)) < 0.5] = np.nan
+    return pd.DataFrame({
+        'Date': worked['Date'].to_numpy(),
+        'Employee ID': employees['Employee Number'].to_numpy()[worked['Employee'].to_numpy()],
+        'Silver Bonus': rng.integers(0, 20, len(worked)).astype(float),
+        'Gold Bonus': gold
+    })
+
+def holiday_rows(start_date, days):
+    # Ontario statutory holidays falling in the generated range
+    start_date = pd.Timestamp(start_date)
+    end_date = start_date + pd.Timedelta(days=days - 1)
+    holidays_df = load_public_holidays(start_date, end_date)
+    return holidays_df[holidays_df['Date'].between(start_date, end_date)].reset_index(drop=True)
+
+def synthetic_frames(employees=100, periods=1, start_date='2024-12-16', seed=0, temp_share=0.1, work_share=0.7,
+                     overnight_share=0.05, vacation_share=0.05, schedule_share=0.8, late_share=0.03,
+                     missing_payrate_share=0.02, bonus_share=0.3):
+    # Workbook contents keyed by kind; per-department kinds map department -> frame
+    rng = np.random.default_rng(seed)
+    days = 14 * periods
+    people = synthetic_employees(employees, temp_share, rng)
+    shifts = synthetic_shifts(people, start_date, days, work_share, overnight_share, vacation_share, rng)
+    timesheet = timesheet_rows(people, shifts)
+    schedule = schedule_rows(people, shifts, schedule_share, late_share, rng)
+    return {
+        'timesheets': {department: rows.drop(columns='Department').reset_index(drop=True)
+                       for department, rows in timesheet.groupby('Department', sort=False)},
+        'schedules': {department: rows.drop(columns='Department').reset_index(drop=True)
+                      for department, rows in schedule.groupby('Department', sort=False)},
+        'payrate': payrate_rows(people, missing_payrate_share, rng),
+        'production': production_rows(people, shifts, bonus_share, rng),
+        'holidays': holiday_rows(start_date, days)
+    }
+
+def write_workbook(path, df):
+    # Write-only workbook, the same streaming mode the report generator uses
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for row in df.astype(object).where(df.notna(), None).itertuples(index=False):
+        ws.append([value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in row])
+    wb.save(path)
+
+def write_site(frames, output_dir):
+    # File names follow the default cli.py patterns; returns the written paths by kind
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {'timesheets': [], 'schedules': []}
+    for department, df in frames['timesheets'].items():
+        columns = TEMP_TIMESHEET_COLUMNS if department == 'Temp' else TIMESHEET_COLUMNS
+        df = df.rename(columns={'Employee Number': 'Team'}) if department == 'Temp' else df
+        paths['timesheets'].append(os.path.join(output_dir, f"{department} Timesheet.xlsx"))
+        write_workbook(paths['timesheets'][-1], df[columns])
+    for department, df in frames['schedules'].items():
+        paths['schedules'].append(os.path.join(output_dir, f"{department} Shift.xlsx"))
+        write_workbook(paths['schedules'][-1], df[SCHEDULE_COLUMNS])
+    for kind, name in [('payrate', 'PayRate.xlsx'), ('production', 'Production Report.xlsx'), ('holidays', 'Holidays.xlsx')]:
+        paths[kind] = os.path.join(output_dir, name)
+        write_workbook(paths[kind], frames[kind])
+    return paths
+
+def generate_site(output_dir, **options):
+    return write_site(synthetic_frames(**options), output_dir)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic site of payroll workbooks.")
+    parser.add_argument('output_dir', help="Directory the workbooks are written to")
+    parser.add_argument('--employees', type=int, default=100, help="Number of employees, Temp workers included")
+    parser.add_argument('--periods', type=int, default=1, help="Number of biweekly periods covered")
+    parser.add_argument('--start-date', default='2024-12-16', help="First day of the first period (YYYY-MM-DD)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--overnight-share', type=float, default=0.05, help="Share of shifts that run past midnight")
+    parser.add_argument('--vacation-share', type=float, default=0.05, help="Share of employees with a vacation block")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    return generate_site(args.output_dir, employees=args.employees, periods=args.periods, start_date=args.start_date,
+                         seed=args.seed, overnight_share=args.overnight_share, vacation_share=args.vacation_share)
+
+if __name__ == '__main__':
+    for kind, kind_paths in main().items():
+        print(f"{kind}: {kind_paths}")
@@ -1,10 +1,24 @@
+import logging
+import pandas as pd
+from rounding import adjust_start_times, adjust_end_times
+from datetime_parsing import parse_dates_by_source, combine_date_time
+from policies import SHIFT_WINDOW_POLICIES, LUNCH_POLICIES, compile_shift_windows, compile_lunch_deductions
+from payroll_logging import get_logger, stage_event
+from timesheet_schema import plain_strings
+
+logger = get_logger('time_adjustments')
+
 # Time adjustment functions
 
+# Bump whenever the adjustment code changes, so cached adjusted partitions are
+# recomputed; edits to the policy tables change the cache key on their own
+ADJUSTMENT_RULES_VERSION = 5
+
 def process_vacations(df):
-    print("\nStep 1: Processing Vacations")
+    logger.debug("Step 1: Processing Vacations")
     
-    # Make a copy to avoid SettingWithCopyWarning
-    df = df.copy()
+    # Lazy copy-on-write copy; columns are only copied when they are modified
+    df = df.copy(deep=False)
     
     # Sort the dataframe by Employee Number and Start Date
     df = df.sort_values(['Employee Number', 'Start Date'], ascending=[True, True])
@@ -16,89 +30,61 @@ def process_vacations(df):
         (df['Employee Number'] != df['Employee Number'].shift())
     ).cumsum()
     
-    # Group by employee and vacation group
-    vacation_groups = df[df['is_vacation']].groupby(['Employee Number', 'vacation_group'])
-    vacation_counts = vacation_groups.size()
-    
-    # Create a DataFrame to store vacation information
-    vacation_info = []
-    
-    # Process all vacation periods
-    print("\nAll vacation periods:")
-    for (employee, group), count in vacation_counts.items():
-        vacation_data = vacation_groups.get_group((employee, group)).iloc[0]
-        print(f"Employee {vacation_data['Employee Number']} ({vacation_data['First name']} {vacation_data['Last name']}) - Department: {vacation_data['Department']}: {count} days")
-        vacation_info.append({
-            'Employee Number': vacation_data['Employee Number'],
-            'First Name': vacation_data['First name'],
-            'Last Name': vacation_data['Last name'],
-            'Department': vacation_data['Department'],
-            'Vacation Days': count
-        })
-    
-    # Create a DataFrame with vacation information
-    vacation_df = pd.DataFrame(vacation_info)
-    
-    # Identify vacation records that are part of vacations longer than 1 day
-    long_vacation_mask = df['is_vacation'] & (df.groupby(['Employee Number', 'vacation_group'])['is_vacation'].transform('count') > 1)
-    
-    # Print details of vacation records to be dropped
-    dropped_vacations = df[long_vacation_mask]
-    if not dropped_vacations.empty:
-    
-        # Drop vacation records that are part of vacations longer than 1 day
-        original_count = len(df)
+    # Summarize every vacation block in one aggregate; vacation_group ids are unique per block
+    vacation_rows = df[df['is_vacation']]
+    vacation_blocks = vacation_rows.groupby('vacation_group', sort=True).agg(**{
+        'Employee Number': ('Employee Number', 'first'),
+        'First Name': ('First name', 'first'),
+        'Last Name': ('Last name', 'first'),
+        'Department': ('Department', 'first'),
+        'Vacation Days': ('is_vacation', 'size'),
+        'Start Date': ('Start Date', 'first'),
+        'End Date': ('Start Date', 'last')
+    })
+    vacation_df = plain_strings(vacation_blocks.reset_index(drop=True), ['Employee Number', 'First Name', 'Last Name', 'Department'])
+    
+    logger.debug("Vacation periods:\n%s", vacation_df)
+    
+    # Identify vacation records that are part of vacations longer than 1 day, reusing the block sizes
+    block_days = df['vacation_group'].map(vacation_blocks['Vacation Days'])
+    long_vacation_mask = df['is_vacation'] & (block_days > 1)
+    
+    # Drop vacation records that are part of vacations longer than 1 day
+    dropped_count = int(long_vacation_mask.sum())
+    if dropped_count:
         df = df[~long_vacation_mask]
-        dropped_count = original_count - len(df)
-        print(f"Dropped {dropped_count} 'Vacation - paid' records that were part of vacations longer than 1 day")
-    else:
-        print("\nNo vacation records to be dropped.")
+    stage_event(logger, 'process_vacations',
+                f"Found {len(vacation_df)} vacation periods; dropped {dropped_count} 'Vacation - paid' records that were part of vacations longer than 1 day",
+                vacation_periods=len(vacation_df), dropped_records=dropped_count)
     
     # Drop the temporary columns
     df = df.drop(columns=['is_vacation', 'vacation_group'])
     
     return df, vacation_df
 
-def adjust_start_time(dt):
-    if dt.minute >= 0 and dt.minute <= 5:
-        return dt.replace(minute=0)
-    elif dt.minute >= 6 and dt.minute <= 35:
-        return dt.replace(minute=30)
-    else:
-        return (dt + pd.Timedelta(hours=1)).replace(minute=0)
-
-def adjust_end_time(dt):
-    if dt.minute >= 0 and dt.minute <= 24:
-        return dt.replace(minute=0)
-    elif dt.minute >= 25 and dt.minute <= 54:
-        return dt.replace(minute=30)
-    else:
-        return (dt + pd.Timedelta(hours=1)).replace(minute=0)
-
 def combine_time(df):
-    print("\nStep 2: Adjusting and Combining Time Records")
+    logger.debug("Step 2: Adjusting and Combining Time Records")
     
-    # Make a copy to avoid SettingWithCopyWarning
-    df = df.copy()
+    # Lazy copy-on-write copy; columns are only copied when they are modified
+    df = df.copy(deep=False)
     
     original_count = len(df)
     
-    # Convert date columns to datetime
-    df['Start Date'] = pd.to_datetime(df['Start Date'], format='mixed', dayfirst=True)
-    df['End Date'] = pd.to_datetime(df['End Date'], format='mixed', dayfirst=True)
+    # Convert date columns to datetime, detecting the date format of each source file once
+    sources = df['Department'] if 'Department' in df.columns else None
+    df['Start Date'] = parse_dates_by_source(df['Start Date'], sources)
+    df['End Date'] = parse_dates_by_source(df['End Date'], sources)
     
-    # Combine start date and start time into start datetime
-    df['Start Datetime'] = pd.to_datetime(df['Start Date'].dt.strftime('%Y-%m-%d') + ' ' + df['Start time'], format='%Y-%m-%d %H:%M', errors='coerce')
-
-    # Combine end date and end time into end datetime
-    df['End Datetime'] = pd.to_datetime(df['End Date'].dt.strftime('%Y-%m-%d') + ' ' + df['End time'], format='%Y-%m-%d %H:%M', errors='coerce')
+    # Start and end datetimes are the day plus the 'H:MM' clock time; invalid times become NaT
+    df['Start Datetime'] = combine_date_time(df['Start Date'], df['Start time'])
+    df['End Datetime'] = combine_date_time(df['End Date'], df['End time'])
     
     # Drop rows where datetime conversion failed
     df.dropna(subset=['Start Datetime', 'End Datetime'], inplace=True)
     
     # Adjust start and end times
-    df['Adjusted Start Datetime'] = df['Start Datetime'].apply(adjust_start_time)
-    df['Adjusted End Datetime'] = df['End Datetime'].apply(adjust_end_time)
+    df['Adjusted Start Datetime'] = adjust_start_times(df['Start Datetime'])
+    df['Adjusted End Datetime'] = adjust_end_times(df['End Datetime'])
     
     # Calculate working hours
     df['Working Hours'] = (df['Adjusted End Datetime'] - df['Adjusted Start Datetime']).dt.total_seconds() / 3600
@@ -107,198 +93,201 @@ def combine_time(df):
     df = df.sort_values(by=['Employee Number', 'First name', 'Last name', 'Start Datetime'], ascending=[True, True, True, True]).reset_index(drop=True)
 
     # Identify rows where the end time is after midnight and the next record for the same employee starts at 00:00
-    end_after_midnight = (df['Adjusted End Datetime'].dt.date > df['Adjusted Start Datetime'].dt.date)
-    start_at_midnight = (df['Adjusted Start Datetime'].dt.hour == 0) & (df['Adjusted Start Datetime'].dt.minute == 0)
+    end_after_midnight = df['Adjusted End Datetime'].dt.normalize() > df['Adjusted Start Datetime'].dt.normalize()
+    start_at_midnight = df['Adjusted Start Datetime'] == df['Adjusted Start Datetime'].dt.normalize()
     same_employee = (df['Employee Number'] == df['Employee Number'].shift(-1)) & \
                     (df['First name'] == df['First name'].shift(-1)) & \
                     (df['Last name'] == df['Last name'].shift(-1))
-    combine_rows = end_after_midnight & start_at_midnight.shift(-1) & same_employee
+    combine_rows = end_after_midnight & start_at_midnight.shift(-1, fill_value=False) & same_employee
+
+    # Sample of records before combination
+    if logger.isEnabledFor(logging.DEBUG):
+        sample_before = df[combine_rows | combine_rows.shift(1, fill_value=False)].head(6)
+        logger.debug("Sample of records before combination:\n%s", sample_before[['Employee Number', 'First name', 'Last name', 'Adjusted Start Datetime', 'Adjusted End Datetime', 'Working Hours']])
 
-    # Print sample of records before combination
-    print("\nSample of records before combination:")
-    sample_before = df[combine_rows | combine_rows.shift(1, fill_value=False)].head(6)
-    print(sample_before[['Employee Number', 'First name', 'Last name', 'Adjusted Start Datetime', 'Adjusted End Datetime', 'Working Hours']])
+    # Give every contiguous run of segments one shift id, so a shift split across
+    # any number of midnights (e.g. a 36h double shift over three records) is
+    # stitched together in a single groupby pass
+    continues_previous = combine_rows.shift(1, fill_value=False)
+    shift_id = (~continues_previous).cumsum()
+    stitched = df.groupby(shift_id, sort=False).agg({
+        'Working Hours': 'sum',
+        'End Date': 'last',
+        'End time': 'last',
+        'End Datetime': 'last',
+        'Adjusted End Datetime': 'last'
+    })
 
-    # Combine the records
-    for idx in df[combine_rows].index:
-        df.loc[idx, 'Adjusted End Datetime'] = df.loc[idx+1, 'Adjusted End Datetime']
-        df.loc[idx, 'Working Hours'] += df.loc[idx+1, 'Working Hours']
-        df.loc[idx, 'End Date'] = df.loc[idx+1, 'End Date']
-        df.loc[idx, 'End time'] = df.loc[idx+1, 'End time']
-        df.loc[idx, 'End Datetime'] = df.loc[idx+1, 'End Datetime']
-    
-    # Remove the second part of combined pairs
-    df = df[~(combine_rows.shift(1, fill_value=False) & same_employee)].reset_index(drop=True)
+    # Keep the first segment of each shift and give it the end of the last one
+    df = df[~continues_previous].reset_index(drop=True)
+    for column in stitched.columns:
+        df[column] = stitched[column].to_numpy()
 
     combined_count = original_count - len(df)
-    print(f"\nCombined {combined_count} records")
-    print("\nSample of records after combination:")
-    print(df[['Employee Number', 'First name', 'Last name', 'Adjusted Start Datetime', 'Adjusted End Datetime', 'Working Hours']].head())
+    stage_event(logger, 'combine_time', f"Combined {combined_count} records",
+                rows_in=original_count, rows_out=len(df), combined_records=combined_count)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Sample of records after combination:\n%s", df[['Employee Number', 'First name', 'Last name', 'Adjusted Start Datetime', 'Adjusted End Datetime', 'Working Hours']].head())
 
     return df
 
-def adjust_business_hours(df):
-    print("\nStep 3: Adjusting Business Hours")
-    
-    # Make a copy to avoid SettingWithCopyWarning
-    df = df.copy()
-    
-    changes = []
-    
-    # Identify Business department employees, excluding specific employee numbers
-    business_mask = (df['Department'] == 'Business') & (~df['Employee Number'].isin(['EE109', 'EE037', 'EE034','EE059']))
-    
-    # Update start and end times for Business department
-    for idx in df[business_mask].index:
-        original_start = df.loc[idx, 'Adjusted Start Datetime']
-        original_end = df.loc[idx, 'Adjusted End Datetime']
-        new_start = original_start.replace(hour=9, minute=0)
-        new_end = original_start.replace(hour=19, minute=30)
-        
-        if original_start != new_start or original_end != new_end:
-            changes.append({
-                'Employee Number': df.loc[idx, 'Employee Number'],
-                'Full Name': f"{df.loc[idx, 'First name']} {df.loc[idx, 'Last name']}",
-                'Original Start': original_start,
-                'New Start': new_start,
-                'Original End': original_end,
-                'New End': new_end,
-                'Reason': 'Adjusted business hours'
-            })
-            df.loc[idx, 'Adjusted Start Datetime'] = new_start
-            df.loc[idx, 'Adjusted End Datetime'] = new_end
+def adjust_business_hours(df, policies=SHIFT_WINDOW_POLICIES):
+    logger.debug("Step 3: Adjusting Business Hours")
+    
+    # Lazy copy-on-write copy; columns are only copied when they are modified
+    df = df.copy(deep=False)
+    
+    # Rows covered by a fixed window policy, and the window each one gets
+    window_mask, window_start, window_end, reason = compile_shift_windows(df, policies)
+    
+    # Move start and end to the window's clock times on the start day, keeping the seconds
+    original_start = df['Adjusted Start Datetime']
+    original_end = df['Adjusted End Datetime']
+    start_day = original_start.dt.normalize()
+    seconds = (original_start - start_day) % pd.Timedelta(minutes=1)
+    new_start = (start_day + window_start + seconds).astype(original_start.dtype).where(window_mask, original_start)
+    new_end = (start_day + window_end + seconds).astype(original_end.dtype).where(window_mask, original_end)
+    
+    # The change log is the diff between the original and the adjusted times
+    changed = window_mask & ((new_start != original_start) | (new_end != original_end))
+    changes = pd.DataFrame({
+        'Employee Number': df.loc[changed, 'Employee Number'],
+        'Full Name': df.loc[changed, 'First name'].astype(str) + ' ' + df.loc[changed, 'Last name'].astype(str),
+        'Original Start': original_start[changed],
+        'New Start': new_start[changed],
+        'Original End': original_end[changed],
+        'New End': new_end[changed],
+        'Reason': reason[changed]
+    }).reset_index(drop=True)
+    
+    df['Adjusted Start Datetime'] = new_start
+    df['Adjusted End Datetime'] = new_end
     
     # Recalculate working hours
-    df.loc[business_mask, 'Working Hours'] = (df.loc[business_mask, 'Adjusted End Datetime'] - df.loc[business_mask, 'Adjusted Start Datetime']).dt.total_seconds() / 3600
+    window_hours = (new_end - new_start).dt.total_seconds() / 3600
+    df['Working Hours'] = window_hours.where(window_mask, df['Working Hours'])
     
-    # Count affected records
-    affected_records = len(changes)
-    print(f"Adjusted {affected_records} Business department records")
-    
-    # Show sample of changes
-    if affected_records > 0:
-        print("Sample of changes:")
-        print(pd.DataFrame(changes).head())
+    stage_event(logger, 'adjust_business_hours', f"Adjusted {len(changes)} Business department records",
+                adjusted_records=len(changes))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Sample of changes:\n%s", changes.head())
     
     return df, changes
 
-def update_from_schedule(timesheet_df, schedule_df):
-    print("\nStep 4: Updating Timesheet from Schedule")
+def update_from_schedule(timesheet_df, schedule_df, tolerance_hours=1):
+    logger.debug("Step 4: Updating Timesheet from Schedule")
     
-    # Make copies to avoid SettingWithCopyWarning
-    timesheet_df = timesheet_df.copy()
-    schedule_df = schedule_df.copy()
+    # Lazy copy-on-write copies; columns are only copied when they are modified
+    timesheet_df = timesheet_df.copy(deep=False)
+    schedule_df = schedule_df.copy(deep=False)
     
     # Convert schedule date and time columns to datetime
     schedule_df['Date'] = pd.to_datetime(schedule_df['Date'], format='mixed', dayfirst=False)
     schedule_df['Start'] = pd.to_datetime(schedule_df['Date'].astype(str) + ' ' + schedule_df['Start'], format='mixed', errors='coerce')
     
-    # For Temp employees, split the Users column into First name and Last name
-    schedule_df[['First name', 'Last name']] = schedule_df['Users'].str.split(n=1, expand=True)
-    
-    # Create a full name column in both dataframes
-    timesheet_df['Full Name'] = timesheet_df['First name'] + ' ' + timesheet_df['Last name']
-    schedule_df['Full Name'] = schedule_df['First name'] + ' ' + schedule_df['Last name']
-    
-    # Convert Start Date to date for merging
-    timesheet_df['Merge Date'] = timesheet_df['Start Date'].dt.date
-    schedule_df['Merge Date'] = schedule_df['Date'].dt.date
-    
-    # Merge timesheet with schedule
-    merged_df = pd.merge(
-        timesheet_df,
-        schedule_df[['Merge Date', 'Start', 'Full Name']],
-        left_on=['Merge Date', 'Full Name'],
-        right_on=['Merge Date', 'Full Name'],
-        how='left'
-    )
-    
-    changes = []
-    alerts = []
-    
-    # Update start time if schedule start time is later, but not more than 1 hour earlier
-    for idx, row in merged_df.iterrows():
-        if pd.notna(row['Start']):
-            time_diff = (row['Start'] - row['Start Datetime']).total_seconds() / 3600
-            if -1 <= time_diff <= 1:
-                original_start = row['Start Datetime']
-                new_start = row['Start']
-                merged_df.at[idx, 'Adjusted Start Datetime'] = new_start
-                changes.append({
-                    'Employee Number': row['Employee Number'],
-                    'Full Name': row['Full Name'],
-                    'Original Start': original_start,
-                    'New Start': new_start,
-                    'Time Difference (hours)': time_diff,
-                    'Reason': 'Schedule start time adjustment'
-                })
-            elif abs(time_diff) > 1:
-                alerts.append({
-                    'Employee Number': row['Employee Number'],
-                    'Full Name': row['Full Name'],
-                    'Timesheet Start': row['Start Datetime'],
-                    'Schedule Start': row['Start'],
-                    'Time Difference (hours)': time_diff,
-                    'Reason': 'Large time difference between timesheet and schedule'
-                })
+    # Employees resolved to directory keys are joined on the integer key; schedule
+    # rows the directory could not resolve (unknown or shared names) never match
+    by_key = 'Employee Key' in timesheet_df.columns and 'Employee Key' in schedule_df.columns
+    if by_key:
+        schedule_employee = schedule_df['Employee Key'].astype('int64')
+        timesheet_employee = timesheet_df['Employee Key'].astype('int64')
+    else:
+        # For Temp employees, split the Users column into First name and Last name
+        schedule_df[['First name', 'Last name']] = schedule_df['Users'].str.split(n=1, expand=True)
+        schedule_employee = schedule_df['First name'] + ' ' + schedule_df['Last name']
+        timesheet_employee = timesheet_df['First name'].astype(str) + ' ' + timesheet_df['Last name'].astype(str)
+    
+    # Join keys: the employee plus the work day, and the start time to match on
+    schedule_keys = pd.DataFrame({
+        'Merge Date': schedule_df['Date'].dt.normalize().astype('datetime64[ns]'),
+        'Employee': schedule_employee,
+        'Schedule Start': schedule_df['Start'].astype('datetime64[ns]')
+    }).dropna().sort_values('Schedule Start')
+    timesheet_keys = pd.DataFrame({
+        'Row': timesheet_df.index,
+        'Merge Date': timesheet_df['Start Date'].dt.normalize().astype('datetime64[ns]'),
+        'Employee': timesheet_employee,
+        'Start Datetime': timesheet_df['Start Datetime'].astype('datetime64[ns]')
+    }).sort_values('Start Datetime')
+    if by_key:
+        schedule_keys = schedule_keys[schedule_keys['Employee'] >= 0]
+        timesheet_keys = timesheet_keys[timesheet_keys['Employee'] >= 0]
+    
+    # As-of join: each punch is matched to the nearest scheduled start for the same
+    # employee on the same day, so duplicate schedule rows can no longer fan out
+    matched = pd.merge_asof(
+        timesheet_keys,
+        schedule_keys,
+        left_on='Start Datetime',
+        right_on='Schedule Start',
+        by=['Merge Date', 'Employee'],
+        direction='nearest'
+    ).set_index('Row').reindex(timesheet_df.index)
+    full_name = timesheet_df['First name'].astype(str) + ' ' + timesheet_df['Last name'].astype(str)
+    
+    time_diff = (matched['Schedule Start'] - timesheet_df['Start Datetime'].astype('datetime64[ns]')).dt.total_seconds() / 3600
+    has_schedule = matched['Schedule Start'].notna()
+    adjust_mask = has_schedule & (time_diff.abs() <= tolerance_hours)
+    alert_mask = has_schedule & (time_diff.abs() > tolerance_hours)
+    
+    # Update start time when the schedule is within the tolerance
+    timesheet_df['Adjusted Start Datetime'] = timesheet_df['Adjusted Start Datetime'].mask(adjust_mask, matched['Schedule Start'])
+    
+    changes = pd.DataFrame({
+        'Employee Number': timesheet_df.loc[adjust_mask, 'Employee Number'],
+        'Full Name': full_name[adjust_mask],
+        'Original Start': timesheet_df.loc[adjust_mask, 'Start Datetime'],
+        'New Start': matched.loc[adjust_mask, 'Schedule Start'],
+        'Time Difference (hours)': time_diff[adjust_mask],
+        'Reason': 'Schedule start time adjustment'
+    }).reset_index(drop=True)
+    
+    alerts = pd.DataFrame({
+        'Employee Number': timesheet_df.loc[alert_mask, 'Employee Number'],
+        'Full Name': full_name[alert_mask],
+        'Timesheet Start': timesheet_df.loc[alert_mask, 'Start Datetime'],
+        'Schedule Start': matched.loc[alert_mask, 'Schedule Start'],
+        'Time Difference (hours)': time_diff[alert_mask],
+        'Reason': 'Large time difference between timesheet and schedule'
+    }).reset_index(drop=True)
     
     # Recalculate working hours
-    merged_df['Working Hours'] = (merged_df['Adjusted End Datetime'] - merged_df['Adjusted Start Datetime']).dt.total_seconds() / 3600
+    timesheet_df['Working Hours'] = (timesheet_df['Adjusted End Datetime'] - timesheet_df['Adjusted Start Datetime']).dt.total_seconds() / 3600
     
-    # Drop unnecessary columns
-    merged_df = merged_df.drop(columns=['Merge Date', 'Start', 'Full Name'])
+    stage_event(logger, 'update_from_schedule',
+                f"Updated {len(changes)} start times from schedule; found {len(alerts)} records with large time differences",
+                updated_records=len(changes), alerts=len(alerts))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Sample of changes:\n%s", changes.head())
+        logger.debug("Alerts for large time differences:\n%s", alerts)
     
-    # Count affected records
-    start_affected = len(changes)
-    print(f"Updated {start_affected} start times from schedule")
-    print(f"Found {len(alerts)} records with large time differences")
+    return timesheet_df, changes, alerts
+
+def adjust_lunch_time(df, policies=LUNCH_POLICIES):
+    logger.debug("Step 5: Adjusting for Lunch Time")
     
-    # Show sample of changes
-    if changes:
-        print("Sample of changes:")
-        changes_df = pd.DataFrame(changes)
-        print(changes_df.head())
+    # Lazy copy-on-write copy; columns are only copied when they are modified
+    df = df.copy(deep=False)
     
-    # Show alerts
-    if alerts:
-        print("\nAlerts for large time differences:")
-        alerts_df = pd.DataFrame(alerts)
-        print(alerts_df)
+    # Records long enough for a lunch deduction, and how much each one loses
+    lunch_mask, deduction, reason = compile_lunch_deductions(df, policies)
     
-    return merged_df, changes, alerts
-
-def adjust_lunch_time(df):
-    print("\nStep 5: Adjusting for Lunch Time")
-    
-    # Make a copy to avoid SettingWithCopyWarning
-    df = df.copy()
-    
-    changes = []
-    
-    # Identify records with more than 7 working hours
-    long_day_mask = df['Working Hours'] > 7
-    
-    for idx in df[long_day_mask].index:
-        original_hours = df.loc[idx, 'Working Hours']
-        new_hours = original_hours - 0.5
-        
-        changes.append({
-            'Employee Number': df.loc[idx, 'Employee Number'],
-            'Full Name': f"{df.loc[idx, 'First name']} {df.loc[idx, 'Last name']}",
-            'Original Hours': original_hours,
-            'New Hours': new_hours,
-            'Reason': 'Subtracted 0.5 hours for lunch'
-        })
-        
-        df.loc[idx, 'Working Hours'] = new_hours
-    
-    # Count affected records
-    affected_records = len(changes)
-    print(f"Adjusted {affected_records} records for lunch time")
-    
-    # Show sample of changes
-    if affected_records > 0:
-        print("Sample of changes:")
-        print(pd.DataFrame(changes).head())
-    
-    return df, changes
\ No newline at end of file
+    original_hours = df['Working Hours']
+    new_hours = original_hours - deduction
+    
+    changes = pd.DataFrame({
+        'Employee Number': df.loc[lunch_mask, 'Employee Number'],
+        'Full Name': df.loc[lunch_mask, 'First name'].astype(str) + ' ' + df.loc[lunch_mask, 'Last name'].astype(str),
+        'Original Hours': original_hours[lunch_mask],
+        'New Hours': new_hours[lunch_mask],
+        'Reason': reason[lunch_mask]
+    }).reset_index(drop=True)
+    
+    df['Working Hours'] = new_hours
+    
+    stage_event(logger, 'adjust_lunch_time', f"Adjusted {len(changes)} records for lunch time",
+                adjusted_records=len(changes))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Sample of changes:\n%s", changes.head())
+    
+    return df, changes
@@ -0,0 +1,58 @@
+import pandas as pd
+
+# Typed in-memory schema of the combined timesheet. Repeated strings (ids,
+# names, departments, jobs, notes) are categoricals, timestamps are
+# datetime64[ns] and hours are float32. The schema is applied once when the
+# timesheets are loaded and re-applied between adjustment stages, which hand
+# frames to each other as lazy copy-on-write copies instead of deep copies.
+
+# pandas 3 always uses copy-on-write; pandas 2 needs it switched on for
+# shallow copies to be safe to modify
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+CATEGORY_COLUMNS = ['Employee Number', 'First name', 'Last name', 'Department', 'Job', 'Employee notes']
+DATETIME_COLUMNS = ['Start Date', 'Start Datetime', 'End Datetime', 'Adjusted Start Datetime', 'Adjusted End Datetime']
+HOURS_COLUMNS = ['Working Hours']
+
+# Raw text columns only needed to build the datetimes in combine_time
+RAW_TIME_COLUMNS = ['Start time', 'End Date', 'End time']
+
+def as_category(values):
+    # Mixed numeric/text ids are compared as text, so categories sort like the strings they print as
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    if values.dtype == object:
+        values = values.where(values.isna(), values.astype(str))
+    return values.astype('category')
+
+def normalize_timesheet(df):
+    # Applied once at load time, before any datetime columns exist
+    df = df.copy(deep=False)
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = as_category(df[column])
+    return df
+
+def enforce_timesheet_schema(df):
+    # Cast only the columns that drifted (e.g. after a concat or a float64 recalculation)
+    df = df.copy(deep=False)
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = as_category(df[column])
+    for column in DATETIME_COLUMNS:
+        # Raw date text before combine_time is left for it to parse
+        if column in df.columns and pd.api.types.is_datetime64_any_dtype(df[column]) and df[column].dtype != 'datetime64[ns]':
+            df[column] = df[column].astype('datetime64[ns]')
+    for column in HOURS_COLUMNS:
+        if column in df.columns and df[column].dtype != 'float32':
+            df[column] = df[column].astype('float32')
+    return df.drop(columns=[column for column in RAW_TIME_COLUMNS if column in df.columns and 'Start Datetime' in df.columns])
+
+def plain_strings(df, columns):
+    # Categorical identity columns back to plain objects, for small summary frames that get filled or concatenated
+    df = df.copy(deep=False)
+    for column in columns:
+        if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    return df
@@ -0,0 +1,120 @@
+import os
+import hashlib
+import pandas as pd
+from payroll_logging import get_logger
+
+logger = get_logger('workbook_cache')
+
+# Disk cache of parsed workbooks, keyed by the hash of the file bytes plus the
+# file name (parsers take the department from it), the columns read and the
+# loader version. Entries are Feather files (pyarrow ships
+# with Streamlit) with a pickle fallback for columns Arrow cannot type, and the
+# least recently used entries are evicted once the cache grows past max_bytes.
+
+DEFAULT_CACHE_DIR = os.path.join('temp', 'workbook_cache')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+CACHE_EXTENSIONS = ('.feather', '.pkl')
+
+def file_name(file_path):
+    # Base name of a path or of a named in-memory workbook
+    name = os.fspath(file_path) if isinstance(file_path, (str, os.PathLike)) else getattr(file_path, 'name', '') or ''
+    return os.path.basename(name)
+
+def workbook_key(file_path, usecols, loader_name, loader_version):
+    digest = hashlib.sha256()
+    if isinstance(file_path, (str, os.PathLike)):
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    elif isinstance(file_path, (bytes, bytearray, memoryview)):
+        digest.update(file_path)
+    else:
+        # In-memory uploads are hashed through their buffer without copying
+        with file_path.getbuffer() as view:
+            digest.update(view)
+    digest.update(repr((file_name(file_path), usecols, loader_name, loader_version)).encode('utf-8'))
+    return digest.hexdigest()
+
+def frame_key(frames, loader_name, loader_version):
+    # Content hash of already-loaded frames (columns, dtypes and every value, in row order)
+    digest = hashlib.sha256()
+    for df in frames:
+        if df is None:
+            digest.update(b'None')
+        else:
+            digest.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes])).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        digest.update(b'|')
+    digest.update(repr((loader_name, loader_version)).encode('utf-8'))
+    return digest.hexdigest()
+
+def cache_get(cache_dir, key):
+    for extension in CACHE_EXTENSIONS:
+        entry_path = os.path.join(cache_dir, key + extension)
+        if not os.path.exists(entry_path):
+            continue
+        try:
+            df = pd.read_feather(entry_path) if extension == '.feather' else pd.read_pickle(entry_path)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.warning("Discarding unreadable cache entry %s: %s", entry_path, e)
+            remove_entry(entry_path)
+            continue
+        # Touch the entry so eviction sees it as recently used
+        os.utime(entry_path)
+        return df
+    return None
+
+def cache_put(cache_dir, key, df, max_bytes=DEFAULT_MAX_BYTES):
+    os.makedirs(cache_dir, exist_ok=True)
+    df = df.reset_index(drop=True)
+
+    # Write to a temporary name and rename, so concurrent workers never read a partial entry
+    entry_path = os.path.join(cache_dir, key + '.feather')
+    temp_path = f"{entry_path}.{os.getpid()}.tmp"
+    try:
+        df.to_feather(temp_path)
+    except Exception:
+        remove_entry(temp_path)
+        entry_path = os.path.join(cache_dir, key + '.pkl')
+        temp_path = f"{entry_path}.{os.getpid()}.tmp"
+        df.to_pickle(temp_path)
+    os.replace(temp_path, entry_path)
+
+    evict(cache_dir, max_bytes)
+
+def evict(cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(CACHE_EXTENSIONS):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        remove_entry(os.path.join(cache_dir, name))
+        total_bytes -= size
+
+def remove_entry(entry_path):
+    try:
+        os.remove(entry_path)
+    except FileNotFoundError:
+        pass
+
+def cached_parse(parse, file_path, usecols, loader_name, loader_version, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    # parse() is only called on a cache miss; hits and misses both return a frame with a fresh index
+    key = workbook_key(file_path, usecols, loader_name, loader_version)
+    df = cache_get(cache_dir, key)
+    if df is not None:
+        return df
+
+    df = parse().reset_index(drop=True)
+    cache_put(cache_dir, key, df, max_bytes)
+    return df
@@ -0,0 +1,8 @@
+# Columns read from each kind of workbook. Kept apart from the loaders and
+# parsers, which import each other, so either can read them at import time.
+TIMESHEET_COLUMNS = [
+    "Start Date", "Start time", "End Date", "End time",
+    "Employee Number", "First name", "Last name", "Job", "Employee notes"
+]
+TEMP_TIMESHEET_COLUMNS = ["Start Date", "Start time", "End Date", "End time", "First name", "Last name", "Team", "Job", "Employee notes"]
+SCHEDULE_COLUMNS = ["Date", "Start", "End", "Users", "Availability status"]
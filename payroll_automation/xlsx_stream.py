@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+# Streaming XLSX reader: rows are pulled one at a time from openpyxl's
+# read-only mode and only the requested columns are kept, so large exports
+# never build the full workbook in memory. Rows are typed in bounded chunks
+# and the chunks are combined column by column, each column's chunks released
+# as it is combined, so the peak stays close to the projected result itself.
+# When python-calamine is installed its native parser is used instead.
+
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+DEFAULT_CHUNK_SIZE = 10000
+
+def typed_chunk(columns):
+    # Let pandas infer each column's dtype; empty columns become float NaN like read_excel
+    return pd.DataFrame({
+        name: values if any(value is not None for value in values) else np.full(len(values), np.nan)
+        for name, values in columns.items()
+    })
+
+def iter_excel_chunks(file_path, usecols, chunk_size=DEFAULT_CHUNK_SIZE):
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        # Project the requested columns by header name, keeping the file's column order
+        positions = {name: idx for idx, name in enumerate(header) if name is not None}
+        if usecols is None:
+            usecols = list(positions)
+        missing = [name for name in usecols if name not in positions]
+        if missing:
+            raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+        selected = [(name, idx) for name, idx in positions.items() if name in usecols]
+
+        columns = {name: [] for name, _ in selected}
+        row_count = 0
+        for row in rows:
+            values = [row[idx] if idx < len(row) else None for _, idx in selected]
+            # Skip blank rows, as pandas does
+            if all(value is None for value in values):
+                continue
+            for (name, _), value in zip(selected, values):
+                columns[name].append(value)
+            row_count += 1
+
+            if row_count == chunk_size:
+                yield typed_chunk(columns)
+                columns = {name: [] for name, _ in selected}
+                row_count = 0
+
+        if row_count:
+            yield typed_chunk(columns)
+    finally:
+        wb.close()
+
+def read_excel_streaming(file_path, usecols, chunk_size=DEFAULT_CHUNK_SIZE):
+    if CALAMINE_AVAILABLE:
+        return pd.read_excel(file_path, usecols=usecols, engine='calamine')
+
+    chunks = list(iter_excel_chunks(file_path, usecols, chunk_size))
+    if not chunks:
+        return pd.DataFrame(columns=usecols or [])
+    columns = {}
+    for name in list(chunks[0].columns):
+        columns[name] = pd.concat([chunk.pop(name) for chunk in chunks], ignore_index=True)
+    return pd.DataFrame(columns, copy=False)